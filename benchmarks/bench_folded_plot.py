@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""Compare folded figure rendering by filter groups with the former per-light-curve loop
+
+Usage: python benchmarks/bench_folded_plot.py [--neighbours 30] [--size 300] [--fmt png] [--repeat 3]
+"""
+
+import argparse
+from datetime import datetime
+from io import BytesIO
+from timeit import repeat
+
+import matplotlib.figure
+import numpy as np
+from matplotlib.ticker import AutoMinorLocator
+
+from ztf_viewer.figure_render import folded_figure
+from ztf_viewer.util import FILTER_COLORS, FILTERS_ORDER
+
+OID = "633207400004730"
+PERIOD = 0.7
+
+
+def folded_figure_loop(oid, data, period, repeat=None, usetex=False, caption=True, title=None):
+    """The implementation replaced by grouping, errorbar and scatter per light curve and phase copy"""
+    if repeat is None:
+        repeat = 2
+
+    if title is None:
+        title = str(oid)
+
+    lcs = {}
+    seen_filters = set()
+    for lc_oid, lc in data.items():
+        if len(lc) == 0:
+            continue
+        first_obs = lc[0]
+        fltr = first_obs["filter"]
+        lcs[lc_oid] = {
+            "filter": fltr,
+            "folded_time": np.array([obs["folded_time"] for obs in lc]),
+            "phase": np.array([obs["phase"] for obs in lc]),
+            "m": np.array([obs["mag"] for obs in lc]),
+            "err": np.array([obs["magerr"] for obs in lc]),
+            "color": FILTER_COLORS[fltr],
+            "marker_size": 24 if lc_oid == oid else 12,
+            "label": "" if fltr in seen_filters else fltr,
+            "marker": "o" if lc_oid == oid else "s",
+            "zorder": 2 if lc_oid == oid else 1,
+        }
+        seen_filters.add(fltr)
+
+    fig = matplotlib.figure.Figure(dpi=300, figsize=(6.4, 4.8), constrained_layout=True)
+    if caption:
+        fig.text(
+            0.50,
+            0.005,
+            f"Generated with the SNAD ZTF viewer on {datetime.now().date()}",
+            ha="center",
+            fontdict=dict(size=8, color="grey", usetex=usetex),
+        )
+    ax = fig.subplots()
+    ax.invert_yaxis()
+    ax.set_title(f"{title}, P = {period:.6g} days", usetex=usetex)
+    ax.set_xlabel("phase", usetex=usetex)
+    ax.set_ylabel("magnitude", usetex=usetex)
+    ax.xaxis.set_minor_locator(AutoMinorLocator(2))
+    ax.yaxis.set_minor_locator(AutoMinorLocator(2))
+    ax.tick_params(which="major", direction="in", length=6, width=1.5)
+    ax.tick_params(which="minor", direction="in", length=4, width=1)
+    for lc_oid, lc in sorted(lcs.items(), key=lambda item: FILTERS_ORDER[item[1]["filter"]]):
+        for i in range(-1, repeat + 1):
+            label = ""
+            if i == 0:
+                label = lc["label"]
+            ax.errorbar(
+                lc["phase"] + i,
+                lc["m"],
+                lc["err"],
+                c=lc["color"],
+                label=label,
+                marker="",
+                zorder=lc["zorder"],
+                ls="",
+                alpha=0.7,
+            )
+            ax.scatter(
+                lc["phase"] + i,
+                lc["m"],
+                c=lc["color"],
+                label="",
+                marker=lc["marker"],
+                s=lc["marker_size"],
+                linewidths=0.5,
+                edgecolors="black",
+                zorder=lc["zorder"],
+                alpha=0.7,
+            )
+    ax.set_xlim([-0.1, repeat + 0.1])
+    secax = ax.secondary_xaxis("top", functions=(lambda x: x * period, lambda x: x / period))
+    secax.set_xlabel("Folded time, days")
+    secax.minorticks_on()
+    secax.tick_params(direction="in", which="both")
+    legend_anchor_y = -0.026 if usetex else -0.032
+    ax.legend(
+        bbox_to_anchor=(1, legend_anchor_y),
+        ncol=min(3, len(seen_filters)),
+        columnspacing=0.5,
+        frameon=False,
+        handletextpad=0.0,
+    )
+    return fig
+
+
+def generate_data(neighbours, size, rng):
+    """Folded light curves of the object and its neighbours, a light curve per OID and filter"""
+    data = {}
+    oids = [OID] + [str(int(OID) + i) for i in range(1, neighbours + 1)]
+    for i, oid in enumerate(oids):
+        fltr = ["zg", "zr", "zi"][i % 3]
+        folded_time = rng.uniform(0.0, PERIOD, size)
+        data[oid] = [
+            dict(folded_time=t, phase=t / PERIOD, mag=mag, magerr=magerr, filter=fltr)
+            for t, mag, magerr in zip(
+                folded_time.tolist(), rng.normal(18.0, 0.5, size).tolist(), rng.uniform(0.01, 0.2, size).tolist()
+            )
+        ]
+    return data
+
+
+def render(figure_func, data, fmt):
+    fig = figure_func(OID, data, PERIOD, caption=False)
+    bytes_io = BytesIO()
+    fig.savefig(bytes_io, format=fmt)
+    return fig, bytes_io.getvalue()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--neighbours", type=int, default=30, help="number of neighbour light curves")
+    parser.add_argument("--size", type=int, default=300, help="number of observations per light curve")
+    parser.add_argument("--fmt", default="png", choices=["png", "svg"])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    data = generate_data(args.neighbours, args.size, rng)
+
+    print(f"{args.neighbours + 1} light curves of {args.size} observations, {args.fmt}")
+    results = {}
+    for name, figure_func in [("loop", folded_figure_loop), ("grouped", folded_figure)]:
+        fig, img = render(figure_func, data, args.fmt)
+        collections = len(fig.axes[0].collections)
+        elapsed = min(repeat(lambda: render(figure_func, data, args.fmt), number=1, repeat=args.repeat))
+        results[name] = elapsed
+        print(f"{name + ':':9} {elapsed * 1e3:10.1f} ms {len(img) / 1024:10.1f} KiB {collections:6d} collections")
+    print(f"speed-up: {results['loop'] / results['grouped']:10.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""Compare vectorized `plot_data` with the former per-observation loop
+
+Usage: python benchmarks/bench_plot_data.py [--size 10000] [--repeat 5]
+"""
+
+import argparse
+import copy
+import math as m
+from timeit import repeat
+
+import numpy as np
+from astropy.time import Time
+
+from ztf_viewer.lc_data.plot_data import MJD_OFFSET, plot_data
+from ztf_viewer.util import ABZPMAG_JY, FILTERS_ORDER, LN10_04, immutabledefaultdict
+
+
+def plot_data_loop(lc, mark_size=1, min_mjd=None, max_mjd=None, ref_mag=None, ref_magerr=None):
+    """The implementation replaced by the vectorized one"""
+    if min_mjd is None:
+        min_mjd = -np.inf
+    if max_mjd is None:
+        max_mjd = np.inf
+
+    data = []
+    for obs in lc:
+        if not min_mjd <= obs["mjd"] <= max_mjd:
+            continue
+
+        obs["mark_size"] = mark_size
+
+        ref_flux = 10 ** (-0.4 * (ref_mag[obs["oid"]] - ABZPMAG_JY))
+        ref_fluxerr = LN10_04 * ref_flux * ref_magerr[obs["oid"]]
+
+        obs["flux_Jy"] = 10 ** (-0.4 * (obs["mag"] - ABZPMAG_JY))
+        obs["fluxerr_Jy"] = LN10_04 * obs["flux_Jy"] * obs["magerr"]
+
+        obs["diffflux_Jy"] = obs["flux_Jy"] - ref_flux
+        obs["difffluxerr_Jy"] = np.hypot(obs["fluxerr_Jy"], ref_fluxerr)
+        obs["ref_flux"] = ref_flux
+
+        if obs["diffflux_Jy"] <= 0 or obs["diffflux_Jy"] < obs["difffluxerr_Jy"]:
+            obs["diffmag"] = np.inf
+            obs["diffmagerr_plus"] = np.inf
+            obs["diffmagerr_minus"] = np.inf
+        else:
+            obs["diffmag"] = ABZPMAG_JY - 2.5 * m.log10(obs["diffflux_Jy"])
+            obs["diffmagerr_plus"] = -2.5 * m.log10(1 - obs["difffluxerr_Jy"] / obs["diffflux_Jy"])
+            obs["diffmagerr_minus"] = 2.5 * m.log10(1 + obs["difffluxerr_Jy"] / obs["diffflux_Jy"])
+
+        obs[f"mjd_{MJD_OFFSET}"] = obs["mjd"] - MJD_OFFSET
+        time = Time(obs["mjd"], format="mjd")
+        obs["date"] = time.strftime("%Y-%m-%d")
+
+        data.append(obs)
+
+    data = sorted(data, key=lambda obs: (FILTERS_ORDER[obs["filter"]], obs["mjd"]))
+
+    return data
+
+
+def generate_lc(size, rng):
+    return [
+        dict(mjd=mjd, mag=mag, magerr=magerr, clrcoeff=0.0, oid="633207400004730", filter=fltr)
+        for mjd, mag, magerr, fltr in zip(
+            rng.uniform(58194.0, 60500.0, size).tolist(),
+            rng.normal(18.0, 0.5, size).tolist(),
+            rng.uniform(0.01, 0.2, size).tolist(),
+            rng.choice(["zg", "zr", "zi"], size).tolist(),
+        )
+    ]
+
+
+def assert_same(expected, actual):
+    assert len(expected) == len(actual)
+    for obs_expected, obs_actual in zip(expected, actual):
+        assert obs_expected.keys() == obs_actual.keys()
+        for key, value in obs_expected.items():
+            if isinstance(value, str):
+                assert value == obs_actual[key], key
+            else:
+                np.testing.assert_allclose(obs_actual[key], value, rtol=1e-12, err_msg=key)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=10_000, help="number of observations")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    lc = generate_lc(args.size, rng)
+    kwargs = dict(
+        ref_mag=immutabledefaultdict(lambda: np.inf, {"633207400004730": 18.2}),
+        ref_magerr=immutabledefaultdict(float, {"633207400004730": 0.05}),
+    )
+
+    assert_same(plot_data_loop(copy.deepcopy(lc), **kwargs), plot_data(lc, **kwargs))
+
+    # Loop version mutates its input, so we give it a fresh copy every run
+    loop_time = min(
+        repeat(
+            "plot_data_loop(lc_copy, **kwargs)",
+            setup="lc_copy = copy.deepcopy(lc)",
+            globals=globals() | locals(),
+            number=1,
+            repeat=args.repeat,
+        )
+    )
+    vectorized_time = min(
+        repeat("plot_data(lc, **kwargs)", globals=globals() | locals(), number=1, repeat=args.repeat)
+    )
+    print(f"{args.size} observations")
+    print(f"loop:       {loop_time * 1e3:10.1f} ms")
+    print(f"vectorized: {vectorized_time * 1e3:10.1f} ms")
+    print(f"speed-up:   {loop_time / vectorized_time:10.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,31 +1,265 @@
 #!/usr/bin/env python3
+"""Warm up the nginx products cache of the FITS proxy
 
+Requests directory listings of every night since ZTF start, optionally
+listings of exposure ("fraction") subdirectories and science images of the
+given fields. Requests run concurrently with a rate limit, completed URLs
+are appended to the checkpoint file, so a restarted run skips them.
+Listings of recent nights are never checkpointed, new exposures still
+appear there, so every run warms them again.
+"""
+
+import argparse
+import asyncio
 import logging
-from datetime import datetime, timedelta
-from urllib.parse import urljoin
+import os
+import re
+import time
+from datetime import date, datetime, timedelta
+from urllib.parse import urljoin, urlparse
+
+import aiohttp
+
+BASE_URL = os.environ.get("BASE_URL", "http://ztf-web-viewer-proxy/products/sci/")
+
+ZTFSTARTDATE = date(2017, 9, 26)
+
+FRACTION_DIR = re.compile(r'<a href="(\d{6})/">\1/</a>')
+SCIIMG = re.compile(r'<a href="(ztf_\d{14}_(\d{6})_z[gri]_c\d{2}_o_q\d_sciimg\.fits)">')
+
+
+class RateLimiter:
+    """Token bucket allowing `rate` requests per second with bursts up to `burst`"""
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class Checkpoint:
+    """Append-only file of completed URLs"""
+
+    def __init__(self, path):
+        self.path = path
+        self.done = set()
+        if path is not None and os.path.exists(path):
+            with open(path) as f:
+                self.done = {line.strip() for line in f if line.strip()}
+        self._file = None if path is None else open(path, "a", buffering=1)
+
+    def __contains__(self, url):
+        return url in self.done
+
+    def add(self, url):
+        self.done.add(url)
+        if self._file is not None:
+            self._file.write(f"{url}\n")
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+
+
+class Progress:
+    def __init__(self):
+        self.start = time.monotonic()
+        self.requests = 0
+        self.failed = 0
+        self.skipped = 0
+        self.bytes = 0
+
+    def report(self):
+        elapsed = time.monotonic() - self.start
+        logging.info(
+            f"{self.requests} requests, {self.failed} failed, {self.skipped} skipped as done, "
+            f"{self.requests / elapsed:.1f} req/s, {self.bytes / elapsed / 2**20:.2f} MiB/s"
+        )
+
+    async def report_periodically(self, period):
+        while True:
+            await asyncio.sleep(period)
+            self.report()
+
+
+class Warmer:
+    def __init__(self, session, *, concurrency, rate, retries, checkpoint, fields, recurse, recent_since):
+        self.session = session
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.rate = rate
+        self.rate_limiters = {}
+        self.retries = retries
+        self.checkpoint = checkpoint
+        self.fields = fields
+        self.recurse = recurse or bool(fields)
+        self.recent_since = recent_since
+        self.progress = Progress()
+
+    def _is_recent(self, url):
+        """URL is a listing of a night since `recent_since` or of its subdirectory"""
+        year, month_day = url.removeprefix(BASE_URL).split("/")[:2]
+        night = date(int(year), int(month_day[:2]), int(month_day[2:]))
+        return night >= self.recent_since
+
+    def _rate_limiter(self, url):
+        host = urlparse(url).netloc
+        if host not in self.rate_limiters:
+            self.rate_limiters[host] = RateLimiter(self.rate, burst=max(1, int(self.rate)))
+        return self.rate_limiters[host]
+
+    async def get(self, url, *, read_body):
+        """Request URL with retries, return body if `read_body`, otherwise read and drop it"""
+        for attempt in range(self.retries + 1):
+            await self._rate_limiter(url).acquire()
+            try:
+                async with self.semaphore, self.session.get(url) as response:
+                    if response.status == 404:
+                        self.progress.requests += 1
+                        return None
+                    response.raise_for_status()
+                    if read_body:
+                        body = await response.text()
+                        self.progress.bytes += len(body)
+                    else:
+                        body = None
+                        async for chunk in response.content.iter_chunked(1 << 20):
+                            self.progress.bytes += len(chunk)
+                    self.progress.requests += 1
+                    return body
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                logging.warning(f"Attempt {attempt + 1} for {url} failed: {e!r}")
+                await asyncio.sleep(2**attempt)
+        self.progress.failed += 1
+        raise RuntimeError(f"{url} failed after {self.retries + 1} attempts")
+
+    async def warm_night(self, night):
+        url = urljoin(BASE_URL, f"{night.year}/{night.month:02d}{night.day:02d}/")
+        await self.warm_listing(url, self.warm_fractions if self.recurse else None)
+
+    async def warm_fractions(self, url, body):
+        recurse = self.warm_images if self.fields else None
+        fractions = FRACTION_DIR.findall(body)
+        results = await asyncio.gather(*(self.warm_listing(urljoin(url, f"{frac}/"), recurse) for frac in fractions))
+        return all(results)
+
+    async def warm_images(self, url, body):
+        images = [filename for filename, field in SCIIMG.findall(body) if int(field) in self.fields]
+        results = await asyncio.gather(*(self.warm_file(urljoin(url, filename)) for filename in images))
+        return all(results)
+
+    async def warm_listing(self, url, recurse=None):
+        """Request directory listing and call `recurse(url, body)`, checkpoint it if everything succeeded
+
+        Listings of recent nights may change, they are neither checkpointed nor skipped.
+        """
+        recent = self._is_recent(url)
+        if url in self.checkpoint and not recent:
+            self.progress.skipped += 1
+            return True
+        try:
+            body = await self.get(url, read_body=recurse is not None)
+        except RuntimeError as e:
+            logging.error(e)
+            return False
+        if recurse is not None and body is not None and not await recurse(url, body):
+            return False
+        if not recent:
+            self.checkpoint.add(url)
+        return True
 
-import requests
+    async def warm_file(self, url):
+        if url in self.checkpoint:
+            self.progress.skipped += 1
+            return True
+        try:
+            await self.get(url, read_body=False)
+        except RuntimeError as e:
+            logging.error(e)
+            return False
+        self.checkpoint.add(url)
+        return True
 
-BASE_URL = "http://ztf-web-viewer-proxy/products/sci/"
 
-ZTFSTARTDATE = datetime(2017, 9, 26)
+async def warm(args):
+    checkpoint = Checkpoint(args.checkpoint)
+    timeout = aiohttp.ClientTimeout(total=args.timeout)
+    try:
+        async with aiohttp.ClientSession(timeout=timeout) as session:
+            warmer = Warmer(
+                session,
+                concurrency=args.concurrency,
+                rate=args.rate,
+                retries=args.retries,
+                checkpoint=checkpoint,
+                fields=set(args.fields),
+                recurse=args.recurse,
+                recent_since=datetime.now().date() - timedelta(days=args.recent_nights),
+            )
+            reporter = asyncio.create_task(warmer.progress.report_periodically(args.report_period))
+            nights = []
+            night = args.start
+            while night <= args.end:
+                nights.append(night)
+                night += timedelta(days=1)
+            # Nights are scheduled in batches, so a long run doesn't keep millions of pending tasks
+            for i in range(0, len(nights), args.concurrency):
+                await asyncio.gather(*(warmer.warm_night(night) for night in nights[i : i + args.concurrency]))
+            reporter.cancel()
+            warmer.progress.report()
+    finally:
+        checkpoint.close()
 
 
-def request(date):
-    url = urljoin(BASE_URL, f"{date.year}/{date.month:02d}{date.day:02d}/")
-    logging.info(f"Requesting {url}")
-    response = requests.get(url)
-    logging.info(f"Status code: {response.status_code}")
+def parse_args(args=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--start", type=date.fromisoformat, default=ZTFSTARTDATE)
+    parser.add_argument("--end", type=date.fromisoformat, default=datetime.now().date())
+    parser.add_argument("--concurrency", type=int, default=16, help="maximum number of simultaneous requests")
+    parser.add_argument("--rate", type=float, default=10.0, help="maximum number of requests per second per host")
+    parser.add_argument("--retries", type=int, default=3)
+    parser.add_argument("--timeout", type=float, default=600.0, help="request timeout, seconds")
+    parser.add_argument(
+        "--checkpoint",
+        default=os.environ.get("CHECKPOINT", "/state/proxy_cache_filler.checkpoint"),
+        help="file of completed URLs, use empty string to disable",
+    )
+    parser.add_argument(
+        "--recent-nights",
+        type=int,
+        default=int(os.environ.get("RECENT_NIGHTS", 30)),
+        help="listings of this many last nights are requested by every run, they are not checkpointed",
+    )
+    parser.add_argument("--recurse", action="store_true", help="request listings of fraction subdirectories")
+    parser.add_argument(
+        "--fields",
+        type=lambda s: [int(field) for field in s.split(",") if field],
+        default=[],
+        help="comma-separated ZTF fields to prefetch science images for, implies --recurse",
+    )
+    parser.add_argument("--report-period", type=float, default=60.0, help="progress report period, seconds")
+    args = parser.parse_args(args)
+    if not args.checkpoint:
+        args.checkpoint = None
+    return args
 
 
 def main():
     logging.basicConfig(level=logging.INFO)
-    date = ZTFSTARTDATE
-    today = datetime.now()
-    day = timedelta(days=1)
-    while date < today:
-        request(date)
-        date += day
+    args = parse_args()
+    asyncio.run(warm(args))
 
 
 if __name__ == "__main__":
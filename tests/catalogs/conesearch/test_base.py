@@ -0,0 +1,62 @@
+import threading
+
+import pytest
+from astropy.coordinates import SkyCoord
+from astropy.table import Table
+
+from ztf_viewer.exceptions import CatalogOverloaded, CatalogTimeout, NotFound
+
+
+def test_cone_subset():
+    from ztf_viewer.catalogs.conesearch._base import _cone_subset
+
+    coord = SkyCoord(ra=[10.0, 10.0, 10.0], dec=[20.0 + 3.0 / 3600.0, 20.0, 20.0 + 1.0 / 3600.0], unit="deg")
+    table = Table({"id": ["c", "a", "b"], "__coord": coord})
+    table["separation"] = SkyCoord(10.0, 20.0, unit="deg").separation(coord).to("arcsec")
+
+    subset = _cone_subset(table, 10.0, 20.0, 2.0)
+    assert list(subset["id"]) == ["a", "b"]
+    assert list(subset["separation"]) == pytest.approx([0.0, 1.0], abs=1e-6)
+    assert len(table) == 3
+
+    subset = _cone_subset(table, 10.0, 20.0 + 3.0 / 3600.0, 1.5)
+    assert list(subset["id"]) == ["c"]
+
+    with pytest.raises(NotFound):
+        _cone_subset(table, 10.0, 21.0, 2.0)
+
+
+def test_overloaded_pool_is_not_a_catalog_failure():
+    from prometheus_client import REGISTRY
+
+    from ztf_viewer.catalogs.conesearch._base import _BaseCatalogQuery
+    from ztf_viewer.circuit_breaker import CLOSED
+    from ztf_viewer.executor import BoundedExecutor
+    from ztf_viewer.util import timeout
+
+    class Query(_BaseCatalogQuery):
+        def _query_region(self, coord, radius):
+            raise AssertionError("catalog must not be requested")
+
+    query = Query("Overloaded pool test")
+    name = query.normalized_query_name
+    executor = BoundedExecutor(max_workers=1, max_queue=0)
+    query._timeout_decorator = timeout(
+        10.0,
+        exception=CatalogTimeout,
+        exception_kwargs=dict(catalog=query),
+        executor=executor,
+        full_exception=CatalogOverloaded,
+    )
+    release = threading.Event()
+    executor.submit(release.wait)
+    try:
+        for _ in range(20):
+            with pytest.raises(CatalogOverloaded):
+                query._find(10.0, 20.0, 1.0)
+    finally:
+        release.set()
+
+    assert query.circuit_breaker.state == CLOSED
+    assert REGISTRY.get_sample_value("ztf_viewer_catalog_overloaded_total", {"catalog": name}) == 20
+    assert REGISTRY.get_sample_value("ztf_viewer_catalog_timeouts_total", {"catalog": name}) is None
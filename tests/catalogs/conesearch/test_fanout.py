@@ -0,0 +1,58 @@
+import time
+
+from astropy.table import Table
+
+from ztf_viewer.exceptions import CatalogUnavailable, NotFound
+
+
+class FakeQuery:
+    def __init__(self, delay=0.0, exception=None):
+        self.delay = delay
+        self.exception = exception
+
+    def find(self, ra, dec, radius_arcsec):
+        time.sleep(self.delay)
+        if self.exception is not None:
+            raise self.exception
+        return Table({"separation": [radius_arcsec]})
+
+
+def test_find_all_order_and_failures():
+    from ztf_viewer.catalogs.conesearch import find_all
+
+    queries = {
+        "slow": FakeQuery(delay=0.2),
+        "fast": FakeQuery(),
+        "not-found": FakeQuery(exception=NotFound),
+        "unavailable": FakeQuery(exception=CatalogUnavailable),
+        "no-radius": FakeQuery(),
+    }
+    radii = {"slow": 1.0, "fast": 2.0, "not-found": 3.0, "unavailable": 4.0}
+    tables = find_all(queries, 0.0, 0.0, radii)
+    assert list(tables) == ["slow", "fast"]
+    assert tables["fast"]["separation"][0] == 2.0
+
+
+def test_iter_find_yields_as_completed():
+    from ztf_viewer.catalogs.conesearch import iter_find
+
+    queries = {"slow": FakeQuery(delay=0.2), "fast": FakeQuery()}
+    radii = dict.fromkeys(queries, 1.0)
+    assert [catalog for catalog, _ in iter_find(queries, 0.0, 0.0, radii)] == ["fast", "slow"]
+
+
+def test_deadlines():
+    from ztf_viewer.catalogs.conesearch import find_all
+
+    queries = {"hung": FakeQuery(delay=2.0), "fast": FakeQuery()}
+    radii = dict.fromkeys(queries, 1.0)
+
+    t = time.monotonic()
+    tables = find_all(queries, 0.0, 0.0, radii, query_deadline=0.2)
+    assert time.monotonic() - t < 1.0
+    assert list(tables) == ["fast"]
+
+    t = time.monotonic()
+    tables = find_all(queries, 0.0, 0.0, radii, global_deadline=0.2)
+    assert time.monotonic() - t < 1.0
+    assert list(tables) == ["fast"]
@@ -0,0 +1,132 @@
+import pytest
+
+from ztf_viewer.columnar_lc import ColumnarLightCurve
+from ztf_viewer.exceptions import NotFound
+
+
+def test_find_many(monkeypatch) -> None:
+    from ztf_viewer.catalogs.ztf_dr import FindZTFOID
+
+    find_ztf_oid = FindZTFOID()
+    fetched = []
+
+    def fetch(oid, dr):
+        fetched.append(oid)
+        if oid == 3:
+            raise NotFound
+        return ColumnarLightCurve.from_records({"oid": oid}, [{"mjd": 58000.0, "mag": 18.0, "magerr": 0.1}])
+
+    monkeypatch.setattr(find_ztf_oid, "_fetch", fetch)
+
+    assert find_ztf_oid.find(1, "dr17").meta == {"oid": 1}
+    lcs = find_ztf_oid.find_many([2, 1, 3, 2], "dr17")
+    assert list(lcs) == [2, 1]
+    assert lcs[2].meta == {"oid": 2}
+    assert sorted(fetched) == [1, 2, 3]
+
+    # found light curves are cached
+    find_ztf_oid.find_many([1, 2], "dr17")
+    assert find_ztf_oid.find(2, "dr17").meta == {"oid": 2}
+    assert sorted(fetched) == [1, 2, 3]
+
+
+def test_circle_subset() -> None:
+    from ztf_viewer.catalogs.ztf_dr import _add_separation, _circle_subset
+
+    j = {
+        "1": {"meta": {"coord": {"ra": 10.0, "dec": 20.0}}},
+        "2": {"meta": {"coord": {"ra": 10.0, "dec": 20.0 + 5.0 / 3600.0}}},
+    }
+    j = _add_separation(j, 10.0, 20.0)
+    assert j["2"]["separation"] == pytest.approx(5.0)
+    assert list(_circle_subset(j, 10.0, 20.0, 2.0)) == ["1"]
+    with pytest.raises(NotFound):
+        _circle_subset(j, 10.0, 20.0 + 1.0, 2.0)
+
+
+class _Response:
+    def __init__(self, status_code, json=None):
+        self.status_code = status_code
+        self._json = json
+        self.url = "https://example.org"
+        self.text = ""
+
+    def json(self):
+        return self._json
+
+
+def test_fetch_errors(monkeypatch) -> None:
+    import requests
+
+    from ztf_viewer.catalogs.ztf_dr import FindZTFOID
+    from ztf_viewer.exceptions import CatalogUnavailable
+
+    find_ztf_oid = FindZTFOID()
+    responses = {
+        1: _Response(404),
+        2: _Response(200, {}),
+        3: _Response(502),
+        4: requests.ConnectionError("connection refused"),
+        5: requests.Timeout("read timeout"),
+        6: _Response(429),
+        7: _Response(408),
+        8: _Response(400),
+    }
+
+    def get(url, params, timeout):
+        response = responses[params["oid"]]
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    monkeypatch.setattr(find_ztf_oid._api_session, "get", get)
+
+    for oid in (1, 2, 8):
+        with pytest.raises(NotFound):
+            find_ztf_oid._fetch(oid, "dr17")
+    for oid in (3, 4, 5, 6, 7):
+        with pytest.raises(CatalogUnavailable):
+            find_ztf_oid._fetch(oid, "dr17")
+
+
+def test_not_found_is_cached(monkeypatch) -> None:
+    from ztf_viewer.catalogs.ztf_dr import FindZTFOID
+    from ztf_viewer.exceptions import CatalogUnavailable
+
+    find_ztf_oid = FindZTFOID()
+    fetched = []
+    unavailable = {13}
+
+    def fetch(oid, dr):
+        fetched.append(oid)
+        if oid in unavailable:
+            raise CatalogUnavailable
+        if oid in (11, 12):
+            raise NotFound
+        return ColumnarLightCurve.from_records({"oid": oid}, [{"mjd": 58000.0, "mag": 18.0, "magerr": 0.1}])
+
+    monkeypatch.setattr(find_ztf_oid, "_fetch", fetch)
+
+    with pytest.raises(NotFound):
+        find_ztf_oid.find(11, "dr17")
+    with pytest.raises(NotFound):
+        find_ztf_oid.find(11, "dr17")
+    assert fetched == [11]
+
+    # find_many caches not found objects, they are not fetched again by find or find_many
+    with pytest.raises(CatalogUnavailable):
+        find_ztf_oid.find_many([10, 11, 12, 13], "dr17")
+    assert sorted(fetched) == [10, 11, 12, 13]
+    with pytest.raises(NotFound):
+        find_ztf_oid.find(12, "dr17")
+    unavailable.clear()
+    lcs = find_ztf_oid.find_many([10, 11, 12, 13], "dr17")
+    assert list(lcs) == [10, 13]
+    assert sorted(fetched) == [10, 11, 12, 13, 13]
+
+    # unavailability is not cached
+    unavailable.add(14)
+    for _ in range(2):
+        with pytest.raises(CatalogUnavailable):
+            find_ztf_oid.find(14, "dr17")
+    assert fetched.count(14) == 2
@@ -41,3 +41,153 @@ def test_regression_get():
     actual = ztf_ref.get(oid, dr)
 
     assert expected == approx(actual)
+
+
+def _write_refpsfcat(path, sourceids):
+    import numpy as np
+    from astropy.io import fits
+
+    path.parent.mkdir(parents=True)
+    header = fits.Header({"MAGZP": 26.275, "MAGZPRMS": 0.0257, "INFOBITS": 0})
+    columns = [
+        fits.Column(name="sourceid", format="J", array=np.asarray(sourceids)),
+        fits.Column(name="mag", format="E", array=-0.5 * np.asarray(sourceids, dtype=float)),
+    ]
+    fits.HDUList([fits.PrimaryHDU(header=header), fits.BinTableHDU.from_columns(columns)]).writeto(path)
+
+
+def _local_ztf_ref(tmp_path):
+    """ZTFRef reading FITS files from tmp_path / "fits" instead of downloading them"""
+    from ztf_viewer.catalogs.ztf_ref import ZTFRef
+    from ztf_viewer.exceptions import NotFound
+
+    ztf_ref = ZTFRef(index_dir=tmp_path / "index")
+
+    def spool(fits_path, f):
+        path = tmp_path.joinpath("fits", fits_path.lstrip("/"))
+        if not path.exists():
+            raise NotFound
+        f.write(path.read_bytes())
+
+    ztf_ref._spool = spool
+    return ztf_ref
+
+
+def test_index(tmp_path):
+    import pytest
+
+    from ztf_viewer.exceptions import NotFound
+
+    fits_path = "/products/ref/000/field000633/zr/ccd07/q4/ztf_000633_zr_c07_q4_refpsfcat.fits"
+    _write_refpsfcat(tmp_path.joinpath("fits", fits_path.lstrip("/")), [5, 3, 10, 1])
+    ztf_ref = _local_ztf_ref(tmp_path)
+
+    record = ztf_ref._find(fits_path, 10)
+    assert record["sourceid"] == 10
+    assert record["mag"] == approx(-5.0)
+    assert record["magzp"] == approx(26.275)
+    assert record["infobits"] == 0
+    with pytest.raises(NotFound):
+        ztf_ref._find(fits_path, 4)
+
+    # The spooled file is used, it is not downloaded again
+    tmp_path.joinpath("fits", fits_path.lstrip("/")).unlink()
+    assert ztf_ref._find(fits_path, 1)["mag"] == approx(-0.5)
+    assert ztf_ref._find(fits_path, 5)["mag"] == approx(-2.5)
+    with pytest.raises(NotFound):
+        ztf_ref._find("/products/ref/missing_refpsfcat.fits", 1)
+
+
+def test_spool_errors(tmp_path, monkeypatch):
+    import pytest
+
+    from ztf_viewer.catalogs.ztf_ref import ZTFRef
+    from ztf_viewer.exceptions import CatalogUnavailable, NotFound
+
+    class Response:
+        def __init__(self, status_code):
+            self.status_code = status_code
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc_info):
+            pass
+
+    ztf_ref = ZTFRef(index_dir=tmp_path)
+    status_codes = {"/missing.fits": 404, "/bad-gateway.fits": 502, "/rate-limited.fits": 429}
+    monkeypatch.setattr(
+        ztf_ref._api_session, "get", lambda url, **kwargs: Response(status_codes[url.removeprefix(ztf_ref._base_fits_url)])
+    )
+
+    with pytest.raises(NotFound):
+        ztf_ref._spool("/missing.fits", None)
+    for fits_path in ("/bad-gateway.fits", "/rate-limited.fits"):
+        with pytest.raises(CatalogUnavailable):
+            ztf_ref._spool(fits_path, None)
+
+
+def test_evict(tmp_path):
+    import os
+
+    fits_paths = [
+        f"/products/ref/000/field000633/zr/ccd07/q{qid}/ztf_000633_zr_c07_q{qid}_refpsfcat.fits" for qid in (1, 2, 3)
+    ]
+    for fits_path in fits_paths:
+        _write_refpsfcat(tmp_path.joinpath("fits", fits_path.lstrip("/")), [5, 3, 10, 1])
+    ztf_ref = _local_ztf_ref(tmp_path)
+
+    ztf_ref._find(fits_paths[0], 1)
+    entry_bytes = sum(path.stat().st_size for path in ztf_ref._entry_paths(ztf_ref._index_path(fits_paths[0])))
+    ztf_ref.max_bytes = 2 * entry_bytes
+    ztf_ref._find(fits_paths[1], 1)
+    # The first file is used later than the second one
+    os.utime(ztf_ref._index_path(fits_paths[1]), (0, 0))
+    ztf_ref._find(fits_paths[0], 3)
+
+    ztf_ref._find(fits_paths[2], 1)
+    assert ztf_ref._local_fits_path(fits_paths[0]).exists()
+    for path in ztf_ref._entry_paths(ztf_ref._index_path(fits_paths[1])):
+        assert not path.exists()
+    assert ztf_ref._local_fits_path(fits_paths[2]).exists()
+
+    # Evicted file is downloaded again
+    assert ztf_ref._find(fits_paths[1], 10)["mag"] == approx(-5.0)
+    assert ztf_ref._local_fits_path(fits_paths[1]).exists()
+
+
+def test_get_many(tmp_path, monkeypatch):
+    from ztf_viewer.catalogs import ztf_ref as ztf_ref_module
+    from ztf_viewer.columnar_lc import ColumnarLightCurve
+
+    rcid = 27  # ccd07 q4
+    metas = {
+        633207400000005: {"fieldid": 633, "filter": "zr", "rcid": rcid},
+        633207400000010: {"fieldid": 633, "filter": "zr", "rcid": rcid},
+        633207400000004: {"fieldid": 633, "filter": "zr", "rcid": rcid},
+        633107400000001: {"fieldid": 633, "filter": "zg", "rcid": rcid},
+    }
+    requested = []
+
+    class FindZTFOID:
+        def find_many(self, oids, dr):
+            requested.extend(oids)
+            return {oid: ColumnarLightCurve.from_records(metas[oid], []) for oid in oids if oid in metas}
+
+    monkeypatch.setattr(ztf_ref_module, "find_ztf_oid", FindZTFOID())
+    for fltr, sourceids in [("zr", [5, 3, 10]), ("zg", [1])]:
+        fits_path = f"/products/ref/000/field000633/{fltr}/ccd07/q4/ztf_000633_{fltr}_c07_q4_refpsfcat.fits"
+        _write_refpsfcat(tmp_path.joinpath("fits", fits_path.lstrip("/")), sourceids)
+    ztf_ref = _local_ztf_ref(tmp_path)
+
+    oids = [633207400000010, 633107400000001, 633207400000004, 633207400000005, 1]
+    refs = ztf_ref.get_many(oids, "dr17")
+    assert list(refs) == [633207400000010, 633107400000001, 633207400000005]
+    assert refs[633207400000010]["mag"] == approx(-5.0)
+    assert refs[633107400000001]["mag"] == approx(-0.5)
+    assert refs[633207400000005]["magzp"] == approx(26.275)
+
+    # Both found and not found objects are cached
+    requested.clear()
+    assert list(ztf_ref.get_many(oids, "dr17")) == list(refs)
+    assert requested == []
@@ -2,7 +2,7 @@ def setup_config(item):
     from ztf_viewer import config
 
     config.CACHE_TYPE = "memory"
-    config.UNAVAILABLE_CATALOGS_CACHE_TYPE = "memory"
+    config.CIRCUIT_BREAKER_STORE_TYPE = "memory"
 
 
 def setup_cache(item):
@@ -0,0 +1,67 @@
+import numpy as np
+from pytest import approx
+
+from ztf_viewer.util import immutabledefaultdict
+
+LC = [
+    {"mjd": 58301.5, "mag": 18.0, "magerr": 0.1, "oid": "1", "filter": "zr"},
+    {"mjd": 58300.5, "mag": 17.0, "magerr": 0.1, "oid": "1", "filter": "zr"},
+    {"mjd": 58302.5, "mag": 19.0, "magerr": 0.1, "oid": "1", "filter": "zg"},
+]
+
+
+def test_fields():
+    from ztf_viewer.lc_data.plot_data import plot_data
+
+    (obs, *_) = plot_data(LC[2:], mark_size=3)
+    assert obs["mark_size"] == 3
+    assert obs["flux_Jy"] == approx(10 ** (-0.4 * (19.0 - 8.9)))
+    assert obs["fluxerr_Jy"] == approx(0.4 * np.log(10) * obs["flux_Jy"] * 0.1)
+    assert obs["ref_flux"] == 0.0
+    assert obs["diffmag"] == approx(19.0)
+    assert obs["mjd_58000"] == approx(302.5)
+    assert obs["date"] == "2018-07-03"
+
+
+def test_order_and_window():
+    from ztf_viewer.lc_data.plot_data import plot_data
+
+    data = plot_data(LC, min_mjd=58300.0, max_mjd=58302.0)
+    assert [obs["mjd"] for obs in data] == [58300.5, 58301.5]
+    data = plot_data(LC)
+    assert [obs["filter"] for obs in data] == ["zg", "zr", "zr"]
+
+
+def test_negative_diff_flux():
+    from ztf_viewer.lc_data.plot_data import plot_data
+
+    ref_mag = immutabledefaultdict(lambda: np.inf, {"1": 17.5})
+    data = plot_data(LC[:2], ref_mag=ref_mag)
+    assert data[0]["diffmag"] < np.inf
+    assert data[1]["diffflux_Jy"] < 0
+    assert data[1]["diffmag"] == np.inf
+    assert data[1]["diffmagerr_plus"] == np.inf
+
+
+def test_input_is_not_mutated():
+    from ztf_viewer.lc_data.plot_data import plot_data
+
+    lc = [obs.copy() for obs in LC]
+    plot_data(lc)
+    assert lc == LC
+
+
+def test_empty():
+    from ztf_viewer.lc_data.plot_data import plot_data
+
+    assert plot_data([]) == []
+    assert plot_data(LC, min_mjd=60000.0) == []
+
+
+def test_folded_plot_data_is_new_list():
+    from ztf_viewer.lc_data.plot_data import folded_plot_data, plot_data
+
+    data = plot_data(LC)
+    folded = folded_plot_data(data, period=2.0, offset=58300.0)
+    assert [obs["phase"] for obs in folded] == approx([0.25, 0.25, 0.75])
+    assert all("phase" not in obs for obs in data)
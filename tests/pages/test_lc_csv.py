@@ -0,0 +1,88 @@
+from io import StringIO
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from ztf_viewer.columnar_lc import ColumnarLightCurve
+from ztf_viewer.exceptions import NotFound
+
+
+def _lcs(n_oids=5, size=50):
+    rng = np.random.default_rng(0)
+    lcs = {}
+    for i in range(n_oids):
+        mjd = rng.uniform(58300.0, 58400.0, size)
+        records = [
+            {"mjd": t, "mag": mag, "magerr": 0.1, "clrcoeff": 0.05}
+            for t, mag in zip(mjd.tolist(), rng.normal(18.0, 0.5, size).tolist())
+        ]
+        lcs[633207400004730 + i] = ColumnarLightCurve.from_records({"filter": ["zg", "zr"][i % 2]}, records)
+    return lcs
+
+
+@pytest.fixture
+def lc_csv(monkeypatch):
+    from ztf_viewer import lc_export
+    from ztf_viewer.pages import lc_csv
+
+    lcs = _lcs()
+    refs = {oid: {"mag": np.float32(-7.5), "magzp": 26.0, "sigmag": np.float32(0.02)} for oid in list(lcs)[1:]}
+    monkeypatch.setattr(
+        lc_export.find_ztf_oid, "find_many", lambda oids, dr: {oid: lcs[oid] for oid in oids if oid in lcs}
+    )
+    monkeypatch.setattr(lc_export.ztf_ref, "get_many", lambda oids, dr: {oid: refs[oid] for oid in oids if oid in refs})
+    monkeypatch.setattr(lc_csv, "CHUNK_ROWS", 7)
+    return lc_csv, lcs
+
+
+def test_sorted_by_mjd(lc_csv) -> None:
+    lc_csv, lcs = lc_csv
+    chunks = list(lc_csv.iter_csv("dr17", set(lcs), min_mjd=58310.0))
+    assert len(chunks) > 1
+    df = pd.read_csv(StringIO("".join(chunks)))
+    assert list(df.columns) == lc_csv.COLUMNS
+    assert np.all(np.diff(df["mjd"]) >= 0)
+    assert df["mjd"].min() >= 58310.0
+    assert len(df) == sum(len(lc.window(min_mjd=58310.0)) for lc in lcs.values())
+
+    first_oid = min(lcs)
+    assert df[df["oid"] == first_oid]["ref"].isna().all()
+    np.testing.assert_allclose(df[df["oid"] != first_oid]["ref"], 18.5)
+
+
+def test_grouped_by_oid(lc_csv) -> None:
+    lc_csv, lcs = lc_csv
+    df = pd.read_csv(StringIO(lc_csv.get_csv("dr17", list(lcs), order="oid")))
+    assert list(df["oid"].drop_duplicates()) == list(lcs)
+    for _oid, oid_df in df.groupby("oid"):
+        assert np.all(np.diff(oid_df["mjd"]) >= 0)
+    sorted_by_mjd = pd.read_csv(StringIO(lc_csv.get_csv("dr17", list(lcs))))
+    assert (
+        df.sort_values("mjd", kind="stable")
+        .reset_index(drop=True)
+        .equals(sorted_by_mjd.sort_values("mjd", kind="stable").reset_index(drop=True))
+    )
+
+
+def test_not_found_before_streaming(lc_csv) -> None:
+    lc_csv, lcs = lc_csv
+    with pytest.raises(NotFound):
+        lc_csv.iter_csv("dr17", [min(lcs), 1])
+
+
+def test_missing_values_are_empty(monkeypatch) -> None:
+    from ztf_viewer import lc_export
+    from ztf_viewer.pages import lc_csv
+
+    lc = ColumnarLightCurve.from_records(
+        {"filter": "zr"},
+        [
+            {"mjd": 58300.0, "mag": 18.0, "magerr": 0.1, "clrcoeff": None},
+            {"mjd": 58301.0, "mag": 18.5, "magerr": 0.1, "clrcoeff": 0.05},
+        ],
+    )
+    monkeypatch.setattr(lc_export.find_ztf_oid, "find_many", lambda oids, dr: {1: lc})
+    monkeypatch.setattr(lc_export.ztf_ref, "get_many", lambda oids, dr: {})
+    lines = lc_csv.get_csv("dr17", [1]).splitlines()
+    assert lines[1:] == ["1,zr,58300.0,18.0,0.1,,,", "1,zr,58301.0,18.5,0.1,0.05,,"]
@@ -0,0 +1,178 @@
+import threading
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import pyarrow.parquet as pq
+import pytest
+
+from ztf_viewer.columnar_lc import ColumnarLightCurve
+from ztf_viewer.exceptions import CatalogUnavailable, NotFound
+
+LCS = {
+    633207400004730 + i: ColumnarLightCurve.from_records(
+        {"filter": "zr"},
+        [{"mjd": 58300.0 + j, "mag": 18.0, "magerr": 0.1, "clrcoeff": 0.05} for j in range(3)],
+    )
+    for i in range(5)
+}
+
+
+@pytest.fixture
+def bulk_export(monkeypatch, tmp_path):
+    from ztf_viewer import bulk_export
+
+    calls = []
+
+    def find_many(oids, dr, executor=None):
+        calls.append(list(oids))
+        return {oid: LCS[oid] for oid in oids if oid in LCS}
+
+    monkeypatch.setattr(bulk_export.find_ztf_oid, "find_many", find_many)
+    monkeypatch.setattr(bulk_export.ztf_ref, "get_many", lambda oids, dr: {})
+    monkeypatch.setattr(bulk_export, "BATCH_SIZE", 2)
+    exporter = bulk_export.BulkExport(root=tmp_path, rate=1000.0, executor=ThreadPoolExecutor(max_workers=1))
+    return exporter, calls
+
+
+def _wait(exporter, job_id, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        state = exporter.status(job_id)
+        if state["status"] in {"done", "failed"}:
+            return state
+        time.sleep(0.01)
+    raise TimeoutError
+
+
+def test_parquet(bulk_export) -> None:
+    exporter, calls = bulk_export
+    oids = [*LCS, 1]
+    job_id = exporter.submit("dr17", oids, fmt="parquet", min_mjd=58301.0)
+    state = _wait(exporter, job_id)
+    assert state["status"] == "done"
+    assert state["total"] == state["processed"] == 6
+    assert state["found"] == 5
+    assert state["not_found"] == [1]
+    assert calls == [oids[:2], oids[2:4], oids[4:]]
+
+    table = pq.read_table(exporter.result_path(job_id))
+    assert table.num_rows == 5 * 2
+    assert set(table.column("oid").to_pylist()) == set(LCS)
+    assert table.schema.metadata[b"dr"] == b"dr17"
+
+
+def test_zip(bulk_export) -> None:
+    exporter, _calls = bulk_export
+    job_id = exporter.submit("dr17", list(LCS), fmt="zip")
+    assert _wait(exporter, job_id)["status"] == "done"
+    with zipfile.ZipFile(exporter.result_path(job_id)) as zf:
+        assert sorted(zf.namelist()) == sorted(f"{oid}.csv" for oid in LCS)
+        lines = zf.read(f"{min(LCS)}.csv").decode().splitlines()
+    assert lines[0] == "oid,filter,mjd,mag,magerr,clrcoeff,ref,ref_err"
+    assert len(lines) == 1 + 3
+
+
+def test_failed(bulk_export, monkeypatch) -> None:
+    from ztf_viewer import bulk_export as module
+
+    exporter, _calls = bulk_export
+
+    def find_many(oids, dr, executor=None):
+        raise CatalogUnavailable
+
+    monkeypatch.setattr(module.find_ztf_oid, "find_many", find_many)
+    monkeypatch.setattr(module, "BATCH_ATTEMPTS", 1)
+    state = _wait(exporter, exporter.submit("dr17", list(LCS)))
+    assert state["status"] == "failed"
+    assert not exporter.result_path(state["id"]).exists()
+
+
+class _Response:
+    def __init__(self, oid, status_code):
+        self.status_code = status_code
+        self.url = "https://example.org"
+        self.text = ""
+        self._oid = oid
+
+    def json(self):
+        obs = {"mjd": 58300.0, "mag": 18.0, "magerr": 0.1, "clrcoeff": 0.05}
+        return {str(self._oid): {"meta": {"filter": "zg"}, "lc": [obs]}}
+
+
+def test_transient_errors_are_retried(bulk_export, monkeypatch) -> None:
+    import requests
+
+    from ztf_viewer import bulk_export as module
+    from ztf_viewer.catalogs.ztf_dr import FindZTFOID
+
+    exporter, _calls = bulk_export
+    find_ztf_oid = FindZTFOID()
+    # The first request of every object fails with a server error or a timeout
+    failures = {700000000000001: _Response(700000000000001, 502), 700000000000002: requests.Timeout("read timeout")}
+    requested = []
+
+    threads = set()
+
+    def get(url, params, timeout):
+        oid = params["oid"]
+        requested.append(oid)
+        threads.add(threading.current_thread().name)
+        failure = failures.pop(oid, None)
+        if isinstance(failure, Exception):
+            raise failure
+        if failure is not None:
+            return failure
+        return _Response(oid, 200)
+
+    monkeypatch.setattr(find_ztf_oid._api_session, "get", get)
+    monkeypatch.setattr(module, "find_ztf_oid", find_ztf_oid)
+    monkeypatch.setattr(module, "BATCH_RETRY_DELAY", 0.0)
+
+    oids = [700000000000001, 700000000000002]
+    state = _wait(exporter, exporter.submit("dr17", oids))
+    assert state["status"] == "done"
+    assert state["found"] == 2
+    assert state["not_found"] == []
+    assert sorted(requested) == sorted(oids * 2)
+    # Interactive requests' pool is not used
+    assert all(name.startswith("bulk-export-fetch") for name in threads)
+
+
+def test_stale(bulk_export, monkeypatch) -> None:
+    from ztf_viewer import bulk_export as module
+
+    exporter, _calls = bulk_export
+    # Jobs are never run, as if their process was stopped
+    monkeypatch.setattr(exporter, "executor", SimpleNamespace(submit=lambda *args, **kwargs: None))
+    job_id = exporter.submit("dr17", list(LCS))
+    assert exporter.status(job_id)["status"] == "queued"
+
+    now = time.time()
+    monkeypatch.setattr(module.time, "time", lambda: now + module.QUEUED_TIMEOUT + 1.0)
+    state = exporter.status(job_id)
+    assert state["status"] == "failed"
+    assert state["error"] == "Job was not started"
+
+
+def test_invalid(bulk_export) -> None:
+    exporter, _calls = bulk_export
+    with pytest.raises(ValueError):
+        exporter.submit("dr17", [], fmt="parquet")
+    with pytest.raises(ValueError):
+        exporter.submit("dr17", [1], fmt="xlsx")
+    with pytest.raises(ValueError):
+        exporter.submit("dr0", [1])
+    with pytest.raises(NotFound):
+        exporter.status("../../etc")
+    with pytest.raises(NotFound):
+        exporter.status("0" * 32)
+
+
+def test_rate(bulk_export) -> None:
+    exporter, _calls = bulk_export
+    exporter.rate = 20.0
+    start = time.monotonic()
+    assert _wait(exporter, exporter.submit("dr17", list(LCS)))["status"] == "done"
+    assert time.monotonic() - start >= len(LCS) / exporter.rate - 0.01
@@ -0,0 +1,38 @@
+import pytest
+
+from ztf_viewer.cache_backends import MemoryCache, RedisCache, TieredCache
+
+
+def _check_batch(cache) -> None:
+    calls = []
+
+    @cache(ttl=60)
+    def f(x):
+        calls.append(x)
+        return x + 1
+
+    f(1)
+    keys = {x: f.cache_key(x) for x in (1, 2)}
+    assert f.cache_get_many(keys.values()) == {keys[1]: 2}
+    f.cache_set_many({keys[2]: 3})
+    assert f(2) == 3
+    assert calls == [1]
+
+
+def test_memory_batch() -> None:
+    _check_batch(MemoryCache(maxsize=16, default_ttl=60))
+
+
+def test_redis_batch(redisdb) -> None:
+    _check_batch(RedisCache(redisdb, default_ttl=60))
+    assert redisdb.ttl(next(iter(redisdb.keys("*")))) == pytest.approx(60, abs=1)
+
+
+def test_tiered_batch(redisdb) -> None:
+    cache = TieredCache(redisdb, local_maxsize=16, local_ttl=60, default_ttl=60)
+    _check_batch(cache)
+
+    other = TieredCache(redisdb, local_maxsize=16, local_ttl=60, default_ttl=60)
+    keys = list(cache.local)
+    assert other.get_many(keys) == cache.get_many(keys)
+    assert other.stats["redis_hits"] == len(keys)
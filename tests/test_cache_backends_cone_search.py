@@ -0,0 +1,64 @@
+import pytest
+
+from ztf_viewer.cache_backends import MemoryCache
+from ztf_viewer.exceptions import NotFound
+
+# Distances of "objects" from the cone centre, arcsec
+OBJECTS = {"a": 1.0, "b": 5.0, "c": 10.0}
+
+
+def subset(value, ra, dec, radius_arcsec):
+    value = {name: sep for name, sep in value.items() if sep <= radius_arcsec}
+    if not value:
+        raise NotFound
+    return value
+
+
+def make_query(cache):
+    class Query:
+        def __init__(self):
+            self.calls = []
+
+        @cache.cone_search(subset=subset, ttl=60)
+        def find(self, ra, dec, radius_arcsec, dr):
+            self.calls.append(radius_arcsec)
+            return subset(OBJECTS, ra, dec, radius_arcsec)
+
+    return Query()
+
+
+def test_smaller_radius_is_served_from_cache() -> None:
+    query = make_query(MemoryCache(maxsize=16, default_ttl=60))
+    assert query.find(10.0, 20.0, 6.0, dr="dr17") == {"a": 1.0, "b": 5.0}
+    assert query.find(10.0, 20.0, 2.0, dr="dr17") == {"a": 1.0}
+    with pytest.raises(NotFound):
+        query.find(10.0, 20.0, 0.5, dr="dr17")
+    assert query.calls == [6.0]
+
+    assert query.find(10.0, 20.0, 20.0, dr="dr17") == OBJECTS
+    assert query.find(10.0, 20.0, 6.0, dr="dr17") == {"a": 1.0, "b": 5.0}
+    assert query.calls == [6.0, 20.0]
+
+
+def test_positions_and_args_are_different_keys() -> None:
+    query = make_query(MemoryCache(maxsize=16, default_ttl=60))
+    query.find(10.0, 20.0, 6.0, dr="dr17")
+    query.find(10.0, 20.1, 2.0, dr="dr17")
+    query.find(10.0, 20.0, 2.0, dr="dr23")
+    assert query.calls == [6.0, 2.0, 2.0]
+
+
+def test_positional_and_keyword_args_are_the_same_key() -> None:
+    query = make_query(MemoryCache(maxsize=16, default_ttl=60))
+    query.find(10.0, 20.0, 6.0, "dr17")
+    query.find(ra=10.0, dec=20.0, radius_arcsec=2.0, dr="dr17")
+    query.find(10.0, 20.0, 4.0, dr="dr17")
+    assert query.calls == [6.0]
+
+
+def test_empty_cone_is_cached() -> None:
+    query = make_query(MemoryCache(maxsize=16, default_ttl=60))
+    for _ in range(2):
+        with pytest.raises(NotFound):
+            query.find(10.0, 20.0, 0.5, dr="dr17")
+    assert query.calls == [0.5]
@@ -0,0 +1,100 @@
+import time
+
+import pytest
+
+from ztf_viewer.cache_backends import MemoryCache, RedisCache
+from ztf_viewer.exceptions import NotFound
+
+
+def _check_not_found_is_cached(cache) -> None:
+    calls = []
+
+    @cache(ttl=60, negative_ttl=1)
+    def f(x):
+        calls.append(x)
+        if x < 0:
+            raise NotFound(f"{x} is negative")
+        return x
+
+    for _ in range(3):
+        with pytest.raises(NotFound, match="-1 is negative"):
+            f(-1)
+    assert calls == [-1]
+    assert f(1) == 1
+    assert f(1) == 1
+    assert calls == [-1, 1]
+    assert cache.stats["negative_stores"] == 1
+    assert cache.stats["negative_hits"] == 2
+    assert cache.stats["hits"] == 1
+    assert cache.stats["misses"] == 2
+
+    # negative result expires earlier than the positive one
+    time.sleep(1.1)
+    with pytest.raises(NotFound):
+        f(-1)
+    assert calls == [-1, 1, -1]
+
+
+def test_memory_not_found_is_cached() -> None:
+    _check_not_found_is_cached(MemoryCache(maxsize=16, default_ttl=60))
+
+
+def test_redis_not_found_is_cached(redisdb) -> None:
+    _check_not_found_is_cached(RedisCache(redisdb, default_ttl=60))
+
+
+def test_not_found_is_not_cached_by_default() -> None:
+    cache = MemoryCache(maxsize=16, default_ttl=60)
+    calls = []
+
+    @cache(ttl=60)
+    def f(x):
+        calls.append(x)
+        raise NotFound
+
+    for _ in range(2):
+        with pytest.raises(NotFound):
+            f(1)
+    assert calls == [1, 1]
+    assert cache.stats["negative_stores"] == 0
+
+
+def test_batch_access_to_not_found() -> None:
+    cache = MemoryCache(maxsize=16, default_ttl=60)
+
+    @cache(ttl=60, negative_ttl=60)
+    def f(x):
+        raise NotFound
+
+    keys = [f.cache_key(x) for x in range(3)]
+    with pytest.raises(NotFound):
+        f(0)
+    f.cache_set_not_found(keys[1:2])
+    cached = f.cache_get_many(keys)
+    assert set(cached) == set(keys[:2])
+    assert all(isinstance(value, NotFound) for value in cached.values())
+
+
+def test_empty_cone_is_cached_with_negative_ttl() -> None:
+    cache = MemoryCache(maxsize=16, default_ttl=60)
+    calls = []
+
+    class Query:
+        @cache.cone_search(subset=lambda value, ra, dec, radius: value, ttl=60, negative_ttl=0.2)
+        def find(self, ra, dec, radius_arcsec):
+            calls.append(radius_arcsec)
+            raise NotFound
+
+    query = Query()
+    with pytest.raises(NotFound):
+        query.find(10.0, 20.0, 5.0)
+    # a smaller cone within the empty one is empty too
+    with pytest.raises(NotFound):
+        query.find(10.0, 20.0, 2.0)
+    assert calls == [5.0]
+    assert cache.stats["negative_hits"] == 1
+
+    time.sleep(0.3)
+    with pytest.raises(NotFound):
+        query.find(10.0, 20.0, 2.0)
+    assert calls == [5.0, 2.0]
@@ -0,0 +1,36 @@
+import pickle
+
+import numpy as np
+import pytest
+from numpy.testing import assert_array_equal
+
+from ztf_viewer.cache_backends import SERIALIZERS, BufferSerializer
+from ztf_viewer.columnar_lc import ColumnarLightCurve
+
+
+@pytest.mark.parametrize("name", SERIALIZERS)
+def test_roundtrip(name) -> None:
+    serializer = SERIALIZERS[name]
+    rng = np.random.default_rng(0)
+    records = [{"mjd": mjd, "mag": mag} for mjd, mag in zip(rng.uniform(58000, 60000, 100), rng.normal(18, 1, 100))]
+    lc = ColumnarLightCurve.from_records({"filter": "zg"}, records)
+    value = {"lc": lc, "other": [1, "a", None]}
+    loaded = serializer.loads(serializer.dumps(value))
+    assert loaded["other"] == value["other"]
+    assert loaded["lc"].meta == lc.meta
+    assert_array_equal(loaded["lc"]["mjd"], lc["mjd"])
+    assert_array_equal(loaded["lc"]["mag"], lc["mag"])
+
+
+def test_buffer_serializer_reads_plain_pickle() -> None:
+    value = {"a": [1, 2, 3]}
+    assert BufferSerializer().loads(pickle.dumps(value)) == value
+
+
+def test_buffer_serializer_zero_copy() -> None:
+    array = np.arange(1000, dtype=np.float64)
+    data = BufferSerializer().dumps(array)
+    loaded = BufferSerializer().loads(data)
+    assert_array_equal(loaded, array)
+    assert not loaded.flags.owndata
+    assert not loaded.flags.writeable
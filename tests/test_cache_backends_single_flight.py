@@ -0,0 +1,76 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from ztf_viewer.cache_backends import MemoryCache, RedisCache
+
+
+def _concurrent_calls(cache, n=8):
+    calls = []
+    barrier = threading.Barrier(n)
+
+    @cache(ttl=60)
+    def f(x):
+        calls.append(x)
+        time.sleep(0.5)
+        return x + 1
+
+    def call(x):
+        barrier.wait()
+        return f(x)
+
+    with ThreadPoolExecutor(max_workers=n) as executor:
+        results = list(executor.map(call, [1] * n))
+    return calls, results
+
+
+def test_memory_single_flight() -> None:
+    cache = MemoryCache(maxsize=16, default_ttl=60)
+    calls, results = _concurrent_calls(cache)
+    assert calls == [1]
+    assert results == [2] * len(results)
+
+
+def test_memory_different_keys_are_not_blocked() -> None:
+    cache = MemoryCache(maxsize=16, default_ttl=60)
+    calls = []
+
+    @cache(ttl=60)
+    def f(x):
+        calls.append(x)
+        return x
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        assert list(executor.map(f, [1, 2])) == [1, 2]
+    assert sorted(calls) == [1, 2]
+    assert cache._flights == {}
+
+
+def test_redis_single_flight(redisdb) -> None:
+    cache = RedisCache(redisdb, default_ttl=60)
+    calls, results = _concurrent_calls(cache)
+    assert calls == [1]
+    assert results == [2] * len(results)
+
+
+def test_redis_single_flight_across_caches(redisdb) -> None:
+    """Two cache objects sharing Redis simulate two worker processes"""
+    caches = [RedisCache(redisdb, default_ttl=60) for _ in range(2)]
+    calls = []
+    barrier = threading.Barrier(len(caches))
+
+    def f(x):
+        calls.append(x)
+        time.sleep(0.5)
+        return x + 1
+
+    functions = [cache(ttl=60)(f) for cache in caches]
+
+    def call(func):
+        barrier.wait()
+        return func(1)
+
+    with ThreadPoolExecutor(max_workers=len(functions)) as executor:
+        results = list(executor.map(call, functions))
+    assert calls == [1]
+    assert results == [2, 2]
@@ -0,0 +1,83 @@
+import time
+
+import pytest
+
+from ztf_viewer.cache_backends import MemoryCache, RedisCache
+from ztf_viewer.exceptions import CatalogUnavailable, NotFound
+
+
+def _wait_for(condition, timeout=2.0):
+    t = time.monotonic()
+    while not condition():
+        assert time.monotonic() - t < timeout
+        time.sleep(0.01)
+
+
+def _check_stale_while_revalidate(cache) -> None:
+    calls = []
+
+    @cache(ttl=60, soft_ttl=0.2)
+    def f(x):
+        calls.append(x)
+        return len(calls)
+
+    assert f(1) == 1
+    assert f(1) == 1
+    time.sleep(0.3)
+    # stale value is returned immediately, refresh runs in background
+    assert f(1) == 1
+    _wait_for(lambda: f(1) == 2)
+    assert calls == [1, 1]
+
+
+def test_memory_stale_while_revalidate() -> None:
+    _check_stale_while_revalidate(MemoryCache(maxsize=16, default_ttl=60))
+
+
+def test_redis_stale_while_revalidate(redisdb) -> None:
+    _check_stale_while_revalidate(RedisCache(redisdb, default_ttl=60))
+
+
+def test_stale_value_is_served_if_refresh_fails() -> None:
+    cache = MemoryCache(maxsize=16, default_ttl=60)
+    calls = []
+
+    @cache(ttl=60, soft_ttl=0.1)
+    def f(x):
+        calls.append(x)
+        if len(calls) > 1:
+            raise CatalogUnavailable
+        return x
+
+    assert f(1) == 1
+    time.sleep(0.2)
+    assert f(1) == 1
+    _wait_for(lambda: len(calls) == 2)
+    time.sleep(0.05)
+    assert f(1) == 1
+
+
+def test_cone_search_stale_while_revalidate() -> None:
+    cache = MemoryCache(maxsize=16, default_ttl=60)
+    radii = []
+
+    def subset(value, ra, dec, radius_arcsec):
+        return [r for r in value if r <= radius_arcsec]
+
+    class Query:
+        @cache.cone_search(subset=subset, ttl=60, soft_ttl=0.1)
+        def find(self, ra, dec, radius_arcsec):
+            radii.append(radius_arcsec)
+            if len(radii) > 1:
+                raise NotFound
+            return [1.0, 5.0]
+
+    query = Query()
+    assert query.find(0.0, 0.0, 10.0) == [1.0, 5.0]
+    time.sleep(0.2)
+    assert query.find(0.0, 0.0, 2.0) == [1.0]
+    # the largest cone is refreshed, now it is empty
+    _wait_for(lambda: radii == [10.0, 10.0])
+    time.sleep(0.05)
+    with pytest.raises(NotFound):
+        query.find(0.0, 0.0, 2.0)
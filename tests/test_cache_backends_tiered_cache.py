@@ -0,0 +1,60 @@
+from ztf_viewer.cache_backends import TieredCache
+
+
+def test_local_hit(redisdb) -> None:
+    cache = TieredCache(redisdb, local_maxsize=16, local_ttl=60, default_ttl=60)
+    calls = []
+
+    @cache(ttl=60)
+    def f(x):
+        calls.append(x)
+        return x + 1
+
+    assert f(1) == 2
+    assert f(1) == 2
+    assert calls == [1]
+    assert cache.stats["local_hits"] == 1
+    assert cache.stats["redis_hits"] == 0
+
+
+def test_redis_hit(redisdb) -> None:
+    cache = TieredCache(redisdb, local_maxsize=16, local_ttl=60, default_ttl=60)
+    calls = []
+
+    @cache(ttl=60)
+    def f(x):
+        calls.append(x)
+        return x + 1
+
+    assert f(1) == 2
+    cache.clear_local()
+    assert f(1) == 2
+    assert calls == [1]
+    assert cache.stats["redis_hits"] == 1
+
+
+def test_shared_redis_tier(redisdb) -> None:
+    cache_a = TieredCache(redisdb, local_maxsize=16, local_ttl=60, default_ttl=60)
+    cache_b = TieredCache(redisdb, local_maxsize=16, local_ttl=60, default_ttl=60)
+    calls = []
+
+    def f(x):
+        calls.append(x)
+        return x + 1
+
+    assert cache_a(ttl=60)(f)(1) == 2
+    assert cache_b(ttl=60)(f)(1) == 2
+    assert calls == [1]
+    assert cache_b.stats["redis_hits"] == 1
+
+
+def test_local_maxsize(redisdb) -> None:
+    cache = TieredCache(redisdb, local_maxsize=1, local_ttl=60, default_ttl=60)
+
+    @cache(ttl=60)
+    def f(x):
+        return x
+
+    f(1)
+    f(2)
+    assert len(cache.local) == 1
@@ -0,0 +1,70 @@
+import time
+
+import pytest
+
+from ztf_viewer.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, LocalBreakerStore, RedisBreakerStore
+
+
+@pytest.fixture(params=["local", "redis"])
+def store(request):
+    if request.param == "local":
+        return LocalBreakerStore(window=60.0)
+    return RedisBreakerStore(request.getfixturevalue("redisdb"), window=60.0)
+
+
+def breaker(store, **kwargs):
+    return CircuitBreaker("test", store, **(dict(min_calls=4, open_seconds=0.5) | kwargs))
+
+
+def test_opens_on_failure_rate(store) -> None:
+    cb = breaker(store)
+    cb.record_success(0.1)
+    cb.record_success(0.1)
+    cb.record_failure()
+    assert cb.state == CLOSED
+    cb.record_failure()
+    assert cb.state == OPEN
+    assert not cb.allow()
+
+
+def test_slow_calls_are_failures(store) -> None:
+    cb = breaker(store, slow_call_seconds=1.0)
+    for _ in range(4):
+        cb.record_success(2.0)
+    assert cb.state == OPEN
+
+
+def test_single_probe(store) -> None:
+    cb = breaker(store)
+    for _ in range(4):
+        cb.record_failure()
+    time.sleep(0.6)
+    assert cb.state == HALF_OPEN
+    assert cb.allow()
+    assert not cb.allow()
+    cb.record_success(0.1)
+    assert cb.state == CLOSED
+    assert cb.allow()
+
+
+def test_failed_probe_backoff(store) -> None:
+    cb = breaker(store)
+    for _ in range(4):
+        cb.record_failure()
+    time.sleep(0.6)
+    assert cb.allow()
+    cb.record_failure()
+    assert cb.state == OPEN
+    assert store.get("test").openings == 1
+    time.sleep(0.6)
+    # open for 2 * open_seconds now
+    assert cb.state == OPEN
+    time.sleep(0.5)
+    assert cb.allow()
+
+
+def test_shared_between_instances(store) -> None:
+    cb = breaker(store)
+    for _ in range(4):
+        cb.record_failure()
+    assert not breaker(store).allow()
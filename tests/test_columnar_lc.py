@@ -0,0 +1,61 @@
+import pickle
+
+import numpy as np
+import pytest
+from numpy.testing import assert_array_equal
+
+from ztf_viewer.columnar_lc import ColumnarLightCurve
+
+META = {"filter": "zr", "fieldid": 633, "rcid": 27}
+RECORDS = [
+    {"mjd": 58300.1, "mag": 18.5, "magerr": 0.05, "clrcoeff": 0.1},
+    {"mjd": 58301.2, "mag": 18.7, "magerr": 0.07, "clrcoeff": 0.2},
+    {"mjd": 58302.3, "mag": 18.6, "magerr": 0.06, "clrcoeff": 0.1},
+]
+
+
+def test_from_json_records_roundtrip() -> None:
+    lc = ColumnarLightCurve.from_json({"meta": META, "lc": RECORDS})
+    assert lc.meta == META
+    assert len(lc) == len(RECORDS)
+    assert lc.records() == RECORDS
+
+
+def test_records_are_new_objects() -> None:
+    lc = ColumnarLightCurve.from_records(META, RECORDS)
+    records = lc.records()
+    records[0]["mag"] = 0.0
+    assert lc.records() == RECORDS
+
+
+def test_read_only() -> None:
+    lc = ColumnarLightCurve.from_records(META, RECORDS)
+    with pytest.raises(ValueError):
+        lc["mag"][0] = 0.0
+
+
+def test_window() -> None:
+    lc = ColumnarLightCurve.from_records(META, RECORDS)
+    assert_array_equal(lc.window(58301.0, 58302.0)["mjd"], [58301.2])
+    assert_array_equal(lc.window(min_mjd=58301.0)["mjd"], [58301.2, 58302.3])
+    assert lc.records(max_mjd=58301.0) == RECORDS[:1]
+
+
+def test_empty() -> None:
+    lc = ColumnarLightCurve.from_records(META, [])
+    assert len(lc) == 0
+    assert lc.records() == []
+    assert len(lc.window(0.0, 1.0)) == 0
+
+
+def test_pickle() -> None:
+    lc = ColumnarLightCurve.from_records(META, RECORDS)
+    loaded = pickle.loads(pickle.dumps(lc))
+    assert loaded.meta == META
+    assert loaded.records() == RECORDS
+    assert not loaded["mjd"].flags.writeable
+
+
+def test_null_values() -> None:
+    lc = ColumnarLightCurve.from_records(META, [{"mjd": 58300.0, "clrcoeff": None}])
+    assert np.isnan(lc["clrcoeff"][0])
@@ -0,0 +1,87 @@
+import threading
+import time
+
+import pytest
+
+from ztf_viewer.executor import BoundedExecutor, ExecutorFull
+from ztf_viewer.util import timeout
+
+
+def test_call() -> None:
+    executor = BoundedExecutor(max_workers=1, max_queue=0)
+    assert executor.call(lambda x: x + 1, 1, timeout=1.0) == 2
+    assert executor.stats["completed"] == 1
+
+
+def test_timeout_does_not_wait() -> None:
+    executor = BoundedExecutor(max_workers=1, max_queue=0)
+    release = threading.Event()
+
+    t = time.monotonic()
+    with pytest.raises(TimeoutError):
+        executor.call(release.wait, timeout=0.1)
+    assert time.monotonic() - t < 1.0
+    assert executor.stats["timed_out"] == 1
+    assert executor.stats["abandoned_running"] == 1
+
+    with pytest.raises(ExecutorFull):
+        executor.submit(lambda: None)
+    assert executor.stats["rejected"] == 1
+
+    release.set()
+    time.sleep(0.1)
+    assert executor.stats["abandoned_running"] == 0
+    assert executor.call(lambda: 1, timeout=1.0) == 1
+
+
+def test_queued_task_is_cancelled() -> None:
+    executor = BoundedExecutor(max_workers=1, max_queue=1)
+    release = threading.Event()
+    executor.submit(release.wait)
+    time.sleep(0.05)
+    assert executor.stats["running"] == 1
+
+    with pytest.raises(TimeoutError):
+        executor.call(lambda: None, timeout=0.1)
+    assert executor.stats["cancelled"] == 1
+    assert executor.stats["queue_depth"] == 0
+    release.set()
+
+
+def test_timeout_decorator() -> None:
+    class MyException(Exception):
+        def __init__(self, value):
+            self.value = value
+
+    executor = BoundedExecutor(max_workers=1, max_queue=0)
+
+    @timeout(0.1, exception=MyException, exception_kwargs=dict(value=1), executor=executor)
+    def f(seconds):
+        time.sleep(seconds)
+        return seconds
+
+    assert f(0.0) == 0.0
+    with pytest.raises(MyException):
+        f(0.5)
+
+
+def test_timeout_decorator_full_exception() -> None:
+    class Timeout(Exception):
+        pass
+
+    class Full(Exception):
+        pass
+
+    executor = BoundedExecutor(max_workers=1, max_queue=0)
+    release = threading.Event()
+    executor.submit(release.wait)
+
+    @timeout(0.1, exception=Timeout, executor=executor, full_exception=Full)
+    def f():
+        return 1
+
+    try:
+        with pytest.raises(Full):
+            f()
+    finally:
+        release.set()
@@ -0,0 +1,57 @@
+import subprocess
+import sys
+
+from immutabledict import immutabledict
+
+from ztf_viewer.figure_render import figure_digest, folded_figure, render
+
+DATA = {
+    "1": [
+        {"mjd": 58300.0, "mag": 18.0, "magerr": 0.1, "filter": "zr"},
+        {"mjd": 58301.0, "mag": 18.2, "magerr": 0.1, "filter": "zr"},
+    ],
+}
+
+
+def test_figure_digest() -> None:
+    digest = figure_digest("lc", 1, DATA, fmt="png", caption=False, title=None)
+    assert digest == figure_digest("lc", 1, immutabledict(DATA), title=None, caption=False, fmt="png")
+    assert digest != figure_digest("lc", 1, DATA, fmt="pdf", caption=False, title=None)
+    assert digest != figure_digest("lc", 2, DATA, fmt="png", caption=False, title=None)
+    other_data = {"1": DATA["1"][:1]}
+    assert digest != figure_digest("lc", 1, other_data, fmt="png", caption=False, title=None)
+
+
+def test_render_png() -> None:
+    img = render("lc", "1", DATA, fmt="png", caption=False, title=None)
+    assert img.startswith(b"\x89PNG")
+
+
+def test_render_svg() -> None:
+    img = render("lc", "1", DATA, fmt="svg", caption=False, title=None)
+    assert b"<svg" in img
+
+
+def test_raster_does_not_load_pgf() -> None:
+    code = (
+        "import sys\n"
+        "from ztf_viewer.figure_render import plot_data\n"
+        f"plot_data('1', {DATA!r}, fmt='png', caption=True)\n"
+        "assert 'matplotlib.backends.backend_pgf' not in sys.modules\n"
+    )
+    subprocess.run([sys.executable, "-c", code], check=True)
+
+
+def test_folded_figure_artist_per_filter() -> None:
+    data = {
+        oid: [{"folded_time": 0.1 * i, "phase": 0.2 * i, "mag": 18.0, "magerr": 0.1, "filter": fltr} for i in range(5)]
+        for oid, fltr in [("1", "zr"), ("2", "zr"), ("3", "zr"), ("4", "zg"), ("5", "zg")]
+    }
+    fig = folded_figure("1", data, period=0.5, repeat=2, caption=False)
+    (ax,) = fig.axes[:1]
+    # object and neighbours in zr, neighbours in zg
+    assert len(ax.containers) == 3
+    assert len(ax.collections) == 2 * 3
+    assert [text.get_text() for text in ax.get_legend().get_texts()] == ["zg", "zr"]
+    neighbours_zr = ax.containers[1]
+    assert len(neighbours_zr.lines[0].get_xdata()) == 2 * 5 * 4
@@ -0,0 +1,80 @@
+from io import BytesIO
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+from astropy.table import Table
+
+from ztf_viewer.columnar_lc import ColumnarLightCurve
+from ztf_viewer.lc_export import (
+    COLUMNS,
+    fits_bytes,
+    iter_arrow_ipc,
+    parquet_bytes,
+    table_columns,
+)
+
+LCS = {
+    633207400004730: ColumnarLightCurve.from_records(
+        {"filter": "zr"},
+        [
+            {"mjd": 58302.0, "mag": 18.0, "magerr": 0.1, "clrcoeff": 0.05},
+            {"mjd": 58300.0, "mag": 18.1, "magerr": 0.1, "clrcoeff": 0.05},
+        ],
+    ),
+    633207400004731: ColumnarLightCurve.from_records(
+        {"filter": "zg"},
+        [{"mjd": 58301.0, "mag": 19.0, "magerr": 0.2, "clrcoeff": 0.1}],
+    ),
+    633207400004732: ColumnarLightCurve.from_records({"filter": "zi"}, []),
+}
+REFS = {633207400004730: {"mag": np.float32(-7.5), "magzp": 26.0, "sigmag": np.float32(0.02)}}
+
+
+def test_table_columns() -> None:
+    columns = table_columns(LCS, REFS)
+    assert list(columns) == COLUMNS
+    np.testing.assert_array_equal(columns["mjd"], [58300.0, 58301.0, 58302.0])
+    np.testing.assert_array_equal(columns["oid"], [633207400004730, 633207400004731, 633207400004730])
+    np.testing.assert_array_equal(columns["filter"], ["zr", "zg", "zr"])
+    np.testing.assert_allclose(columns["ref"], [18.5, np.nan, 18.5])
+
+    columns = table_columns(LCS, REFS, order="oid", max_mjd=58301.5)
+    np.testing.assert_array_equal(columns["mjd"], [58300.0, 58301.0])
+
+    with pytest.raises(ValueError):
+        table_columns(LCS, REFS, order="filter")
+
+
+def test_parquet() -> None:
+    table = pq.read_table(BytesIO(parquet_bytes("dr17", LCS, REFS)))
+    assert table.column_names == COLUMNS
+    assert table.schema.metadata[b"dr"] == b"dr17"
+    assert table.column("ref").null_count == 1
+    assert table.column("mjd").to_pylist() == [58300.0, 58301.0, 58302.0]
+
+
+@pytest.mark.parametrize("order", ["mjd", "oid"])
+def test_arrow_ipc(order) -> None:
+    chunks = list(iter_arrow_ipc("dr17", LCS, REFS, order=order, max_chunksize=2))
+    table = pa.ipc.open_stream(b"".join(chunks)).read_all()
+    assert table.column_names == COLUMNS
+    assert table.num_rows == 3
+    if order == "mjd":
+        assert table.column("mjd").to_pylist() == [58300.0, 58301.0, 58302.0]
+    else:
+        assert table.column("oid").to_pylist() == [633207400004730, 633207400004730, 633207400004731]
+
+
+def test_fits() -> None:
+    table = Table.read(BytesIO(fits_bytes("dr17", LCS, REFS)), format="fits")
+    assert table.colnames == COLUMNS
+    assert table.meta["DR"] == "dr17"
+    assert list(table["filter"]) == ["zr", "zg", "zr"]
+
+
+def test_empty() -> None:
+    lcs = {633207400004732: LCS[633207400004732]}
+    assert pq.read_table(BytesIO(parquet_bytes("dr17", lcs, {}))).num_rows == 0
+    assert len(Table.read(BytesIO(fits_bytes("dr17", lcs, {})), format="fits")) == 0
@@ -0,0 +1,71 @@
+from functools import partial
+
+from prometheus_client import REGISTRY
+
+from ztf_viewer.cache_backends import MemoryCache, RedisCache
+from ztf_viewer.metrics import observe_cache, observe_callback
+
+
+def _sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+def test_cache_events_are_observed(redisdb) -> None:
+    cache = RedisCache(redisdb, default_ttl=60)
+    cache.observer = observe_cache
+
+    @cache(ttl=60)
+    def f(x):
+        return list(range(x))
+
+    function = f"{f.__module__}.{f.__qualname__}"
+    hits = _sample("ztf_viewer_cache_events_total", function=function, event="hits")
+    misses = _sample("ztf_viewer_cache_events_total", function=function, event="misses")
+    sizes = _sample("ztf_viewer_cache_value_bytes_count", function=function)
+
+    for _ in range(3):
+        f(100)
+    assert _sample("ztf_viewer_cache_events_total", function=function, event="hits") == hits + 2
+    assert _sample("ztf_viewer_cache_events_total", function=function, event="misses") == misses + 1
+    assert _sample("ztf_viewer_cache_value_bytes_count", function=function) == sizes + 1
+    assert _sample("ztf_viewer_cache_value_bytes_sum", function=function) > 100
+
+
+def test_memory_cache_does_not_observe_sizes() -> None:
+    cache = MemoryCache(maxsize=16, default_ttl=60)
+    cache.observer = observe_cache
+
+    @cache(ttl=60)
+    def g(x):
+        return x
+
+    function = f"{g.__module__}.{g.__qualname__}"
+    g(1)
+    assert _sample("ztf_viewer_cache_events_total", function=function, event="stores") == 1
+    assert _sample("ztf_viewer_cache_value_bytes_count", function=function) == 0
+
+
+def test_observe_callback() -> None:
+    @observe_callback
+    def callback_for_test(x):
+        return x + 1
+
+    count = _sample("ztf_viewer_callback_seconds_count", callback="callback_for_test")
+    assert callback_for_test(1) == 2
+    assert callback_for_test.__name__ == "callback_for_test"
+    assert _sample("ztf_viewer_callback_seconds_count", callback="callback_for_test") == count + 1
+
+
+def test_observe_callback_partial() -> None:
+    def partial_callback_for_test(x, y):
+        return x + y
+
+    default = observe_callback(partial(partial_callback_for_test, y=1))
+    named = observe_callback(partial(partial_callback_for_test, y=2), name="partial_callback_for_test_2")
+
+    count = _sample("ztf_viewer_callback_seconds_count", callback="partial_callback_for_test")
+    named_count = _sample("ztf_viewer_callback_seconds_count", callback="partial_callback_for_test_2")
+    assert default(1) == 2
+    assert named(1) == 3
+    assert _sample("ztf_viewer_callback_seconds_count", callback="partial_callback_for_test") == count + 1
+    assert _sample("ztf_viewer_callback_seconds_count", callback="partial_callback_for_test_2") == named_count + 1
@@ -0,0 +1,71 @@
+import datetime
+
+import numpy as np
+
+from ztf_viewer.product_index import ProductIndex
+
+LISTINGS = {
+    "/products/sci/": ["2018", "2019"],
+    "/products/sci/2018/": ["0317", "0318"],
+    "/products/sci/2019/": ["0101"],
+    "/products/sci/2018/0317/": ["300000", "100000", "200000"],
+    "/products/sci/2018/0318/": [],
+    "/products/sci/2019/0101/": ["123456"],
+}
+
+
+def _product_index(tmp_path, requested):
+    product_index = ProductIndex(path=tmp_path / "index.sqlite")
+
+    def listing(path, pattern):
+        requested.append(path)
+        return LISTINGS.get(path, [])
+
+    product_index._listing = listing
+    return product_index
+
+
+def test_fracs(tmp_path) -> None:
+    requested = []
+    product_index = _product_index(tmp_path, requested)
+    np.testing.assert_array_equal(product_index.fracs("/products/sci/2018/0317/"), [100000, 200000, 300000])
+    np.testing.assert_array_equal(product_index.fracs("/products/sci/2018/0317/"), [100000, 200000, 300000])
+    assert requested == ["/products/sci/2018/0317/"]
+
+    # Index is persistent
+    other = _product_index(tmp_path, requested)
+    np.testing.assert_array_equal(other.fracs("/products/sci/2018/0317/"), [100000, 200000, 300000])
+    assert requested == ["/products/sci/2018/0317/"]
+
+
+def test_prefetch(tmp_path) -> None:
+    requested = []
+    product_index = _product_index(tmp_path, requested)
+    product_index.fracs("/products/sci/2018/0317/")
+    n = product_index.prefetch(datetime.date(2018, 3, 1), datetime.date(2018, 12, 31), workers=2)
+    assert n == 1
+    assert "/products/sci/2019/0101/" not in requested
+
+    requested.clear()
+    assert product_index.fracs("/products/sci/2018/0318/").size == 0
+    assert requested == []
+
+
+def test_listing_timeout(tmp_path, monkeypatch) -> None:
+    product_index = ProductIndex(path=tmp_path / "index.sqlite", base_url="https://example.org")
+    timeouts = []
+
+    class Response:
+        status_code = 200
+        text = '<a href="123456/">123456/</a> <a href="234567/">234567/</a>'
+
+        def raise_for_status(self):
+            pass
+
+    def get(url, timeout=None):
+        timeouts.append(timeout)
+        return Response()
+
+    monkeypatch.setattr(product_index._session, "get", get)
+    assert product_index._listing("/products/sci/2018/0317/", r"\d{6}") == ["123456", "234567"]
+    assert timeouts == [product_index._listing_timeout]
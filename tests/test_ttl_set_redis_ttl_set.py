@@ -90,3 +90,22 @@ def test_ttl_prolongation(redisdb) -> None:
     assert len(ttl_set) == 1
     time.sleep(2)
     assert len(ttl_set) == 0
+
+
+def test_no_keyspace_scan(redisdb) -> None:
+    ttl_set = RedisTTLSet(client=redisdb, ttl=86400, key="test")
+    ttl_set.add(1)
+    ttl_set.add(2)
+    assert redisdb.keys("*") == [b"test"]
+    assert redisdb.zcard("test") == 2
+
+
+def test_expired_is_pruned(redisdb) -> None:
+    ttl_set = RedisTTLSet(client=redisdb, ttl=1, key="test")
+    ttl_set.add(1)
+    time.sleep(2)
+    assert 1 not in ttl_set
+    with pytest.raises(KeyError):
+        ttl_set.remove(1)
+    ttl_set.add(1)
+    assert len(ttl_set) == 1
@@ -90,3 +90,22 @@ def test_ttl_prolongation(redisdb) -> None:
     assert len(ttl_set) == 1
     time.sleep(1)
     assert len(ttl_set) == 0
+
+
+def test_no_keyspace_scan(redisdb) -> None:
+    ttl_set = RedisTTLStringSet(client=redisdb, ttl=86400, key="test")
+    ttl_set.add("a")
+    ttl_set.add("b")
+    assert redisdb.keys("*") == [b"test"]
+    assert redisdb.zcard("test") == 2
+
+
+def test_expired_is_pruned(redisdb) -> None:
+    ttl_set = RedisTTLStringSet(client=redisdb, ttl=1, key="test")
+    ttl_set.add("a")
+    time.sleep(2)
+    assert "a" not in ttl_set
+    with pytest.raises(KeyError):
+        ttl_set.remove("a")
+    ttl_set.add("a")
+    assert len(ttl_set) == 1
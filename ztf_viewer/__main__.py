@@ -16,9 +16,12 @@ from ztf_viewer.app import app
 from ztf_viewer.catalogs.conesearch import ANTARES_QUERY, TNS_QUERY
 from ztf_viewer.catalogs.snad import SnadCatalogSource
 from ztf_viewer.exceptions import CatalogUnavailable, NotFound, UnAuthorized
+from ztf_viewer.pages import bulk_export as _  # noqa: F811,F401
 from ztf_viewer.pages import favicon as _  # noqa: F811,F401
 from ztf_viewer.pages import figure as _  # noqa: F811,F401
 from ztf_viewer.pages import lc_csv as _  # noqa: F811,F401
+from ztf_viewer.pages import lc_export as _  # noqa: F811,F401
+from ztf_viewer.pages import metrics as _  # noqa: F811,F401
 from ztf_viewer.pages.akb_table import get_layout as get_anomalies_layout
 from ztf_viewer.pages.login import get_layout as get_login_layout
 from ztf_viewer.pages.search import get_layout as get_search_layout
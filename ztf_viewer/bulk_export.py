@@ -0,0 +1,224 @@
+"""Bulk export of light curves of many objects
+
+A job is created by `submit`: it gets an id and a directory in
+`BULK_EXPORT_DIR` with a `job.json` state file, so any web-server worker
+process could report its progress and serve the result. The job runs in
+a background thread of the process which created it. Objects are
+processed in batches, light curves and reference magnitudes of a batch
+are fetched at once by `find_ztf_oid.find_many` and `ztf_ref.get_many`,
+and the number of objects processed per second is limited by
+`BULK_EXPORT_RATE`. The result is a single Parquet file, or a zip
+archive with a CSV file per object.
+"""
+
+import csv
+import json
+import logging
+import math
+import os
+import re
+import shutil
+import tempfile
+import time
+import uuid
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from io import StringIO
+from pathlib import Path
+
+import pyarrow.parquet as pq
+
+from ztf_viewer.catalogs import find_ztf_oid
+from ztf_viewer.catalogs.ztf_ref import ztf_ref
+from ztf_viewer.config import (
+    BULK_EXPORT_DIR,
+    BULK_EXPORT_MAX_OIDS,
+    BULK_EXPORT_MAX_QUEUE,
+    BULK_EXPORT_RATE,
+    BULK_EXPORT_WORKERS,
+)
+from ztf_viewer.exceptions import CatalogUnavailable, NotFound
+from ztf_viewer.executor import BoundedExecutor
+from ztf_viewer.lc_export import COLUMNS, dr_schema, oid_rows, record_batch, table_columns
+from ztf_viewer.util import available_drs
+
+FORMATS = ("parquet", "zip")
+# Number of objects fetched at once
+BATCH_SIZE = 500
+# Attempts to fetch a batch when a catalog is unavailable
+BATCH_ATTEMPTS = 3
+# Delay before the n-th retry is BATCH_RETRY_DELAY * 2**n, seconds
+BATCH_RETRY_DELAY = 1.0
+# Running job is considered interrupted if its state is not updated for this time, seconds
+STALE_AFTER = 30 * 60
+# Queued job is considered lost if it is not started for this time, seconds: it is the longest time the jobs ahead
+# of it in the queue of its process could run, so its process must have been stopped
+QUEUED_TIMEOUT = (
+    math.ceil((BULK_EXPORT_MAX_QUEUE + BULK_EXPORT_WORKERS) / BULK_EXPORT_WORKERS)
+    * BULK_EXPORT_MAX_OIDS
+    / BULK_EXPORT_RATE
+    + STALE_AFTER
+)
+# Job directories are removed after this time, seconds
+JOB_TTL = 7 * 86400
+
+_JOB_ID = re.compile(r"[0-9a-f]{32}")
+
+job_executor = BoundedExecutor(
+    max_workers=BULK_EXPORT_WORKERS, max_queue=BULK_EXPORT_MAX_QUEUE, thread_name_prefix="bulk-export"
+)
+# Light curves of jobs are fetched in their own threads, so jobs don't delay light curves of interactive requests.
+# Together with ztf_dr._fetch_executor should not exceed connection pool size of requests.Session, which is 10
+fetch_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="bulk-export-fetch")
+
+
+class BulkExport:
+    def __init__(
+        self, root=BULK_EXPORT_DIR, rate=BULK_EXPORT_RATE, executor=job_executor, fetch_executor=fetch_executor
+    ):
+        self.root = Path(root)
+        self.rate = rate
+        self.executor = executor
+        self.fetch_executor = fetch_executor
+
+    def _job_dir(self, job_id) -> Path:
+        if not _JOB_ID.fullmatch(job_id):
+            raise NotFound(job_id)
+        return self.root.joinpath(job_id)
+
+    def _write_state(self, job_id, state) -> None:
+        state["updated_at"] = time.time()
+        job_dir = self._job_dir(job_id)
+        with tempfile.NamedTemporaryFile("w", dir=job_dir, delete=False) as f:
+            json.dump(state, f)
+        os.replace(f.name, job_dir.joinpath("job.json"))
+
+    def status(self, job_id) -> dict:
+        """Job state, raises NotFound"""
+        try:
+            state = json.loads(self._job_dir(job_id).joinpath("job.json").read_text())
+        except FileNotFoundError:
+            raise NotFound(job_id) from None
+        now = time.time()
+        if state["status"] == "running" and now - state["updated_at"] > STALE_AFTER:
+            state["status"] = "failed"
+            state["error"] = "Job was interrupted"
+        elif state["status"] == "queued" and now - state["created_at"] > QUEUED_TIMEOUT:
+            state["status"] = "failed"
+            state["error"] = "Job was not started"
+        return state
+
+    def result_path(self, job_id) -> Path:
+        state = self.status(job_id)
+        return self._job_dir(job_id).joinpath(f"lc.{state['format']}")
+
+    def _cleanup(self) -> None:
+        if not self.root.exists():
+            return
+        now = time.time()
+        for job_dir in self.root.iterdir():
+            if _JOB_ID.fullmatch(job_dir.name) and now - job_dir.stat().st_mtime > JOB_TTL:
+                shutil.rmtree(job_dir, ignore_errors=True)
+
+    def submit(self, dr, oids, fmt="parquet", min_mjd=None, max_mjd=None) -> str:
+        """Create a job and return its id, raises ValueError for invalid input and ExecutorFull if busy"""
+        if dr not in available_drs:
+            raise ValueError(f"data release must be one of {', '.join(available_drs)}")
+        if fmt not in FORMATS:
+            raise ValueError(f"format must be one of {', '.join(FORMATS)}")
+        oids = list(dict.fromkeys(int(oid) for oid in oids))
+        if not oids:
+            raise ValueError("oids must be a non-empty list")
+        if len(oids) > BULK_EXPORT_MAX_OIDS:
+            raise ValueError(f"at most {BULK_EXPORT_MAX_OIDS} oids are allowed")
+
+        self._cleanup()
+        job_id = uuid.uuid4().hex
+        self._job_dir(job_id).mkdir(parents=True)
+        state = {
+            "id": job_id,
+            "dr": dr,
+            "format": fmt,
+            "status": "queued",
+            "total": len(oids),
+            "processed": 0,
+            "found": 0,
+            "not_found": [],
+            "error": None,
+            "created_at": time.time(),
+        }
+        self._write_state(job_id, state)
+        try:
+            self.executor.submit(self._run, state, oids, min_mjd, max_mjd)
+        except BaseException:
+            shutil.rmtree(self._job_dir(job_id), ignore_errors=True)
+            raise
+        return job_id
+
+    def _fetch(self, oids, dr):
+        for attempt in range(BATCH_ATTEMPTS):
+            try:
+                lcs = find_ztf_oid.find_many(oids, dr, executor=self.fetch_executor)
+                return lcs, ztf_ref.get_many(lcs, dr)
+            except CatalogUnavailable as e:
+                if attempt == BATCH_ATTEMPTS - 1:
+                    raise
+                logging.info(f"Fetching a batch of {len(oids)} objects failed, retrying: {e}")
+                time.sleep(BATCH_RETRY_DELAY * 2**attempt)
+
+    def _batches(self, state, oids):
+        """Fetched batches, updates the job state and limits the rate"""
+        dr = state["dr"]
+        start = time.monotonic()
+        for i in range(0, len(oids), BATCH_SIZE):
+            batch = oids[i : i + BATCH_SIZE]
+            lcs, refs = self._fetch(batch, dr)
+            yield lcs, refs
+            state["processed"] += len(batch)
+            state["found"] += len(lcs)
+            state["not_found"].extend(oid for oid in batch if oid not in lcs)
+            self._write_state(state["id"], state)
+            delay = state["processed"] / self.rate - (time.monotonic() - start)
+            if delay > 0:
+                time.sleep(delay)
+
+    def _write_parquet(self, path, state, oids, min_mjd, max_mjd) -> None:
+        with pq.ParquetWriter(path, dr_schema(state["dr"])) as writer:
+            for lcs, refs in self._batches(state, oids):
+                batch = record_batch(table_columns(lcs, refs, min_mjd, max_mjd, order="oid"))
+                if batch.num_rows > 0:
+                    writer.write_batch(batch)
+
+    def _write_zip(self, path, state, oids, min_mjd, max_mjd) -> None:
+        with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+            for lcs, refs in self._batches(state, oids):
+                for oid, lc in lcs.items():
+                    string_io = StringIO()
+                    writer = csv.writer(string_io, lineterminator="\n")
+                    writer.writerow(COLUMNS)
+                    writer.writerows(oid_rows(oid, lc, refs.get(oid), min_mjd, max_mjd))
+                    zf.writestr(f"{oid}.csv", string_io.getvalue())
+
+    def _run(self, state, oids, min_mjd, max_mjd) -> None:
+        job_id = state["id"]
+        job_dir = self._job_dir(job_id)
+        tmp_path = job_dir.joinpath(f"lc.{state['format']}.tmp")
+        state["status"] = "running"
+        self._write_state(job_id, state)
+        try:
+            if state["format"] == "parquet":
+                self._write_parquet(tmp_path, state, oids, min_mjd, max_mjd)
+            else:
+                self._write_zip(tmp_path, state, oids, min_mjd, max_mjd)
+            os.replace(tmp_path, job_dir.joinpath(f"lc.{state['format']}"))
+        except Exception as e:
+            logging.exception(f"Bulk export job {job_id} failed")
+            tmp_path.unlink(missing_ok=True)
+            state["status"] = "failed"
+            state["error"] = repr(e)
+        else:
+            state["status"] = "done"
+        self._write_state(job_id, state)
+
+
+bulk_export = BulkExport()
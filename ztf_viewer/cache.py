@@ -1,33 +1,64 @@
 import functools
 
-from cachetools import TTLCache, cached
 from redis import StrictRedis
-from redis_lru import RedisLRU
 
-from ztf_viewer.config import CACHE_TYPE
+from ztf_viewer.cache_backends import SERIALIZERS, MemoryCache, RedisCache, TieredCache
+from ztf_viewer.config import CACHE_LOCAL_MAXSIZE, CACHE_LOCAL_TTL, CACHE_SERIALIZER, CACHE_TYPE
+from ztf_viewer.metrics import observe_cache
 
 TTL = 7 * 86400
+# Values of functions cached with soft_ttl=SOFT_TTL are refreshed in background after this time
+SOFT_TTL = 86400
+# NotFound raised by functions cached with negative_ttl=NEGATIVE_TTL is cached for this time
+NEGATIVE_TTL = 6 * 3600
 MAXSIZE = 1 << 16
+# Maximum time to wait for a value computed by another worker, seconds
+# Should be larger than timeouts of upstream requests
+LOCK_TIMEOUT = 70
+
+
+def _get_serializer():
+    try:
+        return SERIALIZERS[CACHE_SERIALIZER.lower().strip()]
+    except KeyError as e:
+        raise ValueError(f'CACHE_SERIALIZER must be one of: {", ".join(SERIALIZERS)}') from e
 
 
 def _create_redis_cache():
     from ztf_viewer.config import REDIS_HOSTNAME
 
     redis_conn = StrictRedis(REDIS_HOSTNAME)
-    redis_lru = RedisLRU(redis_conn, default_ttl=TTL, max_size=MAXSIZE)
-    cache = functools.partial(redis_lru, ttl=TTL)
+    redis_cache = RedisCache(redis_conn, default_ttl=TTL, lock_timeout=LOCK_TIMEOUT, serializer=_get_serializer())
+    cache = functools.partial(redis_cache, ttl=TTL)
+    return cache
+
+
+def _create_tiered_cache():
+    from ztf_viewer.config import REDIS_HOSTNAME
+
+    redis_conn = StrictRedis(REDIS_HOSTNAME)
+    tiered_cache = TieredCache(
+        redis_conn,
+        local_maxsize=CACHE_LOCAL_MAXSIZE,
+        local_ttl=CACHE_LOCAL_TTL,
+        default_ttl=TTL,
+        lock_timeout=LOCK_TIMEOUT,
+        serializer=_get_serializer(),
+    )
+    cache = functools.partial(tiered_cache, ttl=TTL)
     return cache
 
 
 def _crate_memory_cache():
-    ttl_cache = TTLCache(MAXSIZE, ttl=TTL)
-    cache = functools.partial(cached, cache=ttl_cache)
+    memory_cache = MemoryCache(maxsize=MAXSIZE, default_ttl=TTL)
+    cache = functools.partial(memory_cache, ttl=TTL)
     return cache
 
 
 CACHE_CREATORS = {
     "redis": _create_redis_cache,
     "memory": _crate_memory_cache,
+    "tiered": _create_tiered_cache,
 }
 
 
@@ -39,3 +70,6 @@ def _get_cache():
 
 
 cache = _get_cache()
+cache.func.observer = observe_cache
+# Decorator for cone searches, see _BaseCache.cone_search
+cone_search_cache = functools.partial(cache.func.cone_search, ttl=TTL)
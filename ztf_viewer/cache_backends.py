@@ -0,0 +1,590 @@
+import inspect
+import logging
+import math
+import pickle
+import struct
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass
+from functools import partial, wraps
+from typing import Any, Callable, Hashable, Iterable, Mapping
+
+from cachetools import TLRUCache, TTLCache
+from redis import RedisError, StrictRedis
+from redis.exceptions import LockError
+
+from ztf_viewer.exceptions import NotFound
+
+
+class ArgsUnhashable(Exception):
+    pass
+
+
+class PickleSerializer:
+    """Plain pickle, values are copied into a single bytes object"""
+
+    @staticmethod
+    def dumps(value: Any) -> bytes:
+        return pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def loads(data: bytes) -> Any:
+        return pickle.loads(data)
+
+
+class BufferSerializer:
+    """Pickle protocol 5 with out-of-band buffers
+
+    Large contiguous buffers, e.g. NumPy arrays of `ColumnarLightCurve`, are
+    stored as raw bytes after the pickle stream and loaded without copying:
+    deserialized arrays are read-only views of the data received from Redis.
+
+    Format: magic, number of buffers N (uint32), lengths of the pickle
+    stream and of N buffers (uint64), pickle stream, buffers.
+    Data without magic is loaded as a plain pickle.
+    """
+
+    magic = b"ZVB1"
+
+    def dumps(self, value: Any) -> bytes:
+        buffers = []
+        stream = pickle.dumps(value, protocol=5, buffer_callback=buffers.append)
+        raw = [buffer.raw() for buffer in buffers]
+        header = struct.pack(f"<I{len(raw) + 1}Q", len(raw), len(stream), *(b.nbytes for b in raw))
+        return b"".join([self.magic, header, stream, *raw])
+
+    def loads(self, data: bytes) -> Any:
+        if not data.startswith(self.magic):
+            return pickle.loads(data)
+        view = memoryview(data)
+        offset = len(self.magic)
+        (n,) = struct.unpack_from("<I", view, offset)
+        offset += struct.calcsize("<I")
+        stream_length, *lengths = struct.unpack_from(f"<{n + 1}Q", view, offset)
+        offset += struct.calcsize(f"<{n + 1}Q")
+        stream = view[offset : offset + stream_length]
+        offset += stream_length
+        buffers = []
+        for length in lengths:
+            buffers.append(view[offset : offset + length])
+            offset += length
+        return pickle.loads(stream, buffers=buffers)
+
+
+SERIALIZERS = {
+    "pickle": PickleSerializer(),
+    "buffers": BufferSerializer(),
+}
+
+
+@dataclass(frozen=True)
+class _Revalidated:
+    """Cached value with the time it becomes stale"""
+
+    value: Any
+    fresh_until: float
+
+
+_refresh_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="cache-refresh")
+
+
+@dataclass(frozen=True)
+class _NotFoundResult:
+    """Cached NotFound"""
+
+    message: str
+
+    def exception(self) -> NotFound:
+        return NotFound(self.message) if self.message else NotFound()
+
+
+class _BaseCache(ABC):
+    """Base class for function-result caches used as `@cache(ttl=...)` decorators
+
+    Concurrent calls with the same arguments are coalesced: only one of them
+    computes the value, the others wait for it and read it from the cache
+    ("single-flight"). Subclasses could extend it beyond the process, see
+    `_shared_flight`.
+    """
+
+    _stat_names = ("hits", "misses", "stale_hits", "negative_hits", "stores", "negative_stores")
+
+    def __init__(self, *, default_ttl: int, key_prefix: str = "RedisLRU"):
+        self.default_ttl = default_ttl
+        self.key_prefix = key_prefix
+        # key -> (lock, number of callers using it)
+        self._flights: dict[str, tuple[threading.Lock, int]] = {}
+        self._flights_lock = threading.Lock()
+        # keys refreshed in background
+        self._refreshing: set[str] = set()
+        self._stats = Counter()
+        self._stats_lock = threading.Lock()
+        # Called as observer(function_name, event, value_size) on every counted event of decorated functions
+        self.observer: Callable[[str, str, int | None], None] | None = None
+
+    def __call__(self, ttl=None, soft_ttl=None, negative_ttl=None):
+        """Decorator caching function results for `ttl` seconds
+
+        If `soft_ttl` is given, the value becomes stale after `soft_ttl`
+        seconds: it is still returned immediately, while the function is
+        called again in background to refresh it ("stale-while-revalidate").
+        If the refresh fails, e.g. with `CatalogUnavailable`, the stale value
+        is served until `ttl` expires.
+
+        If `negative_ttl` is given, `NotFound` raised by the function is
+        cached for `negative_ttl` seconds and re-raised on hit.
+        """
+
+        def decorator(func):
+            def store(key, value):
+                size = self.set(key, self._pack(value, soft_ttl), ttl)
+                self._count("stores", func, size)
+
+            def get(key):
+                value, stale = self._unpack(self[key])
+                if isinstance(value, _NotFoundResult):
+                    self._count("negative_hits", func)
+                    raise value.exception()
+                self._count("hits", func)
+                return value, stale
+
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                try:
+                    key = self._decorator_key(func, *args, **kwargs)
+                except ArgsUnhashable:
+                    return func(*args, **kwargs)
+                try:
+                    value, stale = get(key)
+                except KeyError:
+                    pass
+                else:
+                    if stale:
+                        self._count("stale_hits", func)
+                        self._revalidate(key, partial(func, *args, **kwargs), partial(store, key))
+                    return value
+                with self._single_flight(key):
+                    # The value could be computed while we were waiting for the lock
+                    try:
+                        value, _stale = get(key)
+                        return value
+                    except KeyError:
+                        pass
+                    self._count("misses", func)
+                    try:
+                        result = func(*args, **kwargs)
+                    except NotFound as e:
+                        if negative_ttl is not None:
+                            self._count("negative_stores", func)
+                            self.set(key, _NotFoundResult(str(e)), negative_ttl)
+                        raise
+                    store(key, result)
+                    return result
+
+            # Batch access to the cached values, e.g. to look up many arguments with a single request,
+            # cached NotFound results are returned as NotFound instances
+            wrapper.cache_key = lambda *args, **kwargs: self._decorator_key(func, *args, **kwargs)
+            wrapper.cache_get_many = lambda keys: {
+                key: self._unpack_exception(value) for key, value in self.get_many(keys).items()
+            }
+            wrapper.cache_set_many = lambda items: self.set_many(
+                {key: self._pack(value, soft_ttl) for key, value in items.items()}, ttl
+            )
+
+            def cache_set_not_found(keys):
+                if negative_ttl is None:
+                    return
+                self.set_many({key: _NotFoundResult("") for key in keys}, negative_ttl)
+
+            wrapper.cache_set_not_found = cache_set_not_found
+            return wrapper
+
+        return decorator
+
+    def cone_search(self, subset: Callable, ttl=None, soft_ttl=None, negative_ttl=None, precision_deg: float = 1e-6):
+        """Decorator for cone searches reusing the largest cone queried around a position
+
+        The decorated method has signature `f(obj, ra, dec, radius_arcsec, ...)`
+        without variable arguments and it raises `NotFound` for an empty cone. Cache stores the result
+        of the largest-radius query per position, rounded to `precision_deg`,
+        a query with a smaller radius is answered locally with
+        `subset(value, ra, dec, radius_arcsec)`, which must return a new object
+        or raise `NotFound`. Empty cones are cached for `negative_ttl` seconds,
+        or for `ttl` if it is not given. `soft_ttl` has the same meaning as
+        for the `__call__` decorator.
+        """
+
+        def decorator(func):
+            signature = inspect.signature(func)
+
+            def query(*args, **kwargs):
+                try:
+                    return func(*args, **kwargs)
+                except NotFound:
+                    return None
+
+            def store(key, entry):
+                _radius, value = entry
+                if value is None and negative_ttl is not None:
+                    size = self.set(key, self._pack(entry, soft_ttl), negative_ttl)
+                else:
+                    size = self.set(key, self._pack(entry, soft_ttl), ttl)
+                self._count("stores", func, size)
+
+            def get(key, radius):
+                try:
+                    (cached_radius, value), stale = self._unpack(self[key])
+                except KeyError:
+                    return None, False
+                if cached_radius < radius:
+                    return None, False
+                self._count("hits" if value is not None else "negative_hits", func)
+                return (cached_radius, value), stale
+
+            @wraps(func)
+            def wrapper(obj, ra, dec, radius_arcsec, *args, **kwargs):
+                radius = float(radius_arcsec)
+                # The same arguments passed positionally or by keyword must give the same key
+                bound = signature.bind(obj, ra, dec, radius_arcsec, *args, **kwargs)
+                bound.apply_defaults()
+                args = tuple(bound.arguments.values())[4:]
+                kwargs = {}
+                try:
+                    key = self._decorator_key(
+                        func, obj, round(ra / precision_deg), round(dec / precision_deg), *args, **kwargs
+                    )
+                except ArgsUnhashable:
+                    return func(obj, ra, dec, radius_arcsec, *args, **kwargs)
+                entry, stale = get(key, radius)
+                if entry is None:
+                    with self._single_flight(key):
+                        entry, stale = get(key, radius)
+                        if entry is None:
+                            self._count("misses", func)
+                            entry = radius, query(obj, ra, dec, radius_arcsec, *args, **kwargs)
+                            if entry[1] is None:
+                                self._count("negative_stores", func)
+                            store(key, entry)
+                cached_radius, value = entry
+                if stale:
+                    self._count("stale_hits", func)
+
+                    def refresh():
+                        return cached_radius, query(obj, ra, dec, cached_radius, *args, **kwargs)
+
+                    self._revalidate(key, refresh, partial(store, key))
+                if value is None:
+                    raise NotFound
+                if cached_radius == radius:
+                    return value
+                return subset(value, ra, dec, radius)
+
+            return wrapper
+
+        return decorator
+
+    @staticmethod
+    def _pack(value: Any, soft_ttl: float | None) -> Any:
+        if soft_ttl is None:
+            return value
+        return _Revalidated(value=value, fresh_until=time.time() + soft_ttl)
+
+    @staticmethod
+    def _unpack(stored: Any) -> tuple[Any, bool]:
+        """Value and whether it is stale"""
+        if isinstance(stored, _Revalidated):
+            return stored.value, time.time() >= stored.fresh_until
+        return stored, False
+
+    @classmethod
+    def _unpack_exception(cls, stored: Any) -> Any:
+        value, _stale = cls._unpack(stored)
+        if isinstance(value, _NotFoundResult):
+            return value.exception()
+        return value
+
+    def _revalidate(self, key: str, compute: Callable, store: Callable) -> None:
+        """Refresh a stale value in background, a single refresh per key at a time"""
+        with self._flights_lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def refresh():
+            try:
+                if not self._acquire_shared_refresh(key):
+                    return
+                store(compute())
+            except Exception as e:
+                logging.info(f"Serving stale value for {key}, refresh failed: {e!r}")
+            finally:
+                with self._flights_lock:
+                    self._refreshing.discard(key)
+
+        _refresh_executor.submit(refresh)
+
+    def _count(self, name: str, func: Callable | None = None, size: int | None = None) -> None:
+        with self._stats_lock:
+            self._stats[name] += 1
+        if self.observer is not None and func is not None:
+            self.observer(f"{func.__module__}.{func.__qualname__}", name, size)
+
+    @property
+    def stats(self) -> dict[str, int]:
+        """Counters of decorated function calls: hits, misses, hits of stale and of negative (NotFound) results"""
+        with self._stats_lock:
+            return {name: self._stats[name] for name in self._stat_names}
+
+    def _acquire_shared_refresh(self, key: str) -> bool:
+        """Should this process refresh the value, nothing to share by default"""
+        return True
+
+    def _decorator_key(self, func, *args, **kwargs) -> str:
+        """The same key format as redis_lru.RedisLRU has"""
+        try:
+            hash_arg = tuple(hash(arg) for arg in args)
+            hash_kwargs = tuple(hash(value) for value in kwargs.values())
+        except TypeError:
+            raise ArgsUnhashable
+        return f"{self.key_prefix}:{func.__module__}:{func.__qualname__}{hash_arg!r}:{hash_kwargs!r}"
+
+    @contextmanager
+    def _single_flight(self, key: str):
+        with self._local_flight(key), self._shared_flight(key):
+            yield
+
+    @contextmanager
+    def _local_flight(self, key: str):
+        with self._flights_lock:
+            lock, n = self._flights.get(key, (None, 0))
+            if lock is None:
+                lock = threading.Lock()
+            self._flights[key] = (lock, n + 1)
+        try:
+            with lock:
+                yield
+        finally:
+            with self._flights_lock:
+                lock, n = self._flights[key]
+                if n == 1:
+                    del self._flights[key]
+                else:
+                    self._flights[key] = (lock, n - 1)
+
+    def _shared_flight(self, key: str):
+        """Lock shared with other processes, nothing to share by default"""
+        return nullcontext()
+
+    @abstractmethod
+    def __getitem__(self, key: str) -> Any:
+        """Must raise KeyError if key is not found"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def set(self, key: str, value: Any, ttl: int | None = None) -> int | None:
+        """Store value, return its size in bytes if it is known"""
+        raise NotImplementedError
+
+    def get_many(self, keys: Iterable[str]) -> dict[str, Any]:
+        """Values of the found keys"""
+        result = {}
+        for key in keys:
+            try:
+                result[key] = self[key]
+            except KeyError:
+                pass
+        return result
+
+    def set_many(self, items: Mapping[str, Any], ttl: int | None = None) -> None:
+        for key, value in items.items():
+            self.set(key, value, ttl)
+
+
+class MemoryCache(_BaseCache):
+    """In-process cache, entries are stored together with their TTLs"""
+
+    def __init__(self, *, maxsize: int, default_ttl: int, key_prefix: str = "RedisLRU"):
+        super().__init__(default_ttl=default_ttl, key_prefix=key_prefix)
+        self.ttl_cache = TLRUCache(maxsize=maxsize, ttu=lambda _key, item, now: now + item[1])
+        self._lock = threading.Lock()
+
+    def __getitem__(self, key: Hashable) -> Any:
+        with self._lock:
+            value, _ttl = self.ttl_cache[key]
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: float | None = None) -> None:
+        with self._lock:
+            self.ttl_cache[key] = value, ttl or self.default_ttl
+
+    def clear(self) -> None:
+        with self._lock:
+            self.ttl_cache.clear()
+
+
+class RedisCache(_BaseCache):
+    """Redis cache, serialized values are stored with SETEX
+
+    Single-flight works across processes: the caller computing the value
+    holds a Redis lock, so other workers wait for it instead of repeating
+    the computation. If the lock cannot be acquired in `lock_timeout`
+    seconds, the value is computed without it.
+    """
+
+    def __init__(
+        self,
+        client: StrictRedis,
+        *,
+        default_ttl: int,
+        key_prefix: str = "RedisLRU",
+        lock_timeout: float = 60.0,
+        serializer=PickleSerializer(),
+    ):
+        super().__init__(default_ttl=default_ttl, key_prefix=key_prefix)
+        self.client = client
+        self.lock_timeout = lock_timeout
+        self.serializer = serializer
+
+    @contextmanager
+    def _shared_flight(self, key: str):
+        lock = self.client.lock(f"{key}:lock", timeout=self.lock_timeout, blocking_timeout=self.lock_timeout)
+        try:
+            acquired = lock.acquire()
+        except RedisError as e:
+            logging.warning(f"Cannot acquire Redis lock for {key}: {e}")
+            acquired = False
+        try:
+            yield
+        finally:
+            if acquired:
+                try:
+                    lock.release()
+                except LockError:
+                    # The lock has expired and could be acquired by someone else
+                    pass
+
+    def _acquire_shared_refresh(self, key: str) -> bool:
+        # The lease is not released, so a value is refreshed not more often than once per lock_timeout
+        try:
+            return bool(self.client.set(f"{key}:refresh", 1, nx=True, ex=math.ceil(self.lock_timeout)))
+        except RedisError as e:
+            logging.warning(f"Cannot acquire Redis refresh lease for {key}: {e}")
+            return False
+
+    def __getitem__(self, key: str) -> Any:
+        data = self.client.get(key)
+        if data is None:
+            raise KeyError(key)
+        return self.serializer.loads(data)
+
+    def set(self, key: str, value: Any, ttl: int | None = None) -> int:
+        ttl = math.ceil(ttl or self.default_ttl)
+        data = self.serializer.dumps(value)
+        self.client.setex(key, ttl, data)
+        return len(data)
+
+    def get_many(self, keys: Iterable[str]) -> dict[str, Any]:
+        """Values of the found keys, a single MGET"""
+        keys = list(keys)
+        if len(keys) == 0:
+            return {}
+        return {key: self.serializer.loads(data) for key, data in zip(keys, self.client.mget(keys)) if data is not None}
+
+    def set_many(self, items: Mapping[str, Any], ttl: int | None = None) -> None:
+        """SETEX all items in a single pipeline"""
+        if len(items) == 0:
+            return
+        ttl = math.ceil(ttl or self.default_ttl)
+        with self.client.pipeline(transaction=False) as pipe:
+            for key, value in items.items():
+                pipe.setex(key, ttl, self.serializer.dumps(value))
+            pipe.execute()
+
+
+class TieredCache(RedisCache):
+    """Redis cache with a bounded in-process LRU in front of it
+
+    Lookups are read-through: the local tier is checked first, then Redis,
+    and a Redis hit populates the local tier. Writes go to both tiers.
+    Values are shared between threads of the process, so they must not be
+    mutated by callers. `stats` includes hit and miss counters of both tiers.
+    """
+
+    _stat_names = RedisCache._stat_names + ("local_hits", "local_misses", "redis_hits", "redis_misses")
+
+    def __init__(
+        self,
+        client: StrictRedis,
+        *,
+        local_maxsize: int,
+        local_ttl: int,
+        default_ttl: int,
+        key_prefix: str = "RedisLRU",
+        lock_timeout: float = 60.0,
+        serializer=PickleSerializer(),
+    ):
+        super().__init__(
+            client, default_ttl=default_ttl, key_prefix=key_prefix, lock_timeout=lock_timeout, serializer=serializer
+        )
+        self.local = TTLCache(maxsize=local_maxsize, ttl=local_ttl)
+        self._local_lock = threading.Lock()
+
+    def __getitem__(self, key: str) -> Any:
+        with self._local_lock:
+            try:
+                value = self.local[key]
+            except KeyError:
+                pass
+            else:
+                self._count("local_hits")
+                return value
+        self._count("local_misses")
+
+        try:
+            value = super().__getitem__(key)
+        except KeyError:
+            self._count("redis_misses")
+            raise
+        self._count("redis_hits")
+        with self._local_lock:
+            self.local[key] = value
+        return value
+
+    def set(self, key: str, value: Any, ttl: int | None = None) -> int:
+        with self._local_lock:
+            self.local[key] = value
+        return super().set(key, value, ttl)
+
+    def get_many(self, keys: Iterable[str]) -> dict[str, Any]:
+        result = {}
+        missed = []
+        with self._local_lock:
+            for key in keys:
+                try:
+                    result[key] = self.local[key]
+                except KeyError:
+                    missed.append(key)
+        with self._stats_lock:
+            self._stats["local_hits"] += len(result)
+            self._stats["local_misses"] += len(missed)
+
+        found = super().get_many(missed)
+        with self._stats_lock:
+            self._stats["redis_hits"] += len(found)
+            self._stats["redis_misses"] += len(missed) - len(found)
+        with self._local_lock:
+            self.local.update(found)
+        return result | found
+
+    def set_many(self, items: Mapping[str, Any], ttl: int | None = None) -> None:
+        with self._local_lock:
+            self.local.update(items)
+        super().set_many(items, ttl)
+
+    def clear_local(self) -> None:
+        with self._local_lock:
+            self.local.clear()
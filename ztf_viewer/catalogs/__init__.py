@@ -1,2 +1 @@
-from .unavailable_catalogs import unavailable_catalogs
 from .ztf_dr import find_ztf_circle, find_ztf_oid
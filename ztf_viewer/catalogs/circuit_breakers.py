@@ -0,0 +1,34 @@
+from redis import StrictRedis
+
+from ztf_viewer.circuit_breaker import CircuitBreaker, LocalBreakerStore, RedisBreakerStore
+from ztf_viewer.config import CIRCUIT_BREAKER_STORE_TYPE, REDIS_HOSTNAME
+
+WINDOW = 60.0  # seconds
+
+
+def _create_redis():
+    redis_client = StrictRedis(REDIS_HOSTNAME)
+    return RedisBreakerStore(redis_client, window=WINDOW, prefix="circuit_breaker")
+
+
+CREATORS = {
+    "redis": _create_redis,
+    "memory": lambda: LocalBreakerStore(window=WINDOW),
+}
+
+
+def _get_store():
+    try:
+        return CREATORS[CIRCUIT_BREAKER_STORE_TYPE.lower().strip()]()
+    except KeyError as e:
+        raise ValueError(f'CIRCUIT_BREAKER_STORE_TYPE must be one of: {", ".join(CREATORS)}') from e
+
+
+store = _get_store()
+# name -> breaker, all breakers created in this process
+breakers: dict[str, CircuitBreaker] = {}
+
+
+def get_circuit_breaker(name: str) -> CircuitBreaker:
+    breaker = breakers[name] = CircuitBreaker(name, store)
+    return breaker
@@ -1,4 +1,5 @@
 from ._base import _BaseCatalogQuery
+from ._fanout import find_all, iter_find
 from .alerce import AlerceQuery
 from .antares import AntaresQuery
 from .astrocats import AstrocatsQuery
@@ -1,6 +1,8 @@
 import dataclasses
 import logging
+import time
 import urllib.parse
+from contextlib import contextmanager
 from functools import partial
 from typing import Dict, List, Optional
 
@@ -13,9 +15,11 @@ from astroquery.utils.commons import TableList
 from astroquery.vizier import Vizier
 from requests import RequestException
 
-from ztf_viewer.cache import cache
-from ztf_viewer.catalogs import find_ztf_oid, unavailable_catalogs
-from ztf_viewer.exceptions import CatalogUnavailable, NotFound
+from ztf_viewer.cache import NEGATIVE_TTL, SOFT_TTL, cache, cone_search_cache
+from ztf_viewer.catalogs import find_ztf_oid
+from ztf_viewer.catalogs.circuit_breakers import get_circuit_breaker
+from ztf_viewer.exceptions import CatalogOverloaded, CatalogTimeout, CatalogUnavailable, NotFound
+from ztf_viewer.metrics import CATALOG_OVERLOADED, CATALOG_QUERY_SECONDS, CATALOG_TIMEOUTS, CATALOG_UNAVAILABLE
 from ztf_viewer.util import compose_plus_minus_expression, to_str, timeout
 
 COSMO = FlatLambdaCDM(H0=70, Om0=0.3)
@@ -66,6 +70,18 @@ class ValueWithUncertaintyColumn:
         return f"{value}±{err}"
 
 
+def _cone_subset(table, ra, dec, radius_arcsec):
+    coord = SkyCoord(ra, dec, unit="deg", frame="icrs")
+    separation = coord.separation(table["__coord"]).to("arcsec")
+    idx = separation.to_value("arcsec") <= radius_arcsec
+    if not idx.any():
+        raise NotFound
+    table = table[idx]
+    table["separation"] = separation[idx]
+    table.sort("separation")
+    return table
+
+
 class _BaseCatalogQuery:
     __objects = {}
 
@@ -81,6 +97,10 @@ class _BaseCatalogQuery:
     _table_dec = None
     columns = None
 
+    # Answer smaller-radius queries from the largest cached cone. Set it to False if the upstream
+    # truncates results not in the order of separation, so a larger cone could miss closer objects
+    _reuse_larger_cone = True
+
     # classifier pretty name -> column name
     _prob_class_columns: Dict[str, str] = {}
 
@@ -97,10 +117,12 @@ class _BaseCatalogQuery:
 
     def __init__(self, query_name):
         self.__query_name = query_name
+        self.circuit_breaker = get_circuit_breaker(self.normalized_query_name)
         self._timeout_decorator = timeout(
             seconds=10.0,
-            exception=CatalogUnavailable,
+            exception=CatalogTimeout,
             exception_kwargs=dict(catalog=self),
+            full_exception=CatalogOverloaded,
         )
 
     @classmethod
@@ -131,12 +153,62 @@ class _BaseCatalogQuery:
         return self.id_column
 
     def _raise_if_unavailable(self):
-        if self.query_name in unavailable_catalogs:
-            raise CatalogUnavailable(self.query_name, prolongate=False)
+        if not self.circuit_breaker.allow():
+            raise CatalogUnavailable(f"Catalog {self.query_name} is unavailable: circuit breaker is open")
+
+    @contextmanager
+    def _circuit(self):
+        """Guard upstream requests by the circuit breaker, report their outcome to it and to metrics"""
+        name = self.normalized_query_name
+        try:
+            self._raise_if_unavailable()
+        except CatalogUnavailable:
+            CATALOG_UNAVAILABLE.labels(name).inc()
+            raise
+        start = time.monotonic()
+        try:
+            yield
+        except NotFound:
+            duration = time.monotonic() - start
+            CATALOG_QUERY_SECONDS.labels(name, "not_found").observe(duration)
+            self.circuit_breaker.record_success(duration)
+            raise
+        except CatalogOverloaded:
+            # The catalog was not requested, so it is neither a failure of the catalog nor a timeout
+            CATALOG_OVERLOADED.labels(name).inc()
+            CATALOG_UNAVAILABLE.labels(name).inc()
+            self.circuit_breaker.release()
+            raise
+        except Exception as e:
+            CATALOG_QUERY_SECONDS.labels(name, "error").observe(time.monotonic() - start)
+            if isinstance(e, CatalogTimeout):
+                CATALOG_TIMEOUTS.labels(name).inc()
+            if isinstance(e, CatalogUnavailable):
+                CATALOG_UNAVAILABLE.labels(name).inc()
+            self.circuit_breaker.record_failure()
+            raise
+        duration = time.monotonic() - start
+        CATALOG_QUERY_SECONDS.labels(name, "found").observe(duration)
+        self.circuit_breaker.record_success(duration)
 
-    @cache()
     def find(self, ra, dec, radius_arcsec):
-        self._raise_if_unavailable()
+        if self._reuse_larger_cone:
+            return self._find_reusing_larger_cone(ra, dec, radius_arcsec)
+        return self._find_cached(ra, dec, radius_arcsec)
+
+    @cone_search_cache(subset=_cone_subset, soft_ttl=SOFT_TTL, negative_ttl=NEGATIVE_TTL)
+    def _find_reusing_larger_cone(self, ra, dec, radius_arcsec):
+        return self._find(ra, dec, radius_arcsec)
+
+    @cache(soft_ttl=SOFT_TTL, negative_ttl=NEGATIVE_TTL)
+    def _find_cached(self, ra, dec, radius_arcsec):
+        return self._find(ra, dec, radius_arcsec)
+
+    def _find(self, ra, dec, radius_arcsec):
+        with self._circuit():
+            return self._query(ra, dec, radius_arcsec)
+
+    def _query(self, ra, dec, radius_arcsec):
         coord = SkyCoord(ra, dec, unit="deg", frame="icrs")
         radius = f"{radius_arcsec}s"
         logging.info(f"Querying ra={ra}, dec={dec}, r={radius_arcsec}")
@@ -0,0 +1,101 @@
+import logging
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, Iterator, Mapping, Tuple
+
+from astropy.table import Table
+
+from ztf_viewer.catalogs.conesearch._base import _BaseCatalogQuery
+from ztf_viewer.config import CONESEARCH_FANOUT_WORKERS
+from ztf_viewer.exceptions import CatalogUnavailable, NotFound
+
+# Should be a bit larger than the timeout of _BaseCatalogQuery.find
+QUERY_DEADLINE = 12.0
+GLOBAL_DEADLINE = 15.0
+
+_executor = ThreadPoolExecutor(max_workers=CONESEARCH_FANOUT_WORKERS, thread_name_prefix="conesearch")
+
+
+class _Started:
+    """Time when a query has been picked up by a worker"""
+
+    def __init__(self):
+        self.time = None
+
+    def __call__(self, func, *args):
+        self.time = time.monotonic()
+        return func(*args)
+
+
+def iter_find(
+    queries: Mapping[str, _BaseCatalogQuery],
+    ra: float,
+    dec: float,
+    radii: Mapping[str, float],
+    *,
+    query_deadline: float = QUERY_DEADLINE,
+    global_deadline: float = GLOBAL_DEADLINE,
+) -> Iterator[Tuple[str, Table]]:
+    """Run cone searches concurrently and yield (catalog, table) as they complete
+
+    Catalogs without a radius, with nothing found or unavailable are skipped.
+    A query running longer than `query_deadline` seconds is abandoned, as well
+    as all queries not completed in `global_deadline` seconds. Abandoned
+    queries keep running in the background and their results are cached.
+    """
+    start = time.monotonic()
+    pending = {}
+    for catalog, query in queries.items():
+        try:
+            radius = radii[catalog]
+        except KeyError:
+            continue
+        started = _Started()
+        future = _executor.submit(started, query.find, ra, dec, radius)
+        pending[future] = (catalog, started)
+
+    while pending:
+        now = time.monotonic()
+        timeout = start + global_deadline - now
+        for future, (catalog, started) in list(pending.items()):
+            if started.time is None:
+                continue
+            remains = started.time + query_deadline - now
+            if remains <= 0:
+                logging.info(f"Cone search in {catalog} is abandoned after {query_deadline} s")
+                del pending[future]
+                continue
+            timeout = min(timeout, remains)
+        if timeout <= 0:
+            logging.info(f"Cone searches in {', '.join(c for c, _ in pending.values())} are abandoned by deadline")
+            break
+        if not pending:
+            break
+
+        done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+        for future in done:
+            catalog, _ = pending.pop(future)
+            try:
+                table = future.result()
+            except (NotFound, CatalogUnavailable):
+                continue
+            except Exception as e:
+                logging.warning(f"Cone search in {catalog} failed: {e!r}")
+                continue
+            yield catalog, table
+
+
+def find_all(
+    queries: Mapping[str, _BaseCatalogQuery],
+    ra: float,
+    dec: float,
+    radii: Mapping[str, float],
+    *,
+    query_deadline: float = QUERY_DEADLINE,
+    global_deadline: float = GLOBAL_DEADLINE,
+) -> Dict[str, Table]:
+    """Concurrent cone search, returns {catalog: table} ordered as `queries`, see `iter_find`"""
+    tables = dict(
+        iter_find(queries, ra, dec, radii, query_deadline=query_deadline, global_deadline=global_deadline)
+    )
+    return {catalog: tables[catalog] for catalog in queries if catalog in tables}
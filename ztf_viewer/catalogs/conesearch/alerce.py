@@ -9,7 +9,7 @@ from alerce.exceptions import APIError
 from astropy.table import Table
 from requests import RequestException
 
-from ztf_viewer.cache import cache
+from ztf_viewer.cache import SOFT_TTL, cache
 from ztf_viewer.catalogs.conesearch._base import _BaseCatalogApiQuery
 from ztf_viewer.exceptions import CatalogUnavailable, NotFound
 
@@ -17,6 +17,9 @@ from ztf_viewer.exceptions import CatalogUnavailable, NotFound
 class AlerceQuery(_BaseCatalogApiQuery):
     _classifiers = {"Stamp": "stamp_classifier", "Light curve": "lc_classifier"}
 
+    # Results are limited by a page, which is not sorted by separation
+    _reuse_larger_cone = False
+
     id_column = "oid"
     _table_ra = "meanra"
     _ra_unit = "deg"
@@ -48,7 +51,7 @@ class AlerceQuery(_BaseCatalogApiQuery):
     def __aggregate_max_classifier_version(column):
         return max(column, key=AlerceQuery.__parse_classifier_version)
 
-    @cache()
+    @cache(soft_ttl=SOFT_TTL)
     def _get_classifications(self, alerce_id) -> pd.DataFrame:
         try:
             df = self._client.query_probabilities(alerce_id, format="pandas")
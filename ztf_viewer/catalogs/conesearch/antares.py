@@ -28,7 +28,10 @@ class AntaresQuery(_BaseCatalogApiQuery, _BaseLightCurveQuery, _BaseNameResolver
 
     @cache()
     def query_region_loci(self, ra, dec, radius) -> list[Locus]:
-        self._raise_if_unavailable()
+        with self._circuit():
+            return self._query_region_loci(ra, dec, radius)
+
+    def _query_region_loci(self, ra, dec, radius) -> list[Locus]:
         coord = SkyCoord(ra, dec, unit="deg")
         if not (isinstance(radius, str) and radius.endswith("s")):
             raise ValueError('radius argument should be strings that ends with "s" letter')
@@ -87,7 +90,8 @@ class AntaresQuery(_BaseCatalogApiQuery, _BaseLightCurveQuery, _BaseNameResolver
         return self._locus_to_light_curve(locus)
 
     def _query_region(self, coord, radius):
-        loci = self.query_region_loci(coord.ra.deg, coord.dec.deg, radius)
+        # Called by find guarded by the circuit breaker already
+        loci = self._query_region_loci(coord.ra.deg, coord.dec.deg, radius)
         # It works better then Table(rows=...) for empty tables
         table = Table(
             dict(
@@ -131,17 +131,17 @@ class GaiaDr3Query(_BaseVizierQuery, _BaseLightCurveQuery):
         return [dict(zip(keys, values)) for values in zip(source_id, time, mag, magerr, band)]
 
     def light_curve(self, id, row=None):
-        self._raise_if_unavailable()
-        try:
-            result = self.gaia.load_data(
-                ids=[id],
-                data_release="Gaia DR3",
-                retrieval_type="EPOCH_PHOTOMETRY",
-                data_structure="INDIVIDUAL",
-            )
-        except RequestException as e:
-            logging.warning(str(e))
-            raise CatalogUnavailable(catalog=self)
+        with self._circuit():
+            try:
+                result = self.gaia.load_data(
+                    ids=[id],
+                    data_release="Gaia DR3",
+                    retrieval_type="EPOCH_PHOTOMETRY",
+                    data_structure="INDIVIDUAL",
+                )
+            except RequestException as e:
+                logging.warning(str(e))
+                raise CatalogUnavailable(catalog=self)
 
         if len(result) == 0:
             raise NotFound
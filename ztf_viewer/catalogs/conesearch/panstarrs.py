@@ -121,14 +121,14 @@ class PanstarrsDr2StackedQuery(_BaseCatalogQuery, _BaseLightCurveQuery):
         ]
 
     def light_curve(self, id, row=None):
-        self._raise_if_unavailable()
-        try:
-            table = self._catalogs.query_criteria(
-                objID=int(row["objID"]), catalog="Panstarrs", data_release="dr2", table="detection"
-            )
-        except RequestException as e:
-            logging.info(str(e))
-            raise CatalogUnavailable(catalog=self)
+        with self._circuit():
+            try:
+                table = self._catalogs.query_criteria(
+                    objID=int(row["objID"]), catalog="Panstarrs", data_release="dr2", table="detection"
+                )
+            except RequestException as e:
+                logging.info(str(e))
+                raise CatalogUnavailable(catalog=self)
         if len(table) == 0:
             raise NotFound
         return self._table_to_light_curve(table)
@@ -38,7 +38,8 @@ class SdssQuasarsQuery(_BaseVizierQuery):
 
     @cache()
     def find(self, ra, dec, radius_arcsec):
-        table = super().find(ra, dec, radius_arcsec)
+        # the table is shared with the cache, do not modify it
+        table = super().find(ra, dec, radius_arcsec).copy()
         table["__type"] = table["Class"] = [self._class_map[c] for c in table["Class"]]
         return table
 
@@ -4,7 +4,7 @@ from astropy.coordinates import SkyCoord, Angle
 from astropy.time import Time
 from astroquery.imcce import Skybot
 
-from ztf_viewer.cache import cache
+from ztf_viewer.cache import NEGATIVE_TTL, cache
 from ztf_viewer.exceptions import NotFound
 from ztf_viewer.util import PALOMAR_OBS_CODE
 
@@ -16,7 +16,7 @@ class SkybotQuery:
     query_radius = Angle(120, "arcsec")
     """Radius to use for Skybot queries, results will be sub-sampled to the requested radius"""
 
-    @cache()
+    @cache(negative_ttl=NEGATIVE_TTL)
     def find(self, ra, dec, observatory_mjd, radius_arcsec):
         logging.info(f"Querying Skybot ra={ra}, dec={dec}, mjd={observatory_mjd}, r={radius_arcsec}")
         coord = SkyCoord(ra, dec, unit="deg", frame="icrs")
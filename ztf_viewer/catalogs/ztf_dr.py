@@ -1,13 +1,21 @@
 import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict
 from urllib.parse import urlencode, urljoin, urlsplit, urlunsplit
 
 import requests
 from astropy.coordinates import SkyCoord
 
-from ztf_viewer.cache import cache
+from ztf_viewer.cache import NEGATIVE_TTL, cache, cone_search_cache
+from ztf_viewer.columnar_lc import ColumnarLightCurve
 from ztf_viewer.config import LC_API_URL
 from ztf_viewer.exceptions import CatalogUnavailable, NotFound
-from ztf_viewer.util import INF
+
+# Together with bulk_export.fetch_executor should not exceed connection pool size of requests.Session, which is 10
+_fetch_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="ztf-dr")
+
+# Client errors which don't mean the object is missing: Request Timeout and Too Many Requests
+_TRANSIENT_STATUS_CODES = frozenset({408, 429})
 
 
 class _BaseFindZTF:
@@ -39,17 +47,62 @@ class FindZTFOID(_BaseFindZTF):
     def _query_dict(oid):
         return dict(oid=oid)
 
-    @cache()
-    def find(self, oid, dr):
-        resp = self._api_session.get(self._oid_api_url(dr), params=self._query_dict(oid), timeout=60)
+    def _fetch(self, oid, dr) -> ColumnarLightCurve:
+        """Light curve from the API, raises NotFound for a missing object and CatalogUnavailable for API errors"""
+        try:
+            resp = self._api_session.get(self._oid_api_url(dr), params=self._query_dict(oid), timeout=60)
+        except requests.RequestException as e:
+            raise CatalogUnavailable(f"{self._oid_api_url(dr)} request failed: {e}") from e
         if resp.status_code != 200:
             message = f"{resp.url} returned {resp.status_code}: {resp.text}"
             logging.info(message)
+            if resp.status_code >= 500 or resp.status_code in _TRANSIENT_STATUS_CODES:
+                raise CatalogUnavailable(message)
             raise NotFound(message)
         j = resp.json()
         if len(j) == 0:
             raise NotFound
-        return j[str(oid)]
+        return ColumnarLightCurve.from_json(j[str(oid)])
+
+    @cache(negative_ttl=NEGATIVE_TTL)
+    def find(self, oid, dr) -> ColumnarLightCurve:
+        return self._fetch(oid, dr)
+
+    def find_many(self, oids, dr, executor=None) -> Dict[Any, ColumnarLightCurve]:
+        """Light curves of many objects, not found objects are omitted
+
+        Cached light curves are looked up at once, the rest are fetched
+        concurrently in `executor`, the pool shared by interactive requests
+        by default, and cached at once, as well as not found objects.
+        Raises CatalogUnavailable if any light curve could not be fetched.
+        """
+        if executor is None:
+            executor = _fetch_executor
+        oids = list(dict.fromkeys(oids))
+        keys = {oid: self.find.cache_key(self, oid, dr) for oid in oids}
+        cached = self.find.cache_get_many(keys.values())
+        lcs = {oid: cached[key] for oid, key in keys.items() if key in cached}
+
+        futures = {oid: executor.submit(self._fetch, oid, dr) for oid in oids if oid not in lcs}
+        fetched = {}
+        not_found = []
+        unavailable = None
+        for oid, future in futures.items():
+            try:
+                fetched[oid] = future.result()
+            except NotFound:
+                not_found.append(keys[oid])
+            except CatalogUnavailable as e:
+                unavailable = e
+        self.find.cache_set_many({keys[oid]: lc for oid, lc in fetched.items()})
+        self.find.cache_set_not_found(not_found)
+        if unavailable is not None:
+            raise unavailable
+
+        lcs = {oid: lc for oid, lc in lcs.items() if not isinstance(lc, NotFound)}
+
+        lcs |= fetched
+        return {oid: lcs[oid] for oid in oids if oid in lcs}
 
     def get_coord(self, oid, dr):
         meta = self.get_meta(oid, dr)
@@ -74,22 +127,41 @@ class FindZTFOID(_BaseFindZTF):
         return frame_coord.to_string()
 
     def get_meta(self, oid, dr):
-        j = self.find(oid, dr)
-        return j["meta"]
+        lc = self.find(oid, dr)
+        return lc.meta
+
+    def get_columnar_lc(self, oid, dr, min_mjd=None, max_mjd=None) -> ColumnarLightCurve:
+        lc = self.find(oid, dr)
+        return lc.window(min_mjd, max_mjd)
 
     def get_lc(self, oid, dr, min_mjd=None, max_mjd=None):
-        if min_mjd is None:
-            min_mjd = -INF
-        if max_mjd is None:
-            max_mjd = INF
-        j = self.find(oid, dr)
-        lc = [obs.copy() for obs in j["lc"] if min_mjd <= obs["mjd"] <= max_mjd]
-        return lc
+        lc = self.find(oid, dr)
+        return lc.records(min_mjd, max_mjd)
 
 
 find_ztf_oid = FindZTFOID()
 
 
+def _add_separation(j, ra, dec):
+    """New {oid: obj} with "separation" from (ra, dec) in arcsec"""
+    coord = SkyCoord(ra, dec, unit="deg", frame="icrs")
+    cat_coord = SkyCoord(
+        ra=[obj["meta"]["coord"]["ra"] for obj in j.values()],
+        dec=[obj["meta"]["coord"]["dec"] for obj in j.values()],
+        unit="deg",
+        frame="icrs",
+    )
+    sep = coord.separation(cat_coord).to_value("arcsec")
+    return {oid: obj | {"separation": r} for (oid, obj), r in zip(j.items(), sep)}
+
+
+def _circle_subset(j, ra, dec, radius_arcsec):
+    j = {oid: obj for oid, obj in _add_separation(j, ra, dec).items() if obj["separation"] <= radius_arcsec}
+    if not j:
+        raise NotFound
+    return j
+
+
 class FindZTFCircle(_BaseFindZTF):
     def __init__(self):
         super().__init__()
@@ -97,7 +169,7 @@ class FindZTFCircle(_BaseFindZTF):
     def _circle_api_url(self, dr):
         return urljoin(self._api_url(dr), "circle/full/json")
 
-    @cache()
+    @cone_search_cache(subset=_circle_subset, negative_ttl=NEGATIVE_TTL)
     def find(self, ra, dec, radius_arcsec, dr):
         resp = self._api_session.get(
             self._circle_api_url(dr),
@@ -109,17 +181,7 @@ class FindZTFCircle(_BaseFindZTF):
         j = resp.json()
         if not j:
             raise NotFound
-        coord = SkyCoord(ra, dec, unit="deg", frame="icrs")
-        cat_coord = SkyCoord(
-            ra=[obj["meta"]["coord"]["ra"] for obj in j.values()],
-            dec=[obj["meta"]["coord"]["dec"] for obj in j.values()],
-            unit="deg",
-            frame="icrs",
-        )
-        sep = coord.separation(cat_coord).to_value("arcsec")
-        for obj, r in zip(j.values(), sep):
-            obj["separation"] = r
-        return j
+        return _add_separation(j, ra, dec)
 
 
 find_ztf_circle = FindZTFCircle()
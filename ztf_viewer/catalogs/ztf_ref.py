@@ -1,27 +1,57 @@
+import json
 import logging
+import os
+import tempfile
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
 from pathlib import Path
-from urllib.error import HTTPError, URLError
 
 import numpy as np
 import requests
 from astropy.io import fits
 
-from ztf_viewer.cache import cache
+from ztf_viewer.cache import NEGATIVE_TTL, cache
 from ztf_viewer.catalogs import find_ztf_oid
-from ztf_viewer.config import ZTF_FITS_PROXY_URL
+from ztf_viewer.config import ZTF_FITS_PROXY_URL, ZTF_REF_INDEX_DIR, ZTF_REF_INDEX_MAX_BYTES
 from ztf_viewer.exceptions import NotFound, CatalogUnavailable
 from ztf_viewer.util import ccdid_from_rcid, qid_from_rcid
 
 
 class ZTFRef:
-    _base_fits_url = f"{ZTF_FITS_PROXY_URL}"
+    """ZTF reference catalog
+
+    The first lookup in a field/filter/CCD/quadrant spools its `refpsfcat`
+    FITS file to the local directory and builds an index of it: a .npy
+    array of sourceids sorted with their row numbers, and a .json with
+    the header values we need. Only the sourceid column is read to build
+    the index. Later lookups memory-map the index, binary-search it and
+    read the found rows from the memory-mapped FITS file.
+
+    Every lookup updates the modification time of the index. When the
+    directory grows over `max_bytes`, least recently used FITS files are
+    removed together with their indexes.
+    """
+
     _base_path = "/products/ref/"
+    _header_keys = {"magzp": "MAGZP", "magzp_rms": "MAGZPRMS", "infobits": "INFOBITS"}
+    _download_chunk_size = 1 << 20
+    _download_timeout = 60
 
-    def __init__(self):
+    def __init__(
+        self, base_fits_url=ZTF_FITS_PROXY_URL, index_dir=ZTF_REF_INDEX_DIR, max_bytes=ZTF_REF_INDEX_MAX_BYTES
+    ):
         self._api_session = requests.Session()
+        self._base_fits_url = base_fits_url
+        self.index_dir = Path(index_dir)
+        self.max_bytes = max_bytes
+        self._index_locks: dict[str, threading.Lock] = {}
+        self._index_locks_lock = threading.Lock()
 
-    def fits_url(self, oid, dr):
-        meta = find_ztf_oid.get_meta(oid, dr)
+    def fits_path(self, oid, dr):
+        return self._fits_path(find_ztf_oid.get_meta(oid, dr))
+
+    def _fits_path(self, meta):
         if meta["fieldid"] < 1000:
             root = "000"
         else:
@@ -36,31 +66,187 @@ class ZTFRef:
             f"q{qid}",
             f'ztf_{meta["fieldid"]:06d}_{meta["filter"]}_c{ccdid:02d}_q{qid}_refpsfcat.fits',
         )
-        return f"{self._base_fits_url}{path}"
+        return str(path)
 
-    @cache()
-    def get(self, oid, dr):
-        url = self.fits_url(oid, dr)
-        sourceid = int(oid) % 10_000_000
+    def fits_url(self, oid, dr):
+        return f"{self._base_fits_url}{self.fits_path(oid, dr)}"
+
+    def _local_fits_path(self, fits_path) -> Path:
+        return self.index_dir.joinpath(fits_path.lstrip("/"))
+
+    def _index_path(self, fits_path) -> Path:
+        return self._local_fits_path(fits_path).with_suffix(".sourceid.npy")
+
+    def _header_path(self, fits_path) -> Path:
+        return self._local_fits_path(fits_path).with_suffix(".json")
+
+    def _index_lock(self, fits_path) -> threading.Lock:
+        with self._index_locks_lock:
+            return self._index_locks.setdefault(fits_path, threading.Lock())
+
+    @staticmethod
+    @contextmanager
+    def _atomic_write(path: Path):
+        """Write to a temporary file and rename it, so concurrent readers never see a partial file"""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with tempfile.NamedTemporaryFile(dir=path.parent, delete=False) as f:
+            try:
+                yield f
+            except BaseException:
+                os.unlink(f.name)
+                raise
+        os.replace(f.name, path)
+
+    def _spool(self, fits_path, f) -> None:
+        """Download FITS file in chunks"""
+        url = f"{self._base_fits_url}{fits_path}"
         try:
-            with fits.open(url) as f:
-                header = f[0].header
-                data = f[1].data
-                where = np.where(data["sourceid"] == sourceid)[0]
-                if where.size == 0:
-                    logging.warning(f"Object {oid} is not found in the reference catalog file {url}")
+            with self._api_session.get(url, stream=True, timeout=self._download_timeout) as response:
+                if response.status_code == 404:
                     raise NotFound
-                idx = where.item()
-                record = dict(zip(data.names, data[idx]))
-                record["magzp"] = header["MAGZP"]
-                record["magzp_rms"] = header["MAGZPRMS"]
-                record["infobits"] = header["INFOBITS"]
-        except HTTPError:
-            raise NotFound
-        except URLError:
-            raise CatalogUnavailable
+                if response.status_code != 200:
+                    raise CatalogUnavailable(f"{url} returned {response.status_code}")
+                for chunk in response.iter_content(chunk_size=self._download_chunk_size):
+                    f.write(chunk)
+        except requests.RequestException as e:
+            raise CatalogUnavailable from e
+
+    def _build_index(self, fits_path) -> None:
+        local_fits_path = self._local_fits_path(fits_path)
+        with self._atomic_write(local_fits_path) as f:
+            self._spool(fits_path, f)
+        with fits.open(local_fits_path, memmap=True) as f:
+            header = {key: f[0].header[fits_key] for key, fits_key in self._header_keys.items()}
+            sourceids = f[1].data.field("sourceid")
+            sourceids = sourceids.astype(sourceids.dtype.newbyteorder("="))
+        order = np.argsort(sourceids, kind="stable")
+        index = np.rec.fromarrays([sourceids[order], order], names=["sourceid", "row"])
+
+        # Header goes first: if the index exists, the header exists too
+        with self._atomic_write(self._header_path(fits_path)) as f:
+            f.write(json.dumps(header).encode())
+        with self._atomic_write(self._index_path(fits_path)) as f:
+            np.save(f, index, allow_pickle=False)
+        self._evict(keep=self._index_path(fits_path))
 
+    @staticmethod
+    def _entry_paths(index_path: Path) -> list[Path]:
+        """Index, header and FITS file paths, index goes first: a FITS file without an index is rebuilt, not read"""
+        stem = index_path.name.removesuffix(".sourceid.npy")
+        return [index_path, index_path.with_name(f"{stem}.json"), index_path.with_name(f"{stem}.fits")]
+
+    def _evict(self, keep: Path) -> None:
+        """Remove least recently used FITS files with their indexes, except `keep`, until they fit into max_bytes"""
+        total = sum(path.stat().st_size for path in self._entry_paths(keep))
+        entries = []
+        for index_path in self.index_dir.rglob("*.sourceid.npy"):
+            if index_path == keep:
+                continue
+            paths = self._entry_paths(index_path)
+            try:
+                last_access = index_path.stat().st_mtime
+                size = sum(path.stat().st_size for path in paths)
+            except FileNotFoundError:
+                continue
+            entries.append((last_access, size, paths))
+            total += size
+        entries.sort(key=lambda entry: entry[0])
+        for _last_access, size, paths in entries:
+            if total <= self.max_bytes:
+                break
+            for path in paths:
+                path.unlink(missing_ok=True)
+            total -= size
+
+    def _index(self, fits_path):
+        """Memory-mapped sourceid index and header values, the index is built if needed"""
+        index_path = self._index_path(fits_path)
+        if not index_path.exists():
+            with self._index_lock(fits_path):
+                if not index_path.exists():
+                    self._build_index(fits_path)
+        index = np.load(index_path, mmap_mode="r")
+        header = json.loads(self._header_path(fits_path).read_text())
+        os.utime(index_path)
+        return index, header
+
+    def _find_many(self, fits_path, sourceids):
+        """Records of the sources found in the quadrant, {sourceid: record}"""
+        try:
+            return self._search(fits_path, sourceids)
+        except FileNotFoundError:
+            # The files were evicted by another thread or process in the middle of the lookup
+            return self._search(fits_path, sourceids)
+
+    def _search(self, fits_path, sourceids):
+        index, header = self._index(fits_path)
+        sourceids = np.asarray(sourceids, dtype=index.dtype["sourceid"])
+        all_sourceids = index["sourceid"]
+        if all_sourceids.size == 0:
+            return {}
+        idx = np.minimum(np.searchsorted(all_sourceids, sourceids), all_sourceids.size - 1)
+        found = all_sourceids[idx] == sourceids
+        rows = index["row"][idx[found]]
+        with fits.open(self._local_fits_path(fits_path), memmap=True) as f:
+            data = f[1].data
+            names = data.names
+            records = data[rows]
+            return {
+                sourceid: {name: record[name] for name in names} | header
+                for sourceid, record in zip(sourceids[found].tolist(), records)
+            }
+
+    def _find(self, fits_path, sourceid):
+        records = self._find_many(fits_path, [sourceid])
+        if not records:
+            logging.warning(f"Source {sourceid} is not found in the reference catalog file {fits_path}")
+            raise NotFound
+        (record,) = records.values()
         return record
 
+    @staticmethod
+    def _sourceid(oid):
+        return int(oid) % 10_000_000
+
+    @cache(negative_ttl=NEGATIVE_TTL)
+    def get(self, oid, dr):
+        return self._find(self.fits_path(oid, dr), self._sourceid(oid))
+
+    def get_many(self, oids, dr):
+        """Records of many objects, objects not found or in unavailable files are omitted
+
+        Cached records are looked up at once, the rest are grouped by quadrant,
+        so every reference catalog file is indexed and searched once.
+        """
+        oids = list(dict.fromkeys(oids))
+        keys = {oid: self.get.cache_key(self, oid, dr) for oid in oids}
+        cached = self.get.cache_get_many(keys.values())
+        records = {oid: cached[key] for oid, key in keys.items() if key in cached}
+
+        missed = [oid for oid in oids if oid not in records]
+        lcs = find_ztf_oid.find_many(missed, dr)
+        quadrants = defaultdict(list)
+        for oid, lc in lcs.items():
+            quadrants[self._fits_path(lc.meta)].append(oid)
+
+        fetched = {}
+        unavailable = set()
+        for fits_path, quadrant_oids in quadrants.items():
+            try:
+                found = self._find_many(fits_path, [self._sourceid(oid) for oid in quadrant_oids])
+            except NotFound:
+                continue
+            except CatalogUnavailable:
+                unavailable.update(quadrant_oids)
+                continue
+            for oid in quadrant_oids:
+                if (record := found.get(self._sourceid(oid))) is not None:
+                    fetched[oid] = record
+        self.get.cache_set_many({keys[oid]: record for oid, record in fetched.items()})
+        self.get.cache_set_not_found([keys[oid] for oid in missed if oid not in fetched and oid not in unavailable])
+
+        records |= fetched
+        return {oid: records[oid] for oid in oids if oid in records and not isinstance(records[oid], NotFound)}
+
 
 ztf_ref = ZTFRef()
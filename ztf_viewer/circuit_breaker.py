@@ -0,0 +1,253 @@
+import logging
+import math
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from dataclasses import asdict, dataclass
+
+from redis import StrictRedis
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half-open"
+
+
+@dataclass(frozen=True)
+class BreakerState:
+    state: str = CLOSED
+    # Until this time (UNIX timestamp) requests are rejected, after it the breaker is half-open
+    open_until: float = 0.0
+    # Number of consecutive openings, exponent of the backoff
+    openings: int = 0
+
+
+class _BaseBreakerStore(ABC):
+    """Storage of circuit breaker states, outcome windows and probe leases"""
+
+    def __init__(self, window: float):
+        self.window = window
+
+    @abstractmethod
+    def get(self, name: str) -> BreakerState:
+        raise NotImplementedError
+
+    @abstractmethod
+    def put(self, name: str, state: BreakerState) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def record(self, name: str, now: float, failure: bool) -> tuple[int, int]:
+        """Record a call outcome, return numbers of calls and failures in the rolling window"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def reset_window(self, name: str, now: float) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def acquire_probe(self, name: str, timeout: float) -> bool:
+        """Take the single probe lease, it expires in `timeout` seconds if not released"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def release_probe(self, name: str) -> None:
+        raise NotImplementedError
+
+
+class LocalBreakerStore(_BaseBreakerStore):
+    """In-process store, every worker has its own breakers"""
+
+    def __init__(self, window: float):
+        super().__init__(window)
+        self._lock = threading.Lock()
+        self._states: dict[str, BreakerState] = {}
+        self._outcomes: dict[str, deque[tuple[float, bool]]] = {}
+        self._probes: dict[str, float] = {}
+
+    def get(self, name: str) -> BreakerState:
+        with self._lock:
+            return self._states.get(name, BreakerState())
+
+    def put(self, name: str, state: BreakerState) -> None:
+        with self._lock:
+            self._states[name] = state
+
+    def record(self, name: str, now: float, failure: bool) -> tuple[int, int]:
+        with self._lock:
+            outcomes = self._outcomes.setdefault(name, deque())
+            outcomes.append((now, failure))
+            while outcomes[0][0] <= now - self.window:
+                outcomes.popleft()
+            return len(outcomes), sum(failure for _, failure in outcomes)
+
+    def reset_window(self, name: str, now: float) -> None:
+        with self._lock:
+            self._outcomes.pop(name, None)
+
+    def acquire_probe(self, name: str, timeout: float) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            if self._probes.get(name, -math.inf) > now:
+                return False
+            self._probes[name] = now + timeout
+            return True
+
+    def release_probe(self, name: str) -> None:
+        with self._lock:
+            self._probes.pop(name, None)
+
+
+class RedisBreakerStore(_BaseBreakerStore):
+    """Store shared by all workers
+
+    State is a hash, outcomes are counted in per-bucket hashes expiring
+    after the window, probe lease is a key set with NX.
+    """
+
+    n_buckets = 6
+
+    def __init__(self, client: StrictRedis, window: float, prefix: str = "circuit_breaker"):
+        super().__init__(window)
+        self.client = client
+        self.prefix = prefix
+        self.bucket = window / self.n_buckets
+
+    def _key(self, name: str, *parts) -> str:
+        return ":".join([self.prefix, name, *map(str, parts)])
+
+    def _bucket_keys(self, name: str, now: float) -> list[str]:
+        current = int(now // self.bucket)
+        return [self._key(name, "window", i) for i in range(current - self.n_buckets + 1, current + 1)]
+
+    def get(self, name: str) -> BreakerState:
+        data = self.client.hgetall(self._key(name))
+        if not data:
+            return BreakerState()
+        data = {key.decode(): value.decode() for key, value in data.items()}
+        return BreakerState(
+            state=data["state"], open_until=float(data["open_until"]), openings=int(data["openings"])
+        )
+
+    def put(self, name: str, state: BreakerState) -> None:
+        self.client.hset(self._key(name), mapping=asdict(state))
+
+    def record(self, name: str, now: float, failure: bool) -> tuple[int, int]:
+        keys = self._bucket_keys(name, now)
+        with self.client.pipeline() as pipe:
+            pipe.hincrby(keys[-1], "calls", 1)
+            pipe.hincrby(keys[-1], "failures", int(failure))
+            pipe.expire(keys[-1], math.ceil(self.window + self.bucket))
+            for key in keys:
+                pipe.hmget(key, "calls", "failures")
+            results = pipe.execute()
+        calls = failures = 0
+        for bucket_calls, bucket_failures in results[3:]:
+            calls += int(bucket_calls or 0)
+            failures += int(bucket_failures or 0)
+        return calls, failures
+
+    def reset_window(self, name: str, now: float) -> None:
+        self.client.delete(*self._bucket_keys(name, now))
+
+    def acquire_probe(self, name: str, timeout: float) -> bool:
+        return bool(self.client.set(self._key(name, "probe"), 1, nx=True, px=math.ceil(timeout * 1000)))
+
+    def release_probe(self, name: str) -> None:
+        self.client.delete(self._key(name, "probe"))
+
+
+class CircuitBreaker:
+    """Circuit breaker with closed, open and half-open states
+
+    Closed: calls are allowed, their outcomes are counted in a rolling window
+    of `window` seconds; calls slower than `slow_call_seconds` count as
+    failures. When there are at least `min_calls` calls in the window and the
+    failure rate reaches `failure_rate`, the breaker opens.
+
+    Open: calls are rejected for `open_seconds * 2**openings`, but not longer
+    than `max_open_seconds`, where `openings` is the number of consecutive
+    failed probes.
+
+    Half-open: the open period is over, a single call is allowed as a probe.
+    Its success closes the breaker, its failure opens it again for a longer
+    period. If the probe doesn't report in `probe_timeout` seconds, another
+    one is allowed.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        store: _BaseBreakerStore,
+        *,
+        min_calls: int = 5,
+        failure_rate: float = 0.5,
+        slow_call_seconds: float = 5.0,
+        open_seconds: float = 30.0,
+        max_open_seconds: float = 30 * 60.0,
+        probe_timeout: float = 30.0,
+    ):
+        self.name = name
+        self.store = store
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.open_seconds = open_seconds
+        self.max_open_seconds = max_open_seconds
+        self.probe_timeout = probe_timeout
+
+    @property
+    def state(self) -> str:
+        state = self.store.get(self.name)
+        if state.state == OPEN and time.time() >= state.open_until:
+            return HALF_OPEN
+        return state.state
+
+    def allow(self) -> bool:
+        """Should the call be made, the caller must report its outcome"""
+        state = self.store.get(self.name)
+        if state.state == CLOSED:
+            return True
+        if time.time() < state.open_until:
+            return False
+        return self.store.acquire_probe(self.name, self.probe_timeout)
+
+    def release(self) -> None:
+        """Report that the allowed call was not made, so it is neither a success nor a failure"""
+        if self.state == HALF_OPEN:
+            self.store.release_probe(self.name)
+
+    def record_success(self, duration: float) -> None:
+        if duration > self.slow_call_seconds:
+            self.record_failure()
+            return
+        state = self.store.get(self.name)
+        if state.state == CLOSED:
+            self.store.record(self.name, time.time(), failure=False)
+            return
+        if time.time() < state.open_until:
+            # A call started before the breaker opened
+            return
+        logging.info(f"Circuit breaker {self.name} is closed")
+        self.store.put(self.name, BreakerState())
+        self.store.reset_window(self.name, time.time())
+        self.store.release_probe(self.name)
+
+    def record_failure(self) -> None:
+        now = time.time()
+        state = self.store.get(self.name)
+        if state.state == CLOSED:
+            calls, failures = self.store.record(self.name, now, failure=True)
+            if calls >= self.min_calls and failures >= self.failure_rate * calls:
+                self._open(now, openings=0)
+                self.store.reset_window(self.name, now)
+            return
+        if now < state.open_until:
+            return
+        self._open(now, openings=state.openings + 1)
+        self.store.release_probe(self.name)
+
+    def _open(self, now: float, openings: int) -> None:
+        duration = min(self.open_seconds * 2**openings, self.max_open_seconds)
+        logging.warning(f"Circuit breaker {self.name} is open for {duration:.0f} s")
+        self.store.put(self.name, BreakerState(state=OPEN, open_until=now + duration, openings=openings))
@@ -0,0 +1,90 @@
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Any, Iterable, Mapping
+
+import numpy as np
+
+
+def _column(values: list) -> np.ndarray:
+    try:
+        array = np.array(values, dtype=np.float64)
+    except (TypeError, ValueError):
+        array = np.array(values)
+    array.flags.writeable = False
+    return array
+
+
+@dataclass(frozen=True)
+class ColumnarLightCurve:
+    """Light curve stored as a column per observation field plus a metadata block
+
+    It is much more compact than a list of per-observation dicts and it is
+    cheap to (de)serialize. Arrays are read-only, because the object could be
+    shared between threads via the cache.
+    """
+
+    meta: Mapping[str, Any]
+    columns: Mapping[str, np.ndarray]
+
+    def __post_init__(self):
+        lengths = {len(column) for column in self.columns.values()}
+        if len(lengths) > 1:
+            raise ValueError(f"All columns must have the same length, got {lengths}")
+
+    @classmethod
+    def from_records(cls, meta: Mapping[str, Any], records: Iterable[Mapping[str, Any]]) -> "ColumnarLightCurve":
+        records = list(records)
+        names = list(records[0]) if records else []
+        columns = {name: _column([obs[name] for obs in records]) for name in names}
+        return cls(meta=meta, columns=MappingProxyType(columns))
+
+    @classmethod
+    def from_json(cls, j: Mapping[str, Any]) -> "ColumnarLightCurve":
+        """Convert a single object of the LC API JSON, {"meta": {...}, "lc": [{...}, ...]}"""
+        return cls.from_records(j["meta"], j["lc"])
+
+    def __len__(self) -> int:
+        return len(next(iter(self.columns.values()), ()))
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.columns[name]
+
+    @property
+    def names(self) -> list[str]:
+        return list(self.columns)
+
+    def mjd_mask(self, min_mjd: float | None = None, max_mjd: float | None = None) -> np.ndarray:
+        mjd = self.columns.get("mjd", np.array([]))
+        mask = np.ones(len(self), dtype=bool)
+        if min_mjd is not None:
+            mask &= mjd >= min_mjd
+        if max_mjd is not None:
+            mask &= mjd <= max_mjd
+        return mask
+
+    def window(self, min_mjd: float | None = None, max_mjd: float | None = None) -> "ColumnarLightCurve":
+        if min_mjd is None and max_mjd is None:
+            return self
+        mask = self.mjd_mask(min_mjd, max_mjd)
+        columns = {}
+        for name, column in self.columns.items():
+            column = column[mask]
+            column.flags.writeable = False
+            columns[name] = column
+        return ColumnarLightCurve(meta=self.meta, columns=MappingProxyType(columns))
+
+    def records(self, min_mjd: float | None = None, max_mjd: float | None = None) -> list[dict[str, Any]]:
+        """List of per-observation dicts of Python scalars, new objects every call"""
+        lc = self.window(min_mjd, max_mjd)
+        names = lc.names
+        return [dict(zip(names, row)) for row in zip(*(column.tolist() for column in lc.columns.values()))]
+
+    def __reduce__(self):
+        # MappingProxyType is not picklable
+        return _from_dicts, (dict(self.meta), dict(self.columns))
+
+
+def _from_dicts(meta, columns):
+    for column in columns.values():
+        column.flags.writeable = False
+    return ColumnarLightCurve(meta=meta, columns=MappingProxyType(columns))
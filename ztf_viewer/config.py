@@ -1,11 +1,34 @@
 import os
+import tempfile
 
 CACHE_TYPE = os.environ.get("CACHE_TYPE", "redis")
-UNAVAILABLE_CATALOGS_CACHE_TYPE = os.environ.get("UNAVAILABLE_CATALOGS_CACHE_TYPE", "redis")
+CACHE_LOCAL_MAXSIZE = int(os.environ.get("CACHE_LOCAL_MAXSIZE", 1 << 10))
+CACHE_LOCAL_TTL = int(os.environ.get("CACHE_LOCAL_TTL", 10 * 60))
+CACHE_SERIALIZER = os.environ.get("CACHE_SERIALIZER", "buffers")
+# UNAVAILABLE_CATALOGS_CACHE_TYPE is its former name
+CIRCUIT_BREAKER_STORE_TYPE = os.environ.get(
+    "CIRCUIT_BREAKER_STORE_TYPE", os.environ.get("UNAVAILABLE_CATALOGS_CACHE_TYPE", "redis")
+)
+CONESEARCH_FANOUT_WORKERS = int(os.environ.get("CONESEARCH_FANOUT_WORKERS", 32))
+CATALOG_IO_WORKERS = int(os.environ.get("CATALOG_IO_WORKERS", 64))
+CATALOG_IO_MAX_QUEUE = int(os.environ.get("CATALOG_IO_MAX_QUEUE", 256))
+FIGURE_RENDER_WORKERS = int(os.environ.get("FIGURE_RENDER_WORKERS", 2))
+FIGURE_PDF_WORKERS = int(os.environ.get("FIGURE_PDF_WORKERS", 1))
+FIGURE_RENDER_MAX_QUEUE = int(os.environ.get("FIGURE_RENDER_MAX_QUEUE", 16))
 REDIS_HOSTNAME = os.environ.get("REDIS_URL", "redis")
 AKB_API_URL = os.environ.get("AKB_API_URL", "https://akb.ztf.snad.space/")
 LC_API_URL = os.environ.get("LC_API_URL", "https://db.ztf.snad.space")
 ZTF_FITS_PROXY_URL = os.environ.get("ZTF_FITS_PROXY_URL", "https://fits.ztf.snad.space")
+ZTF_REF_INDEX_DIR = os.environ.get("ZTF_REF_INDEX_DIR", os.path.join(tempfile.gettempdir(), "ztf-viewer", "ref-index"))
+ZTF_REF_INDEX_MAX_BYTES = int(os.environ.get("ZTF_REF_INDEX_MAX_BYTES", 20 << 30))
+PRODUCT_INDEX_PATH = os.environ.get(
+    "PRODUCT_INDEX_PATH", os.path.join(tempfile.gettempdir(), "ztf-viewer", "product-index.sqlite")
+)
+BULK_EXPORT_DIR = os.environ.get("BULK_EXPORT_DIR", os.path.join(tempfile.gettempdir(), "ztf-viewer", "bulk-export"))
+BULK_EXPORT_WORKERS = int(os.environ.get("BULK_EXPORT_WORKERS", 1))
+BULK_EXPORT_MAX_QUEUE = int(os.environ.get("BULK_EXPORT_MAX_QUEUE", 8))
+BULK_EXPORT_MAX_OIDS = int(os.environ.get("BULK_EXPORT_MAX_OIDS", 100_000))
+BULK_EXPORT_RATE = float(os.environ.get("BULK_EXPORT_RATE", 100.0))
 FEATURES_API_URL = os.environ.get("FEATURES_API_URL", "https://features.lc.snad.space")
 OGLE_III_API_URL = os.environ.get("OGLE_III_API_URL", "https://ogle3.snad.space")
 ZTF_PERIODIC_API_URL = os.environ.get("ZTF_PERIODIC_API_URL", "https://periodic.ztf.snad.space")
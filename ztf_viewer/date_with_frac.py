@@ -1,13 +1,9 @@
 import os
-import re
 from dataclasses import dataclass
-from urllib.parse import urljoin
 
 import numpy as np
-import requests
 
-from ztf_viewer.cache import cache
-from ztf_viewer.config import ZTF_FITS_PROXY_URL
+from ztf_viewer.product_index import product_index
 from ztf_viewer.util import ccdid_from_rcid, hmjd_to_earth, qid_from_rcid
 
 
@@ -52,16 +48,8 @@ class DateWithFrac:
         return os.path.join(self.products_path, filename)
 
 
-@cache()
-def _fracs(products_root):
-    url = urljoin(ZTF_FITS_PROXY_URL, products_root)
-    body = requests.get(url).text
-    fracs = re.findall(r'<a href="(\d{6})/">\1/</a>', body)
-    return sorted(int(f) for f in fracs)
-
-
 def correct_date(date_with_frac):
-    fracs = _fracs(date_with_frac.products_root)
+    fracs = product_index.fracs(date_with_frac.products_root)
     digits = 6
     i = np.searchsorted(fracs, date_with_frac.frac_digits(digits))
     date_with_frac.fraction = fracs[i - 1] / (10.0**digits)
@@ -6,10 +6,9 @@ class NotFound(Exception):
 
 
 class CatalogUnavailable(Exception):
-    def __init__(self, *args, catalog: Any = None, prolongate: bool = True):
+    def __init__(self, *args, catalog: Any = None):
         # We wouldn't like to have a circular import, so we import it here
         from ztf_viewer.catalogs.conesearch import _BaseCatalogQuery
-        from ztf_viewer.catalogs.unavailable_catalogs import unavailable_catalogs
 
         if not isinstance(catalog, _BaseCatalogQuery):
             super().__init__(*args)
@@ -18,8 +17,13 @@ class CatalogUnavailable(Exception):
         query_name = catalog.query_name
         super().__init__(f"Catalog {query_name} is unavailable: {args}")
 
-        if prolongate:
-            unavailable_catalogs.add(query_name)
+
+class CatalogTimeout(CatalogUnavailable):
+    pass
+
+
+class CatalogOverloaded(CatalogUnavailable):
+    """Local I/O pool is full, the request was not sent to the catalog"""
 
 
 class UnAuthorized(Exception):
@@ -0,0 +1,102 @@
+import threading
+from collections import Counter
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable
+
+from ztf_viewer.config import CATALOG_IO_MAX_QUEUE, CATALOG_IO_WORKERS
+
+
+class ExecutorFull(Exception):
+    pass
+
+
+class BoundedExecutor:
+    """Thread pool with a bounded queue and deadline-aware calls
+
+    At most `max_workers + max_queue` tasks could be submitted but not
+    completed, `submit` raises `ExecutorFull` otherwise. `call` waits for the
+    result not longer than the timeout and never blocks on a hung task: a
+    task which is still queued is cancelled, and a running one is abandoned,
+    it keeps its thread until it finishes and its result is dropped.
+    """
+
+    def __init__(self, max_workers: int, max_queue: int, thread_name_prefix: str = ""):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=thread_name_prefix)
+        self._slots = threading.BoundedSemaphore(max_workers + max_queue)
+        self._lock = threading.Lock()
+        self._counts = Counter()
+        self._running = 0
+        self._in_flight = 0
+        self._abandoned: set[Future] = set()
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._counts[name] += 1
+
+    def _run(self, func, *args, **kwargs):
+        with self._lock:
+            self._running += 1
+        try:
+            return func(*args, **kwargs)
+        finally:
+            with self._lock:
+                self._running -= 1
+
+    def _done(self, future: Future) -> None:
+        with self._lock:
+            self._in_flight -= 1
+            self._abandoned.discard(future)
+            self._counts["cancelled" if future.cancelled() else "completed"] += 1
+        self._slots.release()
+
+    def submit(self, func: Callable, *args, **kwargs) -> Future:
+        if not self._slots.acquire(blocking=False):
+            self._count("rejected")
+            raise ExecutorFull(f"{self.max_workers} workers are busy and {self.max_queue} tasks are queued")
+        with self._lock:
+            self._in_flight += 1
+            self._counts["submitted"] += 1
+        try:
+            future = self._executor.submit(self._run, func, *args, **kwargs)
+        except BaseException:
+            with self._lock:
+                self._in_flight -= 1
+            self._slots.release()
+            raise
+        future.add_done_callback(self._done)
+        return future
+
+    def call(self, func: Callable, *args, timeout: float, **kwargs):
+        """Call function in the pool, raise TimeoutError if it takes longer than `timeout` seconds"""
+        future = self.submit(func, *args, **kwargs)
+        try:
+            return future.result(timeout=timeout)
+        except TimeoutError:
+            self._count("timed_out")
+            if not future.cancel():
+                with self._lock:
+                    if not future.done():
+                        self._abandoned.add(future)
+            raise
+
+    @property
+    def stats(self) -> dict[str, int]:
+        """Pool size, queue depth, number of running and abandoned tasks, and cumulative counters"""
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "queue_depth": self._in_flight - self._running,
+                "running": self._running,
+                "abandoned_running": len(self._abandoned),
+            } | {
+                name: self._counts[name]
+                for name in ("submitted", "completed", "cancelled", "timed_out", "rejected")
+            }
+
+
+catalog_executor = BoundedExecutor(
+    max_workers=CATALOG_IO_WORKERS, max_queue=CATALOG_IO_MAX_QUEUE, thread_name_prefix="catalog-io"
+)
@@ -0,0 +1,337 @@
+"""Matplotlib figures of light curves for downloading
+
+Figures are rendered in pools of processes, which isolates matplotlib
+global state and LaTeX subprocesses of the PDF backend from web-server
+threads, see `render`. PNG and SVG are drawn by the Agg canvas, the pgf
+backend and its LaTeX configuration are loaded only by processes of the
+separate PDF pool on their first PDF.
+"""
+
+import functools
+import hashlib
+import json
+import multiprocessing
+import threading
+from collections.abc import Mapping
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from io import BytesIO
+
+import matplotlib
+import matplotlib.figure
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.ticker import AutoMinorLocator
+
+from ztf_viewer.config import FIGURE_PDF_WORKERS, FIGURE_RENDER_MAX_QUEUE, FIGURE_RENDER_WORKERS
+from ztf_viewer.executor import BoundedExecutor
+from ztf_viewer.util import FILTER_COLORS, FILTERS_ORDER, ZTF_FILTERS, flip
+
+# Maximum time to wait for a rendered figure, seconds
+RENDER_TIMEOUT = 60.0
+
+
+def folded_figure(oid, data, period, repeat=None, usetex=False, caption=True, title=None) -> matplotlib.figure.Figure:
+    """Figure of folded light curves
+
+    Light curves are grouped by filter and by marker kind: the object itself or
+    its neighbours. Phase-shifted copies of every group are concatenated, so the
+    group is drawn by a single errorbar and a single scatter artist however many
+    neighbour light curves there are.
+    """
+    if repeat is None:
+        repeat = 2
+
+    if title is None:
+        title = str(oid)
+
+    groups = {}
+    for lc_oid, lc in data.items():
+        if len(lc) == 0:
+            continue
+        fltr = lc[0]["filter"]
+        group = groups.setdefault((fltr, lc_oid == oid), {"phase": [], "m": [], "err": []})
+        group["phase"].extend(obs["phase"] for obs in lc)
+        group["m"].extend(obs["mag"] for obs in lc)
+        group["err"].extend(obs["magerr"] for obs in lc)
+    seen_filters = {fltr for fltr, _is_oid in groups}
+
+    fig = matplotlib.figure.Figure(dpi=300, figsize=(6.4, 4.8), constrained_layout=True)
+    if caption:
+        fig.text(
+            0.50,
+            0.005,
+            f"Generated with the SNAD ZTF viewer on {datetime.now().date()}",
+            ha="center",
+            fontdict=dict(size=8, color="grey", usetex=usetex),
+        )
+    ax = fig.subplots()
+    ax.invert_yaxis()
+    ax.set_title(f"{title}, P = {period:.6g} days", usetex=usetex)
+    ax.set_xlabel("phase", usetex=usetex)
+    ax.set_ylabel("magnitude", usetex=usetex)
+    ax.xaxis.set_minor_locator(AutoMinorLocator(2))
+    ax.yaxis.set_minor_locator(AutoMinorLocator(2))
+    ax.tick_params(which="major", direction="in", length=6, width=1.5)
+    ax.tick_params(which="minor", direction="in", length=4, width=1)
+    shifts = np.arange(-1, repeat + 1)
+    labeled_filters = set()
+    for (fltr, is_oid), group in sorted(groups.items(), key=lambda item: (FILTERS_ORDER[item[0][0]], item[0][1])):
+        phase = (np.asarray(group["phase"])[None, :] + shifts[:, None]).ravel()
+        m = np.tile(group["m"], shifts.size)
+        err = np.tile(group["err"], shifts.size)
+        ax.errorbar(
+            phase,
+            m,
+            err,
+            c=FILTER_COLORS[fltr],
+            label="" if fltr in labeled_filters else fltr,
+            marker="",
+            zorder=2 if is_oid else 1,
+            ls="",
+            alpha=0.7,
+        )
+        labeled_filters.add(fltr)
+        ax.scatter(
+            phase,
+            m,
+            c=FILTER_COLORS[fltr],
+            label="",
+            marker="o" if is_oid else "s",
+            s=24 if is_oid else 12,
+            linewidths=0.5,
+            edgecolors="black",
+            zorder=2 if is_oid else 1,
+            alpha=0.7,
+        )
+    ax.set_xlim([-0.1, repeat + 0.1])
+    secax = ax.secondary_xaxis("top", functions=(lambda x: x * period, lambda x: x / period))
+    secax.set_xlabel("Folded time, days")
+    secax.minorticks_on()
+    secax.tick_params(direction="in", which="both")
+    legend_anchor_y = -0.026 if usetex else -0.032
+    ax.legend(
+        bbox_to_anchor=(1, legend_anchor_y),
+        ncol=min(3, len(seen_filters)),
+        columnspacing=0.5,
+        frameon=False,
+        handletextpad=0.0,
+    )
+    return fig
+
+
+def plot_folded_data(oid, data, period, repeat=None, fmt="png", caption=True, title=None):
+    fig = folded_figure(oid, data, period, repeat=repeat, usetex=fmt == "pdf", caption=caption, title=title)
+    bytes_io = save_fig(fig, fmt)
+    return bytes_io.getvalue()
+
+
+def plot_data(oid, data, fmt="png", caption=True, title=None):
+    usetex = fmt == "pdf"
+
+    if title is None:
+        title = str(oid)
+
+    lcs = {}
+    seen_filters = set()
+    for lc_oid, lc in data.items():
+        if len(lc) == 0:
+            continue
+        first_obs = lc[0]
+        fltr = first_obs["filter"]
+
+        marker = "s"
+        if lc_oid == oid:
+            marker = "o"
+        if fltr not in ZTF_FILTERS:
+            marker = "d"
+
+        marker_size = 12
+        if lc_oid == oid:
+            marker_size = 24
+        if fltr not in ZTF_FILTERS:
+            marker_size = 36
+
+        zorder = 1
+        if lc_oid == oid:
+            zorder = 2
+        if fltr not in ZTF_FILTERS:
+            zorder = 3
+
+        lcs[lc_oid] = {
+            "filter": fltr,
+            "t": [obs["mjd"] for obs in lc],
+            "m": [obs["mag"] for obs in lc],
+            "err": [obs["magerr"] for obs in lc],
+            "color": FILTER_COLORS[fltr],
+            "marker_size": marker_size,
+            "label_errorbar": "" if fltr in seen_filters or fltr not in ZTF_FILTERS else fltr,
+            "label_scatter": "" if fltr in seen_filters or fltr in ZTF_FILTERS else fltr,
+            "marker": marker,
+            "zorder": zorder,
+        }
+        seen_filters.add(fltr)
+
+    fig = matplotlib.figure.Figure(dpi=300, figsize=(6.4, 4.8), constrained_layout=True)
+    if caption:
+        fig.text(
+            0.50,
+            0.005,
+            f"Generated with the SNAD ZTF viewer on {datetime.now().date()}",
+            ha="center",
+            fontdict=dict(size=8, color="grey", usetex=usetex),
+        )
+    ax = fig.subplots()
+    ax.invert_yaxis()
+    ax.set_title(title, usetex=usetex)
+    ax.set_xlabel("MJD", usetex=usetex)
+    ax.set_ylabel("magnitude", usetex=usetex)
+    ax.xaxis.set_minor_locator(AutoMinorLocator(2))
+    ax.yaxis.set_minor_locator(AutoMinorLocator(2))
+    ax.tick_params(which="major", direction="in", length=6, width=1.5)
+    ax.tick_params(which="minor", direction="in", length=4, width=1)
+    for lc in lcs.values():
+        ax.errorbar(
+            lc["t"],
+            lc["m"],
+            lc["err"],
+            c=lc["color"],
+            label=lc["label_errorbar"],
+            marker="",
+            zorder=lc["zorder"],
+            ls="",
+            alpha=0.7,
+        )
+        ax.scatter(
+            lc["t"],
+            lc["m"],
+            c=lc["color"],
+            label=lc["label_scatter"],
+            marker=lc["marker"],
+            s=lc["marker_size"],
+            linewidths=0.5,
+            edgecolors="black",
+            zorder=lc["zorder"],
+            alpha=0.7,
+        )
+    legend_anchor_y = -0.026 if usetex else -0.032
+    handles, labels = zip(*sorted(zip(*ax.get_legend_handles_labels()), key=lambda hl: FILTERS_ORDER[hl[1]]))
+    ax.legend(
+        list(flip(handles, 3)),
+        list(flip(labels, 3)),
+        bbox_to_anchor=(1, legend_anchor_y),
+        ncol=min(3, len(seen_filters)),
+        columnspacing=0.5,
+        frameon=False,
+        handletextpad=0.0,
+    )
+    bytes_io = save_fig(fig, fmt)
+    return bytes_io.getvalue()
+
+
+@functools.cache
+def _pgf_canvas_class():
+    """Load pgf backend and configure LaTeX, it is done once per process"""
+    from matplotlib.backends.backend_pgf import FigureCanvasPgf
+
+    matplotlib.rcParams["pgf.rcfonts"] = True
+    matplotlib.rcParams["pgf.preamble"] = r"""
+        \usepackage{hyperref}
+        \hypersetup{colorlinks=true, urlcolor=black}
+    """
+    return FigureCanvasPgf
+
+
+def save_fig(fig, fmt):
+    bytes_io = BytesIO()
+    if fmt == "pdf":
+        canvas = _pgf_canvas_class()(fig)
+        canvas.print_pdf(bytes_io)
+    else:
+        FigureCanvasAgg(fig)
+        fig.savefig(bytes_io, format=fmt)
+    return bytes_io
+
+
+PLOTTERS = {
+    "lc": plot_data,
+    "folded": plot_folded_data,
+}
+
+
+def _canonical(obj):
+    """JSON-compatible representation independent of mapping and set ordering"""
+    if isinstance(obj, Mapping):
+        return sorted([str(key), _canonical(value)] for key, value in obj.items())
+    if isinstance(obj, (set, frozenset)):
+        return sorted((_canonical(value) for value in obj), key=repr)
+    if isinstance(obj, (list, tuple)):
+        return [_canonical(value) for value in obj]
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if obj is None or isinstance(obj, (bool, int, float, str)):
+        return obj
+    return str(obj)
+
+
+def figure_digest(kind, oid, data, **params) -> str:
+    """Hash of all inputs of a figure"""
+    if params.get("caption"):
+        # Caption contains the current date
+        params["date"] = str(datetime.now().date())
+    payload = json.dumps(_canonical([kind, oid, data, params]), separators=(",", ":"))
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+# PDF figures are rendered by their own processes, so LaTeX is never configured in the raster ones
+POOL_WORKERS = {"raster": FIGURE_RENDER_WORKERS, "pdf": FIGURE_PDF_WORKERS}
+
+
+def _pool_name(fmt) -> str:
+    return "pdf" if fmt == "pdf" else "raster"
+
+
+_process_pools: dict[str, ProcessPoolExecutor] = {}
+_process_pools_lock = threading.Lock()
+
+
+def _get_process_pool(name) -> ProcessPoolExecutor:
+    with _process_pools_lock:
+        if name not in _process_pools:
+            # Processes are spawned, not forked, because web-server process has threads
+            _process_pools[name] = ProcessPoolExecutor(
+                max_workers=POOL_WORKERS[name], mp_context=multiprocessing.get_context("spawn")
+            )
+        return _process_pools[name]
+
+
+def _reset_process_pool(name, pool: ProcessPoolExecutor) -> None:
+    with _process_pools_lock:
+        if _process_pools.get(name) is pool:
+            del _process_pools[name]
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _render_in_process(name, kind, *args, **kwargs) -> bytes:
+    pool = _get_process_pool(name)
+    try:
+        return pool.submit(PLOTTERS[kind], *args, **kwargs).result()
+    except BrokenProcessPool:
+        _reset_process_pool(name, pool)
+        raise
+
+
+# A thread per rendering process waits for its result, so the queue of the pool is bounded
+render_executors = {
+    name: BoundedExecutor(max_workers=workers, max_queue=FIGURE_RENDER_MAX_QUEUE, thread_name_prefix=f"figure-{name}")
+    for name, workers in POOL_WORKERS.items()
+}
+
+
+def render(kind, *args, fmt="png", timeout=RENDER_TIMEOUT, **kwargs) -> bytes:
+    """Render figure in the process pool for the format, raises TimeoutError or ExecutorFull"""
+    name = _pool_name(fmt)
+    return render_executors[name].call(_render_in_process, name, kind, *args, fmt=fmt, timeout=timeout, **kwargs)
@@ -0,0 +1,21 @@
+"""Gunicorn server hooks, used by the Docker image: gunicorn -c python:ztf_viewer.gunicorn_config"""
+
+import os
+import shutil
+
+from prometheus_client import multiprocess
+
+from ztf_viewer.metrics import MULTIPROC_DIR
+
+
+def on_starting(server):
+    """Remove metric files left by the previous run, they would be aggregated with the new ones otherwise"""
+    if MULTIPROC_DIR is None:
+        return
+    shutil.rmtree(MULTIPROC_DIR, ignore_errors=True)
+    os.makedirs(MULTIPROC_DIR)
+
+
+def child_exit(server, worker):
+    if MULTIPROC_DIR is not None:
+        multiprocess.mark_process_dead(worker.pid)
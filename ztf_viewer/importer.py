@@ -7,18 +7,11 @@ def import_matplotlib():
     """Matplotlib default parameters"""
     import matplotlib
 
-    matplotlib.use("pgf")
+    matplotlib.use("agg")
     matplotlib.rcParams["pdf.fonttype"] = 42
     matplotlib.rcParams["ps.fonttype"] = 42
     matplotlib.rcParams["font.size"] = 14
     matplotlib.rcParams["font.family"] = "serif"
-    matplotlib.rcParams["pgf.rcfonts"] = True
-    matplotlib.rcParams[
-        "pgf.preamble"
-    ] = r"""
-        \usepackage{hyperref}
-        \hypersetup{colorlinks=true, urlcolor=black}
-    """
 
 
 def import_astropy():
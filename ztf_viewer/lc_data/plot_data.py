@@ -1,85 +1,182 @@
-import math as m
+import threading
+from collections.abc import Mapping
 
 import numpy as np
+from astropy.table import Table
 from astropy.time import Time
+from cachetools import LRUCache, cached
 from immutabledict import immutabledict
 
 from ztf_viewer.cache import cache
+from ztf_viewer.columnar_lc import ColumnarLightCurve
 from ztf_viewer.lc_data import EXTERNAL_LC_DATA
 from ztf_viewer.lc_data.arbitrary import add_id_to_obs
-from ztf_viewer.lc_data.ztf_dr import ztf_dr_lc
+from ztf_viewer.lc_data.ztf_dr import ztf_dr_lcs_columns
 from ztf_viewer.util import ABZPMAG_JY, FILTERS_ORDER, LN10_04, immutabledefaultdict
 
 MJD_OFFSET = 58000
+PLOT_DATA_MEMO_MAXSIZE = 32
 
 
-def plot_data(
+def lc_columns(lc) -> dict[str, np.ndarray]:
+    """Convert a list of observation dicts, an astropy table or a columnar light curve to a dict of arrays"""
+    if isinstance(lc, Table):
+        return {name: np.asarray(lc[name]) for name in lc.colnames}
+    if isinstance(lc, ColumnarLightCurve):
+        return dict(lc.columns)
+    if isinstance(lc, Mapping):
+        return {name: np.asarray(column) for name, column in lc.items()}
+    lc = list(lc)
+    if len(lc) == 0:
+        return {}
+    return {name: np.array([obs[name] for obs in lc]) for name in lc[0]}
+
+
+def columns_to_records(columns: Mapping[str, np.ndarray]) -> list[dict]:
+    """Convert a dict of arrays to a list of observation dicts of Python scalars"""
+    names = list(columns)
+    return [dict(zip(names, row)) for row in zip(*(np.asarray(columns[name]).tolist() for name in names))]
+
+
+def _per_oid(oid: np.ndarray, mapping) -> np.ndarray:
+    """Look up mapping for every observation, mapping is called once per unique oid"""
+    unique, inverse = np.unique(oid, return_inverse=True)
+    values = np.array([mapping[key] for key in unique.tolist()], dtype=np.float64)
+    return values[inverse]
+
+
+def plot_data_columns(
     lc,
     mark_size=1,
     min_mjd=None,
     max_mjd=None,
     ref_mag=immutabledefaultdict(lambda: np.inf),
     ref_magerr=immutabledefaultdict(float),
-):
-    """Add photometry and time properties to observations, it mutates input"""
-    if min_mjd is None:
-        min_mjd = -np.inf
-    if max_mjd is None:
-        max_mjd = np.inf
+) -> dict[str, np.ndarray]:
+    """Add photometry and time properties to a light curve, whole-array version of `plot_data`
+
+    `lc` is anything accepted by `lc_columns`, it must have "mjd", "mag",
+    "magerr", "oid" and "filter" columns. Input is not mutated.
+    """
+    columns = lc_columns(lc)
+    if len(columns) == 0 or len(columns["mjd"]) == 0:
+        return {}
 
-    data = []
-    for obs in lc:
-        if not min_mjd <= obs["mjd"] <= max_mjd:
-            continue
+    mjd = np.asarray(columns["mjd"], dtype=np.float64)
+    mask = np.ones(mjd.shape, dtype=bool)
+    if min_mjd is not None:
+        mask &= mjd >= min_mjd
+    if max_mjd is not None:
+        mask &= mjd <= max_mjd
+    columns = {name: column[mask] for name, column in columns.items()}
+    mjd = mjd[mask]
+    mag = np.asarray(columns["mag"], dtype=np.float64)
+    magerr = np.asarray(columns["magerr"], dtype=np.float64)
+    n = mjd.size
+    if n == 0:
+        return {}
 
-        obs["mark_size"] = mark_size
+    columns["mark_size"] = np.full(n, mark_size)
 
-        # Normally we have a single oid for the light curve, but it could not
-        # be a case, see get_antares_lc for an example
-        ref_flux = 10 ** (-0.4 * (ref_mag[obs["oid"]] - ABZPMAG_JY))
-        ref_fluxerr = LN10_04 * ref_flux * ref_magerr[obs["oid"]]
+    # Normally we have a single oid for the light curve, but it could not
+    # be a case, see get_antares_lc for an example
+    ref_flux = 10 ** (-0.4 * (_per_oid(columns["oid"], ref_mag) - ABZPMAG_JY))
+    ref_fluxerr = LN10_04 * ref_flux * _per_oid(columns["oid"], ref_magerr)
 
-        obs["flux_Jy"] = 10 ** (-0.4 * (obs["mag"] - ABZPMAG_JY))
-        obs["fluxerr_Jy"] = LN10_04 * obs["flux_Jy"] * obs["magerr"]
+    flux = 10 ** (-0.4 * (mag - ABZPMAG_JY))
+    fluxerr = LN10_04 * flux * magerr
+    diffflux = flux - ref_flux
+    difffluxerr = np.hypot(fluxerr, ref_fluxerr)
+    columns["flux_Jy"] = flux
+    columns["fluxerr_Jy"] = fluxerr
+    columns["diffflux_Jy"] = diffflux
+    columns["difffluxerr_Jy"] = difffluxerr
+    columns["ref_flux"] = ref_flux
 
-        obs["diffflux_Jy"] = obs["flux_Jy"] - ref_flux
-        obs["difffluxerr_Jy"] = np.hypot(obs["fluxerr_Jy"], ref_fluxerr)
-        obs["ref_flux"] = ref_flux
+    # we do both for a weird case of negative error
+    bad = (diffflux <= 0) | (diffflux < difffluxerr)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        columns["diffmag"] = np.where(bad, np.inf, ABZPMAG_JY - 2.5 * np.log10(diffflux))
+        # for smaller flux
+        columns["diffmagerr_plus"] = np.where(bad, np.inf, -2.5 * np.log10(1 - difffluxerr / diffflux))
+        # positive and for larger flux
+        columns["diffmagerr_minus"] = np.where(bad, np.inf, 2.5 * np.log10(1 + difffluxerr / diffflux))
 
-        # we do both for a weird case of negative error
-        if obs["diffflux_Jy"] <= 0 or obs["diffflux_Jy"] < obs["difffluxerr_Jy"]:
-            obs["diffmag"] = np.inf
-            obs["diffmagerr_plus"] = np.inf
-            obs["diffmagerr_minus"] = np.inf
-        else:
-            obs["diffmag"] = ABZPMAG_JY - 2.5 * m.log10(obs["diffflux_Jy"])
-            # for smaller flux
-            obs["diffmagerr_plus"] = -2.5 * m.log10(1 - obs["difffluxerr_Jy"] / obs["diffflux_Jy"])
-            # positive and for larger flux
-            obs["diffmagerr_minus"] = 2.5 * m.log10(1 + obs["difffluxerr_Jy"] / obs["diffflux_Jy"])
+    columns[f"mjd_{MJD_OFFSET}"] = mjd - MJD_OFFSET
+    columns["date"] = np.asarray(Time(mjd, format="mjd").to_value("iso", subfmt="date"))
 
-        obs[f"mjd_{MJD_OFFSET}"] = obs["mjd"] - MJD_OFFSET
-        time = Time(obs["mjd"], format="mjd")
-        obs["date"] = time.strftime("%Y-%m-%d")
+    filters, filter_idx = np.unique(columns["filter"], return_inverse=True)
+    filter_order = np.array([FILTERS_ORDER[fltr] for fltr in filters.tolist()])[filter_idx]
+    order = np.lexsort((mjd, filter_order))
+    columns = {name: column[order] for name, column in columns.items()}
 
-        data.append(obs)
+    return columns
 
-    data = sorted(data, key=lambda obs: (FILTERS_ORDER[obs["filter"]], obs["mjd"]))
 
-    return data
+def plot_data(
+    lc,
+    mark_size=1,
+    min_mjd=None,
+    max_mjd=None,
+    ref_mag=immutabledefaultdict(lambda: np.inf),
+    ref_magerr=immutabledefaultdict(float),
+):
+    """Add photometry and time properties to observations, returns a new list of observation dicts"""
+    columns = plot_data_columns(
+        lc,
+        mark_size=mark_size,
+        min_mjd=min_mjd,
+        max_mjd=max_mjd,
+        ref_mag=ref_mag,
+        ref_magerr=ref_magerr,
+    )
+    return columns_to_records(columns)
 
 
 def folded_plot_data(plot_data, period, offset=None):
-    """Adds 'folded_time' and 'phase' to observations, it mutates input"""
+    """Adds 'folded_time' and 'phase' to observations, returns a new list of observation dicts"""
     if offset is None:
         offset = MJD_OFFSET
-    for obs in plot_data:
-        obs["folded_time"] = (obs["mjd"] - offset) % period
-        obs["phase"] = obs["folded_time"] / period
-    return plot_data
+    mjd = np.array([obs["mjd"] for obs in plot_data], dtype=np.float64)
+    folded_time = (mjd - offset) % period
+    phase = folded_time / period
+    return [
+        obs | {"folded_time": t, "phase": p} for obs, t, p in zip(plot_data, folded_time.tolist(), phase.tolist())
+    ]
 
 
 @cache()
+def external_lc(source, oid, dr, kwargs=immutabledict()):
+    """External light curve closest to ZTF object, see EXTERNAL_LC_DATA"""
+    return EXTERNAL_LC_DATA[source](oid, dr, **kwargs)
+
+
+def base_light_curves(
+    cur_oid,
+    dr,
+    other_oids=frozenset(),
+    external_data=immutabledict(),
+    additional_data=immutabledict(),
+):
+    """Raw light curves to plot: {id: (light curve, mark size)}
+
+    ZTF and external light curves are cached per object, derived plot data
+    are not, so changing MJD range or reference magnitudes doesn't produce
+    new cache entries.
+    """
+    other_oids = sorted(other_oids, key=int)
+    ztf_lcs = ztf_dr_lcs_columns([cur_oid, *other_oids], dr)
+    lcs = (
+        {cur_oid: (ztf_lcs[cur_oid], 3)}
+        | {oid: (ztf_lcs[oid], 1) for oid in other_oids}
+        | {id: (lc, 3) for id, lc in add_id_to_obs(additional_data).items()}
+        | {source: (external_lc(source, cur_oid, dr, kwargs), 1) for source, kwargs in external_data.items()}
+    )
+    return lcs
+
+
+# Small in-process memo: the same plot data are requested by several callbacks of a page
+@cached(LRUCache(maxsize=PLOT_DATA_MEMO_MAXSIZE), lock=threading.Lock())
 def get_plot_data(
     cur_oid,
     dr,
@@ -112,49 +209,30 @@ def get_plot_data(
         ],
         ...
     }
+
+    Returned observation dicts are shared with other callers and must not be mutated.
     """
-    lcs = (
-        {
-            cur_oid: plot_data(
-                ztf_dr_lc(cur_oid, dr),
-                mark_size=3,
-                min_mjd=min_mjd,
-                max_mjd=max_mjd,
-                ref_mag=ref_mag,
-                ref_magerr=ref_magerr,
-            ),
-        }
-        | {
-            oid: plot_data(
-                ztf_dr_lc(oid, dr),
-                mark_size=1,
-                min_mjd=min_mjd,
-                max_mjd=max_mjd,
-                ref_mag=ref_mag,
-                ref_magerr=ref_magerr,
-            )
-            for oid in sorted(other_oids, key=int)
-        }
-        | {
-            id: plot_data(lc, mark_size=3, min_mjd=min_mjd, max_mjd=max_mjd, ref_mag=ref_mag, ref_magerr=ref_magerr)
-            for id, lc in add_id_to_obs(additional_data).items()
-        }
-        | {
-            source: plot_data(
-                EXTERNAL_LC_DATA[source](cur_oid, dr, **kwargs),
-                mark_size=1,
-                min_mjd=min_mjd,
-                max_mjd=max_mjd,
-                ref_mag=ref_mag,
-                ref_magerr=ref_magerr,
-            )
-            for source, kwargs in external_data.items()
-        }
+    lcs = base_light_curves(
+        cur_oid,
+        dr,
+        other_oids=other_oids,
+        external_data=external_data,
+        additional_data=additional_data,
     )
-    return lcs
+    return {
+        id: plot_data(
+            lc,
+            mark_size=mark_size,
+            min_mjd=min_mjd,
+            max_mjd=max_mjd,
+            ref_mag=ref_mag,
+            ref_magerr=ref_magerr,
+        )
+        for id, (lc, mark_size) in lcs.items()
+    }
 
 
-@cache()
+@cached(LRUCache(maxsize=PLOT_DATA_MEMO_MAXSIZE), lock=threading.Lock())
 def get_folded_plot_data(
     cur_oid,
     dr,
@@ -1,12 +1,29 @@
+import numpy as np
+
 from ztf_viewer.catalogs import find_ztf_oid
+from ztf_viewer.exceptions import NotFound
+
+
+def _broadcast_meta(oid, lc):
+    meta = lc.meta
+    n = len(lc)
+    columns = dict(lc.columns)
+    columns["oid"] = np.full(n, oid)
+    columns["fieldid"] = np.full(n, meta["fieldid"])
+    columns["rcid"] = np.full(n, meta["rcid"])
+    columns["filter"] = np.full(n, meta["filter"])
+    return columns
+
 
+def ztf_dr_lcs_columns(oids, dr):
+    """{oid: columns} for many objects fetched at once
 
-def ztf_dr_lc(oid, dr):
-    lc = find_ztf_oid.get_lc(oid, dr)
-    meta = find_ztf_oid.get_meta(oid, dr)
-    for obs in lc:
-        obs["oid"] = oid
-        obs["fieldid"] = meta["fieldid"]
-        obs["rcid"] = meta["rcid"]
-        obs["filter"] = meta["filter"]
-    return lc
+    Columns of every cached ZTF light curve have per-object fields broadcast
+    to every observation. Raises NotFound if any object is missing.
+    """
+    oids = list(oids)
+    lcs = find_ztf_oid.find_many(oids, dr)
+    missed = [oid for oid in oids if oid not in lcs]
+    if missed:
+        raise NotFound(f"Objects are not found: {missed}")
+    return {oid: _broadcast_meta(oid, lc) for oid, lc in lcs.items()}
@@ -0,0 +1,185 @@
+"""Light curves of several objects for downloading
+
+CSV, Parquet, Arrow IPC and FITS exports share the assembly: light curves
+and reference magnitudes are fetched in batch up front by `fetch`, so a
+missing object is reported before any output is produced. Every light
+curve is sorted by MJD, the whole table is either sorted by MJD too or
+grouped by object.
+"""
+
+from io import BytesIO
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+from astropy.table import Table
+
+from ztf_viewer.catalogs import find_ztf_oid
+from ztf_viewer.catalogs.ztf_ref import ztf_ref
+from ztf_viewer.exceptions import NotFound
+
+COLUMNS = ["oid", "filter", "mjd", "mag", "magerr", "clrcoeff", "ref", "ref_err"]
+ORDERS = ("mjd", "oid")
+
+SCHEMA = pa.schema(
+    [
+        ("oid", pa.int64()),
+        ("filter", pa.string()),
+        ("mjd", pa.float64()),
+        ("mag", pa.float64()),
+        ("magerr", pa.float64()),
+        ("clrcoeff", pa.float64()),
+        ("ref", pa.float64()),
+        ("ref_err", pa.float64()),
+    ]
+)
+_EMPTY_DTYPES = {"oid": np.int64, "filter": str}
+
+
+def fetch(dr, oids):
+    """Light curves and reference magnitudes of all objects, raises NotFound if any light curve is missing"""
+    lcs = find_ztf_oid.find_many(oids, dr)
+    if len(lcs) != len(set(oids)):
+        raise NotFound
+    refs = ztf_ref.get_many(lcs, dr)
+    return lcs, refs
+
+
+def _ref_mag(ref):
+    if ref is None:
+        return None, None
+    return ref["mag"] + ref["magzp"], ref["sigmag"]
+
+
+def _to_list(column):
+    """Column values as a list, NaN is replaced with None, which CSV writer writes as an empty field"""
+    values = column.tolist()
+    if column.dtype.kind == "f":
+        for i in np.flatnonzero(np.isnan(column)).tolist():
+            values[i] = None
+    return values
+
+
+def oid_rows(oid, columnar_lc, ref, min_mjd=None, max_mjd=None):
+    """Rows of a single light curve sorted by mjd, missing values are None"""
+    lc = columnar_lc.window(min_mjd, max_mjd)
+    if len(lc) == 0:
+        return
+    ref_mag, ref_err = _ref_mag(ref)
+    fltr = lc.meta["filter"]
+    order = np.argsort(lc["mjd"], kind="stable")
+    # mjd is kept as is, it is the sort key of merged light curves
+    columns = [lc["mjd"][order].tolist()] + [_to_list(lc[name][order]) for name in ("mag", "magerr", "clrcoeff")]
+    for mjd, mag, magerr, clrcoeff in zip(*columns):
+        yield oid, fltr, mjd, mag, magerr, clrcoeff, ref_mag, ref_err
+
+
+def oid_columns(oid, columnar_lc, ref, min_mjd=None, max_mjd=None) -> dict[str, np.ndarray] | None:
+    """Columns of a single light curve sorted by mjd, None if there are no observations"""
+    lc = columnar_lc.window(min_mjd, max_mjd)
+    n = len(lc)
+    if n == 0:
+        return None
+    ref_mag, ref_err = _ref_mag(ref)
+    order = np.argsort(lc["mjd"], kind="stable")
+    columns = {
+        "oid": np.full(n, oid, dtype=np.int64),
+        "filter": np.full(n, lc.meta["filter"]),
+    }
+    for name in ("mjd", "mag", "magerr", "clrcoeff"):
+        columns[name] = lc[name][order]
+    columns["ref"] = np.full(n, np.nan if ref_mag is None else ref_mag, dtype=np.float64)
+    columns["ref_err"] = np.full(n, np.nan if ref_err is None else ref_err, dtype=np.float64)
+    return columns
+
+
+def table_columns(lcs, refs, min_mjd=None, max_mjd=None, order="mjd") -> dict[str, np.ndarray]:
+    """Columns of all light curves"""
+    if order not in ORDERS:
+        raise ValueError(f"order must be one of {ORDERS}, not {order}")
+    per_oid = [oid_columns(oid, lc, refs.get(oid), min_mjd, max_mjd) for oid, lc in lcs.items()]
+    per_oid = [oid_cols for oid_cols in per_oid if oid_cols is not None]
+    if not per_oid:
+        return {name: np.array([], dtype=_EMPTY_DTYPES.get(name, np.float64)) for name in COLUMNS}
+    result = {name: np.concatenate([oid_cols[name] for oid_cols in per_oid]) for name in COLUMNS}
+    if order == "mjd":
+        idx = np.argsort(result["mjd"], kind="stable")
+        result = {name: column[idx] for name, column in result.items()}
+    return result
+
+
+def record_batch(columns) -> pa.RecordBatch:
+    """Record batch of columns, float arrays are not copied, missing reference magnitudes are nulls"""
+    arrays = []
+    for field in SCHEMA:
+        column = columns[field.name]
+        if field.name in ("ref", "ref_err"):
+            arrays.append(pa.array(column, type=field.type, mask=np.isnan(column)))
+        else:
+            arrays.append(pa.array(column, type=field.type))
+    return pa.RecordBatch.from_arrays(arrays, schema=SCHEMA)
+
+
+def dr_schema(dr) -> pa.Schema:
+    """Schema with data release in metadata"""
+    return SCHEMA.with_metadata({"dr": str(dr)})
+
+
+def parquet_bytes(dr, lcs, refs, min_mjd=None, max_mjd=None, order="mjd") -> bytes:
+    batch = record_batch(table_columns(lcs, refs, min_mjd, max_mjd, order))
+    table = pa.Table.from_batches([batch], schema=dr_schema(dr))
+    sink = pa.BufferOutputStream()
+    pq.write_table(table, sink)
+    return sink.getvalue().to_pybytes()
+
+
+class _ChunkSink:
+    """Write-only file collecting written data until it is taken"""
+
+    def __init__(self):
+        self.chunks = []
+        self.closed = False
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def take(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def iter_arrow_ipc(dr, lcs, refs, min_mjd=None, max_mjd=None, order="mjd", max_chunksize=1 << 16):
+    """Generator of Arrow IPC stream chunks
+
+    A record batch per light curve is sent as soon as it is serialized if
+    rows are grouped by object, sorted table is sent in slices otherwise.
+    """
+    if order == "oid":
+        per_oid = (oid_columns(oid, lc, refs.get(oid), min_mjd, max_mjd) for oid, lc in lcs.items())
+        batches = (record_batch(oid_cols) for oid_cols in per_oid if oid_cols is not None)
+    else:
+        whole = record_batch(table_columns(lcs, refs, min_mjd, max_mjd, order))
+        batches = (whole.slice(offset, max_chunksize) for offset in range(0, whole.num_rows, max_chunksize))
+
+    sink = _ChunkSink()
+    with pa.ipc.new_stream(sink, dr_schema(dr)) as writer:
+        yield sink.take()
+        for batch in batches:
+            writer.write_batch(batch)
+            yield sink.take()
+    yield sink.take()
+
+
+def fits_bytes(dr, lcs, refs, min_mjd=None, max_mjd=None, order="mjd") -> bytes:
+    table = Table(table_columns(lcs, refs, min_mjd, max_mjd, order), meta={"DR": str(dr)})
+    bytes_io = BytesIO()
+    table.write(bytes_io, format="fits")
+    return bytes_io.getvalue()
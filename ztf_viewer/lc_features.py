@@ -2,7 +2,7 @@ from typing import List
 
 import requests
 
-from ztf_viewer.cache import cache
+from ztf_viewer.cache import SOFT_TTL, cache
 from ztf_viewer.catalogs.ztf_dr import find_ztf_oid
 from ztf_viewer.config import FEATURES_API_URL
 from ztf_viewer.exceptions import NotFound
@@ -26,7 +26,7 @@ class LightCurveFeatures:
     def url(self, version: str = "latest") -> str:
         return f"{self._base_api_url}/api/{version}/"
 
-    @cache()
+    @cache(soft_ttl=SOFT_TTL)
     def __call__(self, oid, dr, version, min_mjd=None, max_mjd=None):
         lc = find_ztf_oid.get_lc(oid, dr, min_mjd=min_mjd, max_mjd=max_mjd)
         light_curve = [dict(t=obs["mjd"], m=obs["mag"], err=obs["magerr"]) for obs in lc]
@@ -0,0 +1,80 @@
+import os
+import time
+from functools import partial, wraps
+from typing import Optional
+
+from prometheus_client import REGISTRY, CollectorRegistry, Counter, Histogram, multiprocess
+
+# Gunicorn workers write their metrics to this directory, so any worker could serve all of them
+MULTIPROC_DIR = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+
+CACHE_EVENTS = Counter(
+    "ztf_viewer_cache_events",
+    "Events of cached functions: hits, misses, stale_hits, negative_hits, stores, negative_stores",
+    ["function", "event"],
+)
+CACHE_VALUE_BYTES = Histogram(
+    "ztf_viewer_cache_value_bytes",
+    "Serialized size of values stored in the cache",
+    ["function"],
+    buckets=[1 << p for p in range(8, 28, 2)],
+)
+CATALOG_QUERY_SECONDS = Histogram(
+    "ztf_viewer_catalog_query_seconds",
+    "Duration of catalog queries, outcome is found, not_found or error",
+    ["catalog", "outcome"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 15.0, 30.0),
+)
+CATALOG_TIMEOUTS = Counter("ztf_viewer_catalog_timeouts", "Catalog queries timed out", ["catalog"])
+CATALOG_OVERLOADED = Counter(
+    "ztf_viewer_catalog_overloaded", "Catalog queries rejected because the local I/O pool is full", ["catalog"]
+)
+CATALOG_UNAVAILABLE = Counter(
+    "ztf_viewer_catalog_unavailable", "CatalogUnavailable raised, including rejections by circuit breaker", ["catalog"]
+)
+CALLBACK_SECONDS = Histogram(
+    "ztf_viewer_callback_seconds",
+    "Execution time of Dash callbacks",
+    ["callback"],
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 60.0),
+)
+
+
+def observe_cache(function: str, event: str, size: Optional[int]) -> None:
+    """Observer of _BaseCache events"""
+    CACHE_EVENTS.labels(function, event).inc()
+    if size is not None:
+        CACHE_VALUE_BYTES.labels(function).observe(size)
+
+
+def observe_callback(func=None, *, name: Optional[str] = None):
+    """Decorator measuring execution time of a Dash callback, put it under @app.callback
+
+    The callback is labeled by `name`, or by the function name. Callbacks
+    registered without the decorator syntax are wrapped by calling it,
+    e.g. `app.callback(...)(observe_callback(partial(f, x=1), name="f_1"))`.
+    """
+    if func is None:
+        return partial(observe_callback, name=name)
+    if name is None:
+        name = func.func.__name__ if isinstance(func, partial) else func.__name__
+    histogram = CALLBACK_SECONDS.labels(name)
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        start = time.monotonic()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            histogram.observe(time.monotonic() - start)
+
+    return wrapper
+
+
+def get_registry() -> CollectorRegistry:
+    """Registry with metrics of all worker processes if PROMETHEUS_MULTIPROC_DIR is set, or of this process"""
+    if MULTIPROC_DIR is None:
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
@@ -65,14 +65,22 @@ class ModelFit:
     def set_path(self, path):
         self.path = path
 
+    @staticmethod
+    def _get_refs(df, dr):
+        """Reference catalog records of all objects in the light curve, raises NotFound if any is missing"""
+        oids = df["oid"].unique()
+        refs = ztf_ref.get_many(oids, dr)
+        if len(refs) != len(oids):
+            raise NotFound
+        return refs
+
     def fit(self, df, fit_model, dr, ebv):
         self.set_path("/sncosmo/fit")
         df = df.copy()
         if 'ref_flux' not in df.columns:
             oid_ref = {}
             try:
-                for objectid in df["oid"].unique():
-                    ref = ztf_ref.get(objectid, dr)
+                for objectid, ref in self._get_refs(df, dr).items():
                     ref_mag = ref["mag"] + ref["magzp"]
                     ref_magerr = ref["sigmag"]
                     oid_ref[objectid] = {"mag": ref_mag, "err": ref_magerr}
@@ -120,8 +128,7 @@ class ModelFit:
         if 'ref_flux' not in df.columns:
             oid_ref = {}
             try:
-                for objectid in df["oid"].unique():
-                    ref = ztf_ref.get(objectid, dr)
+                for objectid, ref in self._get_refs(df, dr).items():
                     ref_mag = ref["mag"] + ref["magzp"]
                     oid_ref[objectid] = ref_mag
                 df["ref_flux"] = df["oid"].apply(lambda x: 10 ** (-0.4 * (oid_ref[x] - ABZPMAG_JY)))
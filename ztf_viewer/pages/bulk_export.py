@@ -0,0 +1,65 @@
+from flask import jsonify, request, send_file, url_for
+
+from ztf_viewer.app import app
+from ztf_viewer.bulk_export import bulk_export
+from ztf_viewer.exceptions import NotFound
+from ztf_viewer.executor import ExecutorFull
+
+MIMES = {
+    "parquet": "application/vnd.apache.parquet",
+    "zip": "application/zip",
+}
+
+
+def _job_response(state):
+    state = state | {
+        "status_url": url_for("response_export_status", job_id=state["id"]),
+        "download_url": url_for("response_export_download", job_id=state["id"]),
+    }
+    return jsonify(state)
+
+
+@app.server.route("/<dr>/export", methods=["POST"])
+def response_export_submit(dr):
+    """Start bulk export, JSON body is {"oids": [...], "format": "parquet" or "zip", "min_mjd": ..., "max_mjd": ...}"""
+    body = request.get_json(silent=True)
+    if not isinstance(body, dict) or not isinstance(body.get("oids"), list):
+        return "JSON object with oids list is expected", 400
+    try:
+        min_mjd = None if body.get("min_mjd") is None else float(body["min_mjd"])
+        max_mjd = None if body.get("max_mjd") is None else float(body["max_mjd"])
+        job_id = bulk_export.submit(
+            dr, body["oids"], fmt=body.get("format", "parquet"), min_mjd=min_mjd, max_mjd=max_mjd
+        )
+    except (TypeError, ValueError) as e:
+        return str(e), 400
+    except ExecutorFull:
+        return "Too many export jobs are queued, try again later", 503, {"Retry-After": "60"}
+    response = _job_response(bulk_export.status(job_id))
+    response.status_code = 202
+    response.headers["Location"] = url_for("response_export_status", job_id=job_id)
+    return response
+
+
+@app.server.route("/export/<job_id>")
+def response_export_status(job_id):
+    try:
+        return _job_response(bulk_export.status(job_id))
+    except NotFound:
+        return "", 404
+
+
+@app.server.route("/export/<job_id>/download")
+def response_export_download(job_id):
+    try:
+        state = bulk_export.status(job_id)
+    except NotFound:
+        return "", 404
+    if state["status"] != "done":
+        return f"Job is {state['status']}", 409
+    return send_file(
+        bulk_export.result_path(job_id),
+        mimetype=MIMES[state["format"]],
+        as_attachment=True,
+        download_name=f"{job_id}.{state['format']}",
+    )
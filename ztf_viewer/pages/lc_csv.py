@@ -1,74 +1,100 @@
+import csv
+import heapq
 from io import StringIO
+from operator import itemgetter
 
-import pandas as pd
-from flask import Response, request
+from flask import Response, request, stream_with_context
 
 from ztf_viewer.app import app
-from ztf_viewer.catalogs import find_ztf_oid
-from ztf_viewer.exceptions import NotFound, CatalogUnavailable
-from ztf_viewer.catalogs.ztf_ref import ztf_ref
-
-
-def get_csv(dr, oids, min_mjd=None, max_mjd=None):
-    dfs = []
-    for oid in oids:
-        lc = find_ztf_oid.get_lc(oid, dr, min_mjd=min_mjd, max_mjd=max_mjd)
-        if lc is None:
-            raise NotFound
-        meta = find_ztf_oid.get_meta(oid, dr)
-        oid_df = pd.DataFrame.from_records(lc)
-        oid_df["oid"] = oid
-        oid_df["filter"] = meta["filter"]
+from ztf_viewer.exceptions import CatalogUnavailable, NotFound
+from ztf_viewer.lc_export import COLUMNS, ORDERS, fetch, oid_rows
 
-        try:
-            ref = ztf_ref.get(oid, dr)
-        except (NotFound, CatalogUnavailable):
-            oid_df["ref"] = [None] * oid_df.shape[0]
-            oid_df["ref_err"] = [None] * oid_df.shape[0]
-        else:
-            ref_mag = ref["mag"] + ref["magzp"]
-            ref_err = ref["sigmag"]
-            oid_df["ref"] = ref_mag
-            oid_df["ref_err"] = ref_err
-
-        dfs.append(oid_df)
-    df = pd.concat(dfs, axis="index")
-    df.sort_values(by="mjd", inplace=True)
-    df = df[["oid", "filter", "mjd", "mag", "magerr", "clrcoeff", "ref", "ref_err"]]
-
-    string_io = StringIO()
-    df.to_csv(string_io, index=False)
-    return string_io.getvalue()
+# Number of rows formatted before a chunk of CSV is sent
+CHUNK_ROWS = 4096
 
 
-@app.server.route("/<dr>/csv/<int:oid>")
-def response_csv(dr, oid):
+def iter_csv(dr, oids, min_mjd=None, max_mjd=None, order="mjd"):
+    """Generator of CSV chunks, rows are sorted by mjd or grouped by oid
+
+    Light curves and reference magnitudes are fetched before the generator
+    is returned, so NotFound is raised by the call, not during the
+    iteration. Rows are produced lazily, light curves sorted by mjd are
+    k-way merged.
+    """
+    lcs, refs = fetch(dr, oids)
+    per_oid = [oid_rows(oid, lc, refs.get(oid), min_mjd, max_mjd) for oid, lc in lcs.items()]
+    if order == "mjd":
+        rows = heapq.merge(*per_oid, key=itemgetter(2))
+    elif order == "oid":
+        rows = (row for lc_rows in per_oid for row in lc_rows)
+    else:
+        raise ValueError(f"order must be one of {ORDERS}, not {order}")
+
+    def generate():
+        buffer = StringIO()
+        writer = csv.writer(buffer, lineterminator="\n")
+        writer.writerow(COLUMNS)
+        n = 0
+        for row in rows:
+            writer.writerow(row)
+            n += 1
+            if n % CHUNK_ROWS == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+
+    return generate()
+
+
+def get_csv(dr, oids, min_mjd=None, max_mjd=None, order="mjd"):
+    return "".join(iter_csv(dr, oids, min_mjd=min_mjd, max_mjd=max_mjd, order=order))
+
+
+def parse_export_args(oid, args):
+    """Keyword arguments of export functions from query parameters, raises ValueError with a message for user"""
     try:
-        other_oids = set(map(int, request.args.getlist("other_oid")))
+        other_oids = set(map(int, args.getlist("other_oid")))
     except ValueError:
-        return "other_oid query parameter must be an integer", 400
+        raise ValueError("other_oid query parameter must be an integer") from None
     oids = set.union({oid}, other_oids)
 
-    min_mjd = request.args.get("min_mjd", None)
+    min_mjd = args.get("min_mjd", None)
     if min_mjd is not None:
         try:
             min_mjd = float(min_mjd)
         except ValueError:
-            return "min_mjd query parameter must be a float", 400
+            raise ValueError("min_mjd query parameter must be a float") from None
 
-    max_mjd = request.args.get("max_mjd", None)
+    max_mjd = args.get("max_mjd", None)
     if max_mjd is not None:
         try:
             max_mjd = float(max_mjd)
         except ValueError:
-            return "max_mjd query parameter must be a float", 400
+            raise ValueError("max_mjd query parameter must be a float") from None
+
+    order = args.get("order", "mjd")
+    if order not in ORDERS:
+        raise ValueError(f"order query parameter must be one of {', '.join(ORDERS)}")
+
+    return dict(oids=oids, min_mjd=min_mjd, max_mjd=max_mjd, order=order)
+
+
+@app.server.route("/<dr>/csv/<int:oid>")
+def response_csv(dr, oid):
+    try:
+        kwargs = parse_export_args(oid, request.args)
+    except ValueError as e:
+        return str(e), 400
 
     try:
-        csv = get_csv(dr, oids, min_mjd=min_mjd, max_mjd=max_mjd)
+        chunks = iter_csv(dr, **kwargs)
     except NotFound:
         return "", 404
+    except CatalogUnavailable:
+        return "", 503
     return Response(
-        csv,
+        stream_with_context(chunks),
         mimetype="text/csv",
         headers={"Content-disposition": f"attachment; filename={oid}.csv"},
     )
@@ -0,0 +1,40 @@
+from flask import Response, request, stream_with_context
+
+from ztf_viewer.app import app
+from ztf_viewer.exceptions import CatalogUnavailable, NotFound
+from ztf_viewer.lc_export import fetch, fits_bytes, iter_arrow_ipc, parquet_bytes
+from ztf_viewer.pages.lc_csv import parse_export_args
+
+MIMES = {
+    "parquet": "application/vnd.apache.parquet",
+    "arrow": "application/vnd.apache.arrow.stream",
+    "fits": "application/fits",
+}
+
+
+@app.server.route("/<dr>/lc/<int:oid>.<any(parquet, arrow, fits):fmt>")
+def response_lc(dr, oid, fmt):
+    try:
+        kwargs = parse_export_args(oid, request.args)
+    except ValueError as e:
+        return str(e), 400
+    oids = kwargs.pop("oids")
+
+    try:
+        lcs, refs = fetch(dr, oids)
+    except NotFound:
+        return "", 404
+    except CatalogUnavailable:
+        return "", 503
+
+    if fmt == "parquet":
+        data = parquet_bytes(dr, lcs, refs, **kwargs)
+    elif fmt == "arrow":
+        data = stream_with_context(iter_arrow_ipc(dr, lcs, refs, **kwargs))
+    else:
+        data = fits_bytes(dr, lcs, refs, **kwargs)
+    return Response(
+        data,
+        mimetype=MIMES[fmt],
+        headers={"Content-disposition": f"attachment; filename={oid}.{fmt}"},
+    )
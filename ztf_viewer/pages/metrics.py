@@ -0,0 +1,44 @@
+import os
+
+from flask import Response
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+from prometheus_client.core import GaugeMetricFamily
+
+from ztf_viewer.app import app
+from ztf_viewer.catalogs.circuit_breakers import breakers
+from ztf_viewer.circuit_breaker import CLOSED, HALF_OPEN, OPEN
+from ztf_viewer.executor import catalog_executor
+from ztf_viewer.metrics import get_registry
+
+
+class _StateCollector:
+    """Catalog I/O pool of the worker serving the request and circuit breakers shared by all workers"""
+
+    def collect(self):
+        pool = GaugeMetricFamily(
+            "ztf_viewer_catalog_io", "Catalog I/O thread pool size, load and counters", labels=["pid", "stat"]
+        )
+        pid = str(os.getpid())
+        for stat, value in catalog_executor.stats.items():
+            pool.add_metric([pid, stat], value)
+        yield pool
+
+        states = GaugeMetricFamily(
+            "ztf_viewer_circuit_breaker_state",
+            "1 for the current state of catalog circuit breaker",
+            labels=["catalog", "state"],
+        )
+        for name, breaker in sorted(breakers.items()):
+            current = breaker.state
+            for state in (CLOSED, HALF_OPEN, OPEN):
+                states.add_metric([name, state], float(state == current))
+        yield states
+
+
+registry = get_registry()
+registry.register(_StateCollector())
+
+
+@app.server.route("/metrics")
+def metrics():
+    return Response(generate_latest(registry), mimetype=CONTENT_TYPE_LATEST)
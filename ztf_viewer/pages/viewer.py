@@ -29,6 +29,7 @@ from ztf_viewer.catalogs.conesearch import (
     GAIA_DR3,
     PANSTARRS_DR2_QUERY,
     catalog_query_objects,
+    find_all,
     get_catalog_query,
 )
 from ztf_viewer.catalogs.extinction import bayestar, sfd
@@ -43,6 +44,7 @@ from ztf_viewer.exceptions import CatalogUnavailable, NotFound
 from ztf_viewer.model_fit import model_fit
 from ztf_viewer.lc_data.plot_data import MJD_OFFSET, get_folded_plot_data, get_plot_data
 from ztf_viewer.lc_features import light_curve_features
+from ztf_viewer.metrics import observe_callback
 from ztf_viewer.util import (
     FILTER_COLORS,
     INF,
@@ -785,6 +787,7 @@ def get_layout(pathname, search):
         Input("dr", "children"),
     ],
 )
+@observe_callback
 def set_title(oid, dr):
     ra, dec = find_ztf_oid.get_coord(oid, dr)
     try:
@@ -800,6 +803,7 @@ def set_title(oid, dr):
     [Input("models-fit-dd", "value")],
     [State("results-fit-layout", "style")],
 )
+@observe_callback
 def show_fit_params(value, old_style):
     style = old_style.copy()
     if value:
@@ -833,6 +837,7 @@ def show_fit_params(value, old_style):
         Input("models-fit-dd", "value"),
     ],
 )
+@observe_callback
 def fit_lc(
     cur_oid,
     dr,
@@ -927,6 +932,7 @@ def fit_lc(
         Input("different_field_neighbours", "children"),
     ],
 )
+@observe_callback
 def set_akb_neighbours(different_filter, different_field):
     if not akb.is_token_valid():
         return None
@@ -1049,7 +1055,7 @@ app.callback(
     Output("akb-info", "children"),
     [Input("akb-reset", "n_clicks")],
     [State("oid", "children")],
-)(set_akb_info)
+)(observe_callback(set_akb_info))
 
 
 @app.callback(
@@ -1061,6 +1067,7 @@ app.callback(
         State("akb-description", "value"),
     ],
 )
+@observe_callback
 def update_akb(n_clicks, oid, tags, description):
     if n_clicks == 0 or n_clicks is None or tags is None:
         raise PreventUpdate
@@ -1082,6 +1089,7 @@ def update_akb(n_clicks, oid, tags, description):
     [Input("min-max-mjd-radio", "value")],
     [State("dr", "children")],
 )
+@observe_callback
 def set_min_max_mjd(value, dr):
     match value:
         case None:
@@ -1098,6 +1106,7 @@ def set_min_max_mjd(value, dr):
     [Input("min-mjd", "n_submit"), Input("max-mjd", "n_submit")],
     [State("min-mjd", "value"), State("max-mjd", "value"), State("dr", "children")],
 )
+@observe_callback
 def update_min_max_mjd_radio(_n_min_mjd, _n_max_mjd, min_mjd, max_mjd, dr):
     try:
         min_mjd, max_mjd = float(min_mjd), float(max_mjd)
@@ -1116,6 +1125,7 @@ def update_min_max_mjd_radio(_n_min_mjd, _n_max_mjd, min_mjd, max_mjd, dr):
 @app.callback(
     Output("fold-period-layout", "style"), [Input("light-curve-type", "value")], [State("fold-period-layout", "style")]
 )
+@observe_callback
 def show_fold_period_layout(light_curve_type, old_style):
     style = old_style.copy()
     if light_curve_type == "folded":
@@ -1130,6 +1140,7 @@ def show_fold_period_layout(light_curve_type, old_style):
     [Input("oid", "children"), Input("dr", "children"), Input("additional-light-curves", "value")],
     [State("additional-light-curves", "options")],
 )
+@observe_callback
 def update_additional_light_curve_options(oid, dr, values, old_options):
     if len(values) == 0:
         raise PreventUpdate
@@ -1210,6 +1221,7 @@ def get_panstarrs_lc_option(oid, dr, old):
     [Input("light-curve-brightness", "value")],
     [State("ref-mag-layout", "style")],
 )
+@observe_callback
 def show_ref_mag_layout(brightness_type, old_style):
     style = old_style.copy()
     if brightness_type in {"diffmag", "diffflux"}:
@@ -1229,15 +1241,17 @@ def show_ref_mag_layout(brightness_type, old_style):
         Input("light-curve-brightness", "value"),
     ],
 )
+@observe_callback
 def show_ref_mag_or_magerr(oid, dr, different_filter, different_field, brightness_type):
     if brightness_type not in {"diffmag", "diffflux"}:
         raise PreventUpdate
     oids = sorted(neighbour_oids(different_filter, different_field) | {oid}, key=int)
+    # Fetch reference magnitudes for the ref-mag-input callbacks at once, every quadrant is searched once
+    ztf_ref.get_many(oids, dr)
 
     filters = defaultdict(list)
-    for objectid in oids:
-        fltr = find_ztf_oid.get_meta(objectid, dr)["filter"]
-        filters[fltr].append(objectid)
+    for objectid, lc in find_ztf_oid.find_many(oids, dr).items():
+        filters[lc.meta["filter"]].append(objectid)
 
     layout = []
     for fltr in ZTF_FILTERS:
@@ -1309,6 +1323,7 @@ def show_ref_mag_or_magerr(oid, dr, different_filter, different_field, brightnes
         State(dict(type="ref-mag-link", index=MATCH), "id"),
     ],
 )
+@observe_callback
 def set_ref_mag_magerr(dr, _n_clicks, ref_mag_link_id):
     objectid = ref_mag_link_id["index"]
     try:
@@ -1331,6 +1346,7 @@ def set_ref_mag_magerr(dr, _n_clicks, ref_mag_link_id):
         Input(dict(type="search-radius", index=ALL), "value"),
     ],
 )
+@observe_callback
 def get_summary(oid, dr, different_filter, different_field, radius_ids, radius_values):
     if None in radius_values:
         raise PreventUpdate
@@ -1338,12 +1354,12 @@ def get_summary(oid, dr, different_filter, different_field, radius_ids, radius_v
     ra, dec = find_ztf_oid.get_coord(oid, dr)
     coord = find_ztf_oid.get_sky_coord(oid, dr)
 
+    queries = catalog_query_objects()
+    tables = find_all(queries, ra, dec, radii)
+
     elements = OrderedDict()
-    for catalog, query in catalog_query_objects().items():
-        try:
-            table = query.find(ra, dec, radii[catalog])
-        except (NotFound, CatalogUnavailable, KeyError):
-            continue
+    for catalog, table in tables.items():
+        query = queries[catalog]
         idx = np.argmin(table["separation"])
         row = table[idx]
         for table_field, display_name in SUMMARY_FIELDS.items():
@@ -1406,11 +1422,8 @@ def get_summary(oid, dr, different_filter, different_field, radius_ids, radius_v
         pass
 
     ml_classifications = []
-    for catalog, query in catalog_query_objects().items():
-        try:
-            table = query.find(ra, dec, radii[catalog])
-        except (NotFound, CatalogUnavailable, KeyError):
-            continue
+    for catalog, table in tables.items():
+        query = queries[catalog]
         if len(table) == 0:
             continue
         idx = np.argmin(table["separation"])
@@ -1497,6 +1510,7 @@ def get_summary(oid, dr, different_filter, different_field, radius_ids, radius_v
     Output("metadata", "children"),
     [Input("oid", "children"), Input("dr", "children")],
 )
+@observe_callback
 def get_metadata(oid, dr):
     meta = find_ztf_oid.get_meta(oid, dr).copy()
     meta["coord_string"] = find_ztf_oid.get_coord_string(oid, dr)
@@ -1555,6 +1569,7 @@ def neighbour_oids(different_filter, different_field) -> frozenset:
         Input("results-fit-hidden", "children"),
     ],
 )
+@observe_callback
 def set_figure(
     cur_oid,
     dr,
@@ -1772,7 +1787,7 @@ app.callback(
         Input("fold-period", "value"),
         Input("fold-zero-phase", "value"),
     ],
-)(partial(set_figure_link, fmt="png"))
+)(observe_callback(partial(set_figure_link, fmt="png"), name="set_figure_link_png"))
 
 
 app.callback(
@@ -1789,7 +1804,7 @@ app.callback(
         Input("fold-period", "value"),
         Input("fold-zero-phase", "value"),
     ],
-)(partial(set_figure_link, fmt="pdf"))
+)(observe_callback(partial(set_figure_link, fmt="pdf"), name="set_figure_link_pdf"))
 
 
 @app.callback(
@@ -1803,6 +1818,7 @@ app.callback(
         Input("max-mjd", "value"),
     ],
 )
+@observe_callback
 def set_csv_link(oid, dr, different_filter, different_field, min_mjd, max_mjd):
     url = f"/{dr}/csv/{oid}"
     query = {}
@@ -1825,10 +1841,9 @@ def find_neighbours(radius, center_oid, dr, different):
     if float(radius) <= 0:
         return html.P("Radius should be positive")
     ra, dec = find_ztf_oid.get_coord(center_oid, dr)
-    kwargs = dict(ra=ra, dec=dec, radius_arcsec=radius, dr=dr)
     fltr = find_ztf_oid.get_meta(center_oid, dr)["filter"]
     fieldid = find_ztf_oid.get_meta(center_oid, dr)["fieldid"]
-    j = find_ztf_circle.find(**kwargs)
+    j = find_ztf_circle.find(ra, dec, radius, dr)
     if different == "filter":
         j = {
             oid: value
@@ -1859,7 +1874,7 @@ app.callback(
         State("oid", "children"),
         State("dr", "children"),
     ],
-)(partial(find_neighbours, different="fieldid"))
+)(observe_callback(partial(find_neighbours, different="fieldid"), name="find_neighbours_fieldid"))
 
 app.callback(
     Output("different_filter_neighbours", "children"),
@@ -1868,7 +1883,7 @@ app.callback(
         State("oid", "children"),
         State("dr", "children"),
     ],
-)(partial(find_neighbours, different="filter"))
+)(observe_callback(partial(find_neighbours, different="filter"), name="find_neighbours_filter"))
 
 
 app.clientside_callback(
@@ -1897,6 +1912,7 @@ app.clientside_callback(
 
 
 @app.callback(Output("fits-to-show", "children"), [Input("graph", "clickData")], [State("dr", "children")])
+@observe_callback
 def load_fits_for_graph_clicked(data, dr):
     if data is None:
         raise PreventUpdate
@@ -1926,6 +1942,7 @@ def load_fits_for_graph_clicked(data, dr):
 
 
 @app.callback(Output("skybot", "children"), [Input("graph", "clickData")], [State("dr", "children")])
+@observe_callback
 def update_skybot_for_graph_clicked(data, dr):
     if data is None:
         raise PreventUpdate
@@ -1949,6 +1966,7 @@ def update_skybot_for_graph_clicked(data, dr):
     Output(dict(type="search-radius", index="astro-colibri"), "value"),
     [Input("astro-colibri-search-radius-degrees", "value")],
 )
+@observe_callback
 def convert_astro_colibri_search_radius_to_arcsec(radius_deg):
     return int(np.round(float(radius_deg) * 3600))
 
@@ -1987,7 +2005,7 @@ def set_tables():
                 State("oid", "children"),
                 State("dr", "children"),
             ],
-        )(partial(set_table, catalog=catalog))
+        )(observe_callback(partial(set_table, catalog=catalog), name=f"set_table_{catalog}"))
 
 
 set_tables()
@@ -2001,6 +2019,7 @@ set_tables()
         State("dr", "children"),
     ],
 )
+@observe_callback
 def set_vizier_url(radius, oid, dr):
     ra, dec = find_ztf_oid.get_coord(oid, dr)
     if radius is None:
@@ -2017,6 +2036,7 @@ def set_vizier_url(radius, oid, dr):
         State("dr", "children"),
     ],
 )
+@observe_callback
 def set_vizier_list(n_clicks, radius, oid, dr):
     if n_clicks == 0:
         return ""
@@ -2073,6 +2093,7 @@ def set_vizier_list(n_clicks, radius, oid, dr):
         Input("max-mjd", "value"),
     ],
 )
+@observe_callback
 def set_features_list(oid, dr, version, min_mjd, max_mjd):
     if min_mjd is not None and max_mjd is not None and min_mjd >= max_mjd:
         raise PreventUpdate
@@ -2098,6 +2119,7 @@ def set_features_list(oid, dr, version, min_mjd, max_mjd):
         Input("max-mjd", "value"),
     ],
 )
+@observe_callback
 def set_lc_table(oid, dr, min_mjd, max_mjd):
     if min_mjd is not None and max_mjd is not None and min_mjd >= max_mjd:
         raise PreventUpdate
@@ -0,0 +1,143 @@
+"""Local index of ZTF science product directories
+
+`products/sci/YYYY/MMDD/` contains a subdirectory per exposure named by
+the six-digit fraction of the day. Lists of fractions are stored per night
+in a SQLite database as sorted int32 arrays. A night is listed over HTTP
+on the first access, or in advance by the bulk prefetch command:
+
+    python -m ztf_viewer.product_index --start 2018-03-17 --end 2018-12-31
+"""
+
+import argparse
+import datetime
+import logging
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from urllib.parse import urljoin
+
+import numpy as np
+import requests
+
+from ztf_viewer.config import PRODUCT_INDEX_PATH, ZTF_FITS_PROXY_URL
+
+# Listing of a night is refreshed until the night is this old, products of recent nights could still be added
+FINAL_AFTER = 7 * 86400
+# Refresh period for listings of recent nights, seconds
+REFRESH_PERIOD = 3600
+
+
+def _night_date(products_root: str) -> datetime.date:
+    match = re.search(r"/(\d{4})/(\d{2})(\d{2})/$", products_root)
+    year, month, day = map(int, match.groups())
+    return datetime.date(year, month, day)
+
+
+class ProductIndex:
+    """Fractions of the day of science product directories, per night"""
+
+    _listing_timeout = 60
+
+    def __init__(self, path=PRODUCT_INDEX_PATH, base_url=ZTF_FITS_PROXY_URL):
+        self.path = Path(path)
+        self.base_url = base_url
+        self._session = requests.Session()
+        self._local = threading.local()
+
+    @property
+    def _connection(self) -> sqlite3.Connection:
+        """Connection of the current thread"""
+        try:
+            return self._local.connection
+        except AttributeError:
+            pass
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        connection = sqlite3.connect(self.path, timeout=30.0)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS nights (products_root TEXT PRIMARY KEY, fracs BLOB, fetched_at REAL)"
+        )
+        self._local.connection = connection
+        return connection
+
+    def _listing(self, path: str, pattern: str) -> list[str]:
+        """Subdirectories of a directory of the HTTP proxy matching regex pattern, empty if it doesn't exist"""
+        response = self._session.get(urljoin(self.base_url, path), timeout=self._listing_timeout)
+        if response.status_code == 404:
+            return []
+        response.raise_for_status()
+        return re.findall(rf'<a href="({pattern})/">\1/</a>', response.text)
+
+    def _fetch(self, products_root: str) -> np.ndarray:
+        fracs = np.array(sorted(map(int, self._listing(products_root, r"\d{6}"))), dtype=np.int32)
+        with self._connection as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO nights VALUES (?, ?, ?)", (products_root, fracs.tobytes(), time.time())
+            )
+        return fracs
+
+    @staticmethod
+    def _is_fresh(products_root: str, fetched_at: float) -> bool:
+        night = datetime.datetime.combine(_night_date(products_root), datetime.time(), datetime.timezone.utc)
+        if fetched_at - night.timestamp() > FINAL_AFTER:
+            return True
+        return time.time() - fetched_at < REFRESH_PERIOD
+
+    def fracs(self, products_root: str) -> np.ndarray:
+        """Sorted six-digit fractions of the night, e.g. for /products/sci/2018/0317/"""
+        row = self._connection.execute(
+            "SELECT fracs, fetched_at FROM nights WHERE products_root = ?", (products_root,)
+        ).fetchone()
+        if row is not None:
+            data, fetched_at = row
+            if self._is_fresh(products_root, fetched_at):
+                return np.frombuffer(data, dtype=np.int32)
+        return self._fetch(products_root)
+
+    def prefetch(self, start: datetime.date, end: datetime.date, workers: int = 8) -> int:
+        """List all nights between start and end inclusive which are not indexed yet, return their number"""
+        roots = []
+        for year in sorted(map(int, self._listing("/products/sci/", r"\d{4}"))):
+            if not start.year <= year <= end.year:
+                continue
+            for monthday in sorted(self._listing(f"/products/sci/{year}/", r"\d{4}")):
+                products_root = f"/products/sci/{year}/{monthday}/"
+                if start <= _night_date(products_root) <= end:
+                    roots.append(products_root)
+        indexed = {
+            products_root
+            for products_root, fetched_at in self._connection.execute("SELECT products_root, fetched_at FROM nights")
+            if self._is_fresh(products_root, fetched_at)
+        }
+        roots = [products_root for products_root in roots if products_root not in indexed]
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for i, _ in enumerate(executor.map(self._fetch, roots), start=1):
+                if i % 100 == 0 or i == len(roots):
+                    logging.info(f"Indexed {i} of {len(roots)} nights")
+        return len(roots)
+
+
+product_index = ProductIndex()
+
+
+def parse_args(args=None):
+    parser = argparse.ArgumentParser(description="Prefetch ZTF science product directory listings")
+    parser.add_argument("--start", type=datetime.date.fromisoformat, default=datetime.date(2018, 3, 1))
+    parser.add_argument("--end", type=datetime.date.fromisoformat, default=datetime.date.today())
+    parser.add_argument("--workers", type=int, default=8, help="number of concurrent HTTP requests")
+    return parser.parse_args(args)
+
+
+def main(args=None):
+    logging.basicConfig(level=logging.INFO)
+    args = parse_args(args)
+    n = product_index.prefetch(args.start, args.end, workers=args.workers)
+    logging.info(f"{n} nights are indexed to {product_index.path}")
+
+
+if __name__ == "__main__":
+    main()
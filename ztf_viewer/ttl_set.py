@@ -1,9 +1,9 @@
 import pickle
+import time
 from abc import ABC, abstractmethod
 from collections.abc import MutableSet
 from typing import Generic, Hashable, Iterator, TypeVar
 
-import packaging.version
 from cachetools import TTLCache
 from redis import StrictRedis
 
@@ -63,76 +63,74 @@ _T_Redis = TypeVar("_T_Redis")
 
 
 class RedisTTLSet(_BaseTTLSet[_T_Redis], Generic[_T_Redis]):
-    def __init__(self, ttl: int, client: StrictRedis, prefix: str = "RedisTTLSet"):
-        super().__init__(ttl)
+    """TTL set stored in a single Redis sorted set scored by expiration time
 
-        self.client = client
+    It never scans the keyspace: all operations are O(log N) or O(1) in the
+    set size. Expired members are pruned lazily, when the set is modified,
+    counted or iterated.
+    """
 
-        self.prefix = prefix.encode()
-        if b"*" in self.prefix:
-            raise ValueError('prefix must not contain "*"')
+    def __init__(self, ttl: int, client: StrictRedis, key: str = "RedisTTLSet"):
+        super().__init__(ttl)
+        self.client = client
+        self.key = key
 
-        self.redis_version = self.__redis_version(client)
-        if self.redis_version < packaging.version.parse("6.2.0"):
-            self.remove = self.__remove_pre_6_2_0
-        else:
-            self.remove = self.__remove_6_2_0
+    def _encode(self, value: _T_Redis) -> bytes:
+        return pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
 
-    @staticmethod
-    def __redis_version(client: StrictRedis) -> packaging.version.Version:
-        info = client.info()
-        version = packaging.version.parse(info["redis_version"])
-        return version
+    def _decode(self, member: bytes) -> _T_Redis:
+        return pickle.loads(member)
 
-    def _encode(self, value: _T_Redis) -> bytes:
-        serialized = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
-        return self.prefix + serialized
+    def _prune(self, pipe, now: float) -> None:
+        pipe.zremrangebyscore(self.key, "-inf", now)
 
-    def _decode(self, key: bytes) -> _T_Redis:
-        return pickle.loads(key.removeprefix(self.prefix))
+    def add(self, value: _T_Redis) -> None:
+        now = time.time()
+        with self.client.pipeline() as pipe:
+            self._prune(pipe, now)
+            pipe.zadd(self.key, {self._encode(value): now + self.ttl})
+            # No members live longer than the last added one
+            pipe.expire(self.key, self.ttl)
+            pipe.execute()
 
     def discard(self, value: _T_Redis) -> None:
-        key = self._encode(value)
-        self.client.delete(key)
+        self.client.zrem(self.key, self._encode(value))
 
     def remove(self, value: _T_Redis) -> None:
-        # To be assigned in __init__ according to Redis version
-        raise NotImplementedError
-
-    def __remove_pre_6_2_0(self, value: _T_Redis) -> None:
-        key = self._encode(value)
-        if self.client.exists(key) == 0:
-            raise KeyError(f"{value} not found")
-        self.client.delete(key)
-
-    def __remove_6_2_0(self, value: _T_Redis) -> None:
-        key = self._encode(value)
-        if self.client.getdel(key) is None:
+        with self.client.pipeline() as pipe:
+            pipe.zscore(self.key, self._encode(value))
+            pipe.zrem(self.key, self._encode(value))
+            expire_at, _ = pipe.execute()
+        if expire_at is None or expire_at <= time.time():
             raise KeyError(f"{value} not found")
 
     def clear(self) -> None:
-        for key in self.client.keys(self.prefix + b"*"):
-            self.client.delete(key)
-
-    def add(self, value: _T_Redis) -> None:
-        key = self._encode(value)
-        self.client.setex(key, self.ttl, 0)
+        self.client.delete(self.key)
 
     def __contains__(self, value: _T_Redis) -> bool:
-        key = self._encode(value)
-        return self.client.exists(key) > 0
+        expire_at = self.client.zscore(self.key, self._encode(value))
+        return expire_at is not None and expire_at > time.time()
 
     def __len__(self) -> int:
-        return len(self.client.keys(self.prefix + b"*"))
+        with self.client.pipeline() as pipe:
+            self._prune(pipe, time.time())
+            pipe.zcard(self.key)
+            _, n = pipe.execute()
+        return n
 
     def __iter__(self) -> Iterator[_T_Redis]:
-        for key in self.client.keys(self.prefix + b"*"):
-            yield self._decode(key)
+        now = time.time()
+        with self.client.pipeline() as pipe:
+            self._prune(pipe, now)
+            pipe.zrangebyscore(self.key, now, "+inf")
+            _, members = pipe.execute()
+        for member in members:
+            yield self._decode(member)
 
 
 class RedisTTLStringSet(RedisTTLSet[str]):
     def _encode(self, value: str) -> bytes:
-        return self.prefix + value.encode()
+        return value.encode()
 
-    def _decode(self, key: bytes) -> str:
-        return key.removeprefix(self.prefix).decode()
+    def _decode(self, member: bytes) -> str:
+        return member.decode()
@@ -4,7 +4,6 @@ import logging
 import math
 import re
 from collections import defaultdict
-from concurrent.futures import ThreadPoolExecutor
 from functools import wraps
 from itertools import chain, count
 from typing import Callable
@@ -17,6 +16,8 @@ from astropy.time import Time
 from immutabledict import immutabledict
 from jinja2 import Template
 
+from ztf_viewer.executor import ExecutorFull, catalog_executor
+
 YEAR = datetime.datetime.now().year
 
 
@@ -251,20 +252,35 @@ def compose_plus_minus_expression(value, lower, upper, **to_str_kwargs):
     """
 
 
-def timeout(seconds: float, exception=TimeoutError, exception_kwargs=None) -> Callable:
-    """A decorator to limit the execution time of a function"""
+def timeout(
+    seconds: float, exception=TimeoutError, exception_kwargs=None, executor=None, full_exception=None
+) -> Callable:
+    """A decorator to limit the execution time of a function
+
+    The function runs in `executor`, shared catalog I/O executor by default.
+    On timeout `exception` is raised immediately, without waiting for the
+    function. If the executor queue is full, `full_exception` is raised, or
+    `exception` if it is not given.
+    """
+    if executor is None:
+        executor = catalog_executor
+    if full_exception is None:
+        full_exception = exception
+
+    def raise_(exc_type):
+        if exception_kwargs is None:
+            raise exc_type
+        raise exc_type(**exception_kwargs)
 
     def decorator(func):
         @wraps(func)
         def wrapper(*args, **kwargs):
-            with ThreadPoolExecutor(max_workers=1) as executor:
-                future = executor.submit(func, *args, **kwargs)
-                try:
-                    return future.result(timeout=seconds)
-                except TimeoutError:
-                    if exception_kwargs is None:
-                        raise exception
-                    raise exception(**exception_kwargs)
+            try:
+                return executor.call(func, *args, timeout=seconds, **kwargs)
+            except TimeoutError:
+                raise_(exception)
+            except ExecutorFull:
+                raise_(full_exception)
 
         return wrapper
 